@@ -1,19 +1,166 @@
+import atexit
+import json
 import logging
+import logging.handlers
 import os
+import queue
+import re
+import threading
+import time
 from datetime import datetime
 
-# Utility Functions
-def initialize_logging():
-    """Set up logging configuration."""
-    if not os.path.exists('logs'):
-        os.makedirs('logs')
-    logging.basicConfig(
-        level=logging.INFO,
-        format='%(asctime)s [%(levelname)s] - %(message)s',
-        handlers=[
-            logging.FileHandler(f'logs/student_manager_{datetime.now().strftime("%Y%m%d")}.log', encoding='utf-8'),
-            logging.StreamHandler()
-        ]
-    )
+LOG_DIR = 'logs'
+LOG_FILE = 'student_manager.log'
+LOG_FORMAT = '%(asctime)s [%(levelname)s] - %(message)s'
+MAX_LOG_BYTES = 10 * 1024 * 1024   # roll over early if a day's log grows past this
+BACKUP_COUNT = 60                  # rotated files kept
+RATE_LIMIT = 20                    # INFO/DEBUG records per call site (or operation) ...
+RATE_LIMIT_PERIOD = 1.0            # ... per this many seconds; the rest are counted and dropped
+
+# Records are put on a queue by the calling thread and written by a single
+# listener thread, so logging never blocks the UI on file I/O.
+#
+# Set STUDENT_MANAGER_LOG_FORMAT=json to write one JSON object per line instead
+# of plain text. Extra fields passed with `extra={...}` are included in JSON output.
+
+class RotatingLogFileHandler(logging.handlers.TimedRotatingFileHandler):
+    """Log file rotated at midnight, and earlier whenever it exceeds `max_bytes`.
+
+    Rotated files are named after the time their first record was written,
+    e.g. student_manager.log.2025-02-21_00-00-00, so size-based rollovers within
+    a day never overwrite each other.
+    """
+
+    def __init__(self, filename, max_bytes=MAX_LOG_BYTES, backup_count=BACKUP_COUNT):
+        super().__init__(filename, when='midnight', backupCount=backup_count, encoding='utf-8', delay=True)
+        self.max_bytes = max_bytes
+        self.suffix = '%Y-%m-%d_%H-%M-%S'
+        self.extMatch = re.compile(r'^\d{4}-\d{2}-\d{2}_\d{2}-\d{2}-\d{2}(_\d+)?$', re.ASCII)
+        self.segment_started = (os.path.getmtime(self.baseFilename) if os.path.exists(self.baseFilename)
+                                else time.time())
+
+    def shouldRollover(self, record):
+        if super().shouldRollover(record):
+            return True
+        if self.stream is None:
+            self.stream = self._open()
+        return self.max_bytes > 0 and self.stream.tell() >= self.max_bytes
+
+    def doRollover(self):
+        if self.stream:
+            self.stream.close()
+            self.stream = None
+        if os.path.exists(self.baseFilename):
+            base = f"{self.baseFilename}.{time.strftime(self.suffix, time.localtime(self.segment_started))}"
+            target, counter = base, 1
+            while os.path.exists(target):
+                target = f"{base}_{counter}"
+                counter += 1
+            os.rename(self.baseFilename, target)
+        if self.backupCount > 0:
+            for path in self.getFilesToDelete():
+                os.remove(path)
+        now = time.time()
+        self.segment_started = now
+        self.rolloverAt = self.computeRollover(now)
+
+class JsonLinesFormatter(logging.Formatter):
+    """Formats each record as a single-line JSON object."""
+
+    _STANDARD_ATTRIBUTES = set(vars(logging.makeLogRecord({}))) | {'message', 'asctime'}
+
+    def format(self, record):
+        entry = {
+            'time': datetime.fromtimestamp(record.created).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'thread': record.threadName,
+            'message': record.getMessage(),
+        }
+        entry.update((key, value) for key, value in vars(record).items()
+                     if key not in self._STANDARD_ATTRIBUTES)
+        if record.exc_info:
+            entry['exception'] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+class RateLimitFilter(logging.Filter):
+    """Drops INFO and DEBUG records beyond `rate` per `period` seconds from one source.
+
+    The source is the record's `operation` extra if set, otherwise its call site,
+    so a message logged once per row is capped no matter how many rows there are.
+    The first record let through after a suppressed burst reports how many were
+    dropped. Warnings and errors always pass.
+    """
+
+    def __init__(self, rate=RATE_LIMIT, period=RATE_LIMIT_PERIOD):
+        super().__init__()
+        self.rate = rate
+        self.period = period
+        self._windows = {}   # source -> [window start, records passed, records suppressed]
+        self._lock = threading.Lock()
+
+    def filter(self, record):
+        if record.levelno >= logging.WARNING:
+            return True
+        source = getattr(record, 'operation', None) or (record.pathname, record.lineno)
+        now = time.monotonic()
+        with self._lock:
+            window = self._windows.get(source)
+            if window is None or now - window[0] >= self.period:
+                suppressed = window[2] if window else 0
+                self._windows[source] = [now, 1, 0]
+                if suppressed:
+                    record.msg = f"{record.msg} ({suppressed} similar messages suppressed)"
+                return True
+            if window[1] < self.rate:
+                window[1] += 1
+                return True
+            window[2] += 1
+            return False
+
+def _build_formatter(json_lines):
+    return JsonLinesFormatter() if json_lines else logging.Formatter(LOG_FORMAT)
+
+_listener = None
+
+def initialize_logging(log_dir=LOG_DIR, json_lines=None, level=logging.INFO):
+    """Route the root logger through a queue to a rotating file and stderr."""
+    global _listener
+    if json_lines is None:
+        json_lines = os.environ.get('STUDENT_MANAGER_LOG_FORMAT', '').lower() == 'json'
+    os.makedirs(log_dir, exist_ok=True)
+
+    formatter = _build_formatter(json_lines)
+    file_handler = RotatingLogFileHandler(os.path.join(log_dir, LOG_FILE))
+    file_handler.setFormatter(formatter)
+    stream_handler = logging.StreamHandler()
+    stream_handler.setFormatter(formatter)
+
+    log_queue = queue.SimpleQueue()
+    queue_handler = logging.handlers.QueueHandler(log_queue)
+    queue_handler.addFilter(RateLimitFilter())
+
+    root = logging.getLogger()
+    root.setLevel(level)
+    for handler in root.handlers[:]:
+        root.removeHandler(handler)
+    root.addHandler(queue_handler)
+
+    if _listener is not None:
+        _listener.stop()
+    _listener = logging.handlers.QueueListener(log_queue, file_handler, stream_handler)
+    _listener.start()
     return logging.getLogger(__name__)
-logger = initialize_logging()
\ No newline at end of file
+
+def shutdown_logging():
+    """Write out every queued record and stop the listener thread."""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        for handler in _listener.handlers:
+            handler.close()
+        _listener = None
+
+atexit.register(shutdown_logging)
+
+logger = initialize_logging()
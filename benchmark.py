@@ -0,0 +1,347 @@
+"""Reproducible performance benchmarks on synthetic student data.
+
+Usage examples:
+    python benchmark.py                              # 10k rows, compare with benchmark_baseline.json
+    python benchmark.py --sizes 10000 100000 1000000
+    python benchmark.py --sizes 100000 --update-baseline
+    python benchmark.py --output results.json --threshold 0.5
+
+Each size gets a fresh database in a scratch directory, filled by importing a
+generated CSV file. The same seed always produces the same students. Exits
+with status 1 if any benchmark is slower than the baseline by more than the
+threshold, and with status 2 if there is no baseline for a size that was run:
+record one with --update-baseline on the machine that runs the comparison.
+"""
+import argparse
+import csv
+import json
+import os
+import platform
+import random
+import shutil
+import sqlite3
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+from database_initialization import initialize_database, get_connection, close_database
+from database_operations import (STUDENT_FIELDS, PAGE_SIZE, get_valid_options, fetch_students_page,
+                                 perform_advanced_search)
+from validation import validate_student_data, get_validation_context, invalidate_validation_context
+from bulk_import import import_students_file
+from data_export import export_query
+from certificates import generate_certificates, select_students
+from fulltext_search import fold_vietnamese
+from student_query import query_students
+
+DEFAULT_SIZES = (10000,)
+DEFAULT_SEED = 2025
+DEFAULT_REPEAT = 3
+DEFAULT_THRESHOLD = 0.25       # fail when a benchmark is more than 25% slower than the baseline
+MIN_REGRESSION_SECONDS = 0.005 # ... and at least this much slower, so timer noise is not a regression
+BASELINE_FILE = 'benchmark_baseline.json'
+GENERATE_CHUNK = 50000         # rows generated at a time, bounding memory at 1M rows
+CERTIFICATE_SAMPLE = 5000      # certificates rendered per size
+TREE_PAGES = 50                # pages scrolled through in the tree benchmark
+
+# Vocabulary for generated students
+
+SURNAMES = ["Nguyễn", "Trần", "Lê", "Phạm", "Hoàng", "Huỳnh", "Phan", "Vũ", "Võ", "Đặng",
+            "Bùi", "Đỗ", "Hồ", "Ngô", "Dương", "Lý"]
+SURNAME_WEIGHTS = [38, 11, 9.5, 7, 5.1, 5.1, 4.5, 3.9, 3.9, 2.1, 2, 1.4, 1.3, 1.3, 1, 0.5]
+MIDDLE_NAMES = {
+    'Nam': ["Văn", "Hữu", "Đức", "Minh", "Quốc", "Thành", "Công", "Gia", "Xuân", "Đình"],
+    'Nữ': ["Thị", "Ngọc", "Thu", "Thanh", "Minh", "Phương", "Bảo", "Khánh", "Mỹ", "Hoài"],
+}
+GIVEN_NAMES = {
+    'Nam': ["An", "Bình", "Cường", "Dũng", "Đạt", "Hải", "Hiếu", "Hoàng", "Hùng", "Huy",
+            "Khang", "Khoa", "Long", "Nam", "Nghĩa", "Phong", "Phúc", "Quân", "Quang", "Sơn",
+            "Tài", "Thắng", "Thịnh", "Trung", "Tuấn", "Việt", "Vinh", "Vũ"],
+    'Nữ': ["Anh", "Châu", "Chi", "Diệp", "Giang", "Hà", "Hạnh", "Hoa", "Hương", "Lan",
+           "Linh", "Mai", "My", "Nga", "Ngân", "Nhung", "Oanh", "Phương", "Quỳnh", "Thảo",
+           "Trang", "Trâm", "Tuyết", "Uyên", "Vân", "Vy", "Xuân", "Yến"],
+}
+STREETS = ["Lê Lợi", "Nguyễn Huệ", "Trần Hưng Đạo", "Hai Bà Trưng", "Lý Thường Kiệt",
+           "Điện Biên Phủ", "Võ Văn Tần", "Cách Mạng Tháng Tám", "Phạm Ngũ Lão", "Nguyễn Trãi"]
+CITIES = ["TP. Hồ Chí Minh", "Hà Nội", "Đà Nẵng", "Cần Thơ", "Huế", "Hải Phòng", "Nha Trang"]
+PHONE_PREFIXES = ["03", "05", "07", "08", "09"]
+EMAIL_DOMAIN = '@student.university.edu.vn'
+
+def generate_students(count, faculties, programs, statuses, seed=DEFAULT_SEED, start=0):
+    """Yield `count` student `data` dicts (form labels as keys), starting at index `start`.
+
+    Students are a pure function of (seed, index): the same arguments always
+    produce the same rows, and MSSVs, emails and phone numbers are unique.
+    Every row passes validate_student_data under the default settings and config.
+    """
+    for index in range(start, start + count):
+        rng = random.Random(seed * 10_000_019 + index)
+        gender = rng.choice(('Nam', 'Nữ'))
+        surname = rng.choices(SURNAMES, SURNAME_WEIGHTS)[0]
+        given = rng.choice(GIVEN_NAMES[gender])
+        middle = rng.choice(MIDDLE_NAMES[gender])
+        year = rng.randint(2000, 2006)
+        course = year + 18
+        mssv = f"{course % 100:02d}{index:06d}"
+        folded = fold_vietnamese(f"{given}{surname}").replace(' ', '')
+        yield {
+            'MSSV': mssv,
+            'Họ Tên': f"{surname} {middle} {given}",
+            'Ngày sinh': f"{rng.randint(1, 28):02d}/{rng.randint(1, 12):02d}/{year}",
+            'Giới tính': gender,
+            'Khoa': rng.choice(faculties),
+            'Khóa': f"K{course % 100:02d}",
+            'Chương trình': rng.choice(programs),
+            'Địa chỉ': f"{rng.randint(1, 300)} {rng.choice(STREETS)}, {rng.choice(CITIES)}",
+            'Email': f"{folded}{mssv}{EMAIL_DOMAIN}",
+            'Số điện thoại': f"{rng.choice(PHONE_PREFIXES)}{index:08d}",
+            'Tình trạng': rng.choice(statuses),
+        }
+
+def write_students_csv(filename, students):
+    """Write generated students to an import file; returns the row count."""
+    count = 0
+    with open(filename, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        writer.writerow([column for column, _ in STUDENT_FIELDS])
+        for data in students:
+            writer.writerow([data[label] for _, label in STUDENT_FIELDS])
+            count += 1
+    return count
+
+# Benchmarks
+
+def best_of(repeat, func):
+    """Run `func` `repeat` times and return the shortest wall time in seconds."""
+    best = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+def _result(seconds, rows=None):
+    result = {'seconds': round(seconds, 6)}
+    if rows:
+        result['rows_per_sec'] = round(rows / seconds) if seconds else None
+    return result
+
+def bench_validation(size, categories, seed):
+    context = get_validation_context()
+    elapsed = 0.0
+    for start in range(0, size, GENERATE_CHUNK):
+        rows = list(generate_students(min(GENERATE_CHUNK, size - start), *categories, seed=seed, start=start))
+        started = time.perf_counter()
+        errors = [error for error in (validate_student_data(data, context) for data in rows) if error]
+        elapsed += time.perf_counter() - started
+        if errors:
+            raise RuntimeError(f"Generated data failed validation: {errors[0]}")
+    return _result(elapsed, size)
+
+def bench_import(csv_path, size):
+    conn = get_connection()
+    started = time.perf_counter()
+    result = import_students_file(csv_path, 'csv', conn, resume=False)
+    elapsed = time.perf_counter() - started
+    if result['inserted'] != size:
+        raise RuntimeError(f"Imported {result['inserted']} of {size} rows; see {result['report_path']}")
+    return _result(elapsed, size)
+
+def bench_export(workdir, size, repeat):
+    filename = os.path.join(workdir, 'export.csv')
+    return _result(best_of(repeat, lambda: export_query(filename, 'csv', get_connection())), size)
+
+def search_cases(categories):
+    faculties = categories[0]
+    return {
+        'surname': ('', 'Nguyễn'),
+        'full_name': ('', 'nguyen van hung'),
+        'faculty': (faculties[0], ''),
+        'faculty_and_name': (faculties[0], 'Linh'),
+    }
+
+def bench_search(categories, repeat):
+    cursor = get_connection().cursor()
+    return {f"search.{label}": _result(best_of(repeat, lambda: perform_advanced_search(faculty, name, cursor)))
+            for label, (faculty, name) in search_cases(categories).items()}
+
+def bench_query(categories, repeat):
+    """Time a page of one cohort and status sorted by name, first and halfway through."""
+    conn = get_connection()
+    filters = {'course': 'K21', 'status': categories[2][0]}
+    count = conn.execute("SELECT COUNT(*) FROM students WHERE course = ? AND status = ?",
+                         (filters['course'], filters['status'])).fetchone()[0]
+    _, middle = query_students(filters, 'name', limit=1, offset=count // 2, db_connection=conn)
+    return {
+        'query.first_page': _result(best_of(repeat, lambda: query_students(
+            filters, 'name', limit=PAGE_SIZE, db_connection=conn))),
+        'query.middle_page': _result(best_of(repeat, lambda: query_students(
+            filters, 'name', limit=PAGE_SIZE, after=middle, db_connection=conn))),
+    }
+
+def bench_tree(size, categories, repeat):
+    """Time the keyset page loads behind the student list (refresh_tree)."""
+    cursor = get_connection().cursor()
+
+    def scroll():
+        after_id = None
+        for _ in range(TREE_PAGES):
+            rows = fetch_students_page(cursor, after_id=after_id)
+            if not rows:
+                break
+            after_id = rows[-1][0]
+
+    last_id = cursor.execute("SELECT MAX(id) FROM students").fetchone()[0]
+    return {
+        'tree.first_page': _result(best_of(repeat, lambda: fetch_students_page(cursor))),
+        'tree.scroll': _result(best_of(repeat, scroll)),
+        'tree.last_page': _result(best_of(repeat, lambda: fetch_students_page(cursor, before_id=last_id + 1))),
+        'tree.filtered_first_page': _result(best_of(repeat, lambda: fetch_students_page(
+            cursor, "faculty = ?", (categories[0][0],)))),
+    }
+
+def bench_certificates(workdir, size, repeat):
+    count = min(size, CERTIFICATE_SAMPLE)
+    students = select_students(get_connection().cursor(),
+                               query=f"SELECT * FROM students ORDER BY id LIMIT {count}")
+    output = os.path.join(workdir, 'certificates')
+
+    def render():
+        shutil.rmtree(output, ignore_errors=True)
+        result = generate_certificates(students, 'html', output, 'Trường Đại học ABC', cache_dir=None)
+        if result['failed']:
+            raise RuntimeError(f"{result['failed']} certificates failed to render")
+
+    return _result(best_of(repeat, render), count)
+
+def run_size(size, workdir, seed, repeat):
+    """Build a database of `size` students in `workdir` and run every benchmark on it."""
+    os.makedirs(workdir)
+    os.chdir(workdir)
+    invalidate_validation_context()
+    try:
+        initialize_database()
+        categories = (get_valid_options('faculty'), get_valid_options('program'), get_valid_options('status'))
+        csv_path = os.path.join(workdir, 'students.csv')
+        write_students_csv(csv_path, (data for start in range(0, size, GENERATE_CHUNK)
+                                      for data in generate_students(min(GENERATE_CHUNK, size - start),
+                                                                    *categories, seed=seed, start=start)))
+        results = {'validation': bench_validation(size, categories, seed),
+                   'import_csv': bench_import(csv_path, size),
+                   'export_csv': bench_export(workdir, size, repeat)}
+        results.update(bench_search(categories, repeat))
+        results.update(bench_query(categories, repeat))
+        results.update(bench_tree(size, categories, repeat))
+        results['certificates_html'] = bench_certificates(workdir, size, repeat)
+        return results
+    finally:
+        close_database()
+        invalidate_validation_context()
+
+def run_benchmarks(sizes, seed=DEFAULT_SEED, repeat=DEFAULT_REPEAT, workdir=None):
+    """Run the suite for each size and return the results document."""
+    scratch = workdir or tempfile.mkdtemp(prefix='student-benchmark-')
+    original_cwd = os.getcwd()
+    try:
+        results = {}
+        for size in sizes:
+            print(f"Benchmarking {size} students...", file=sys.stderr)
+            results[str(size)] = run_size(size, os.path.join(scratch, str(size)), seed, repeat)
+    finally:
+        os.chdir(original_cwd)
+        if workdir is None:
+            shutil.rmtree(scratch, ignore_errors=True)
+    return {
+        'meta': {
+            'created': datetime.now().isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'sqlite': sqlite3.sqlite_version,
+            'platform': platform.platform(),
+            'cpus': os.cpu_count(),
+            'seed': seed,
+            'repeat': repeat,
+        },
+        'sizes': results,
+    }
+
+def compare(results, baseline, threshold=DEFAULT_THRESHOLD):
+    """Return (size, name, baseline seconds, current seconds, ratio) for each regression."""
+    regressions = []
+    for size, benchmarks in results['sizes'].items():
+        for name, result in benchmarks.items():
+            previous = baseline.get('sizes', {}).get(size, {}).get(name)
+            if not previous or not previous['seconds']:
+                continue
+            ratio = result['seconds'] / previous['seconds']
+            if ratio > 1 + threshold and result['seconds'] - previous['seconds'] >= MIN_REGRESSION_SECONDS:
+                regressions.append((size, name, previous['seconds'], result['seconds'], ratio))
+    return regressions
+
+def print_results(results, baseline=None):
+    for size, benchmarks in results['sizes'].items():
+        print(f"\n{size} students")
+        for name, result in benchmarks.items():
+            line = f"  {name:<28} {result['seconds'] * 1000:>11.2f} ms"
+            if 'rows_per_sec' in result:
+                line += f"  {result['rows_per_sec']:>10,} rows/s"
+            previous = (baseline or {}).get('sizes', {}).get(size, {}).get(name)
+            if previous and previous['seconds']:
+                line += f"  ({result['seconds'] / previous['seconds'] - 1:+.0%} vs baseline)"
+            print(line)
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog='benchmark.py', description="Student management benchmarks")
+    parser.add_argument('--sizes', type=int, nargs='+', default=list(DEFAULT_SIZES),
+                        help="numbers of students, e.g. 10000 100000 1000000")
+    parser.add_argument('--seed', type=int, default=DEFAULT_SEED)
+    parser.add_argument('--repeat', type=int, default=DEFAULT_REPEAT,
+                        help="runs per read-only benchmark; the fastest is kept")
+    parser.add_argument('--baseline', default=BASELINE_FILE)
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD,
+                        help="allowed slowdown before failing, as a fraction (0.25 = 25%%)")
+    parser.add_argument('--update-baseline', action='store_true', help="save these results as the baseline")
+    parser.add_argument('--output', help="also write the results to this JSON file")
+    parser.add_argument('--workdir', help="keep databases and generated files here instead of a temp dir")
+    return parser
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    baseline_path = os.path.abspath(args.baseline)
+    output_path = os.path.abspath(args.output) if args.output else None
+    workdir = os.path.abspath(args.workdir) if args.workdir else None
+
+    baseline = None
+    if os.path.exists(baseline_path):
+        with open(baseline_path, encoding='utf-8') as f:
+            baseline = json.load(f)
+
+    results = run_benchmarks(args.sizes, args.seed, args.repeat, workdir)
+    print_results(results, baseline)
+
+    if output_path:
+        with open(output_path, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+    if args.update_baseline:
+        if baseline:
+            # Keep baseline entries for sizes that were not run this time
+            results['sizes'] = {**baseline.get('sizes', {}), **results['sizes']}
+        with open(baseline_path, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+        print(f"\nBaseline saved to {baseline_path}")
+        return 0
+
+    missing = [size for size in results['sizes'] if size not in (baseline or {}).get('sizes', {})]
+    if missing:
+        print(f"\nNo baseline for {', '.join(missing)} students in {baseline_path}; "
+              f"record one with --update-baseline.", file=sys.stderr)
+        return 2
+    regressions = compare(results, baseline, args.threshold)
+    for size, name, previous, current, ratio in regressions:
+        print(f"REGRESSION {size}/{name}: {previous * 1000:.2f} ms -> {current * 1000:.2f} ms "
+              f"({ratio - 1:+.0%}, threshold {args.threshold:.0%})")
+    return 1 if regressions else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
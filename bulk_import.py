@@ -0,0 +1,340 @@
+import csv
+import hashlib
+import json
+import os
+import sqlite3
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from itertools import islice
+
+from app_logging import logger
+from change_tracking import prune_changes
+from metrics import timed
+from database_operations import STUDENT_FIELDS, INSERT_STUDENT_SQL, student_params, notify_students_changed
+from import_dedup import DuplicateFilter
+from validation import validate_student_data, get_validation_context
+
+DEFAULT_CHUNK_SIZE = 5000
+FINGERPRINT_BYTES = 1024 * 1024
+REJECTION_REPORT_COLUMNS = ('row', 'mssv', 'reason')
+DUPLICATE_REPORT_COLUMNS = ('row', 'mssv', 'field', 'value', 'duplicate_of')
+
+# Pragmas applied for the duration of a bulk load. journal_mode is deliberately
+# left alone so a crash mid-import can still roll back cleanly.
+BULK_LOAD_PRAGMAS = {
+    'synchronous': 'OFF',
+    'temp_store': 'MEMORY',
+    'cache_size': '-65536'  # 64 MiB
+}
+
+@contextmanager
+def bulk_load_pragmas(conn, pragmas=None):
+    """Temporarily apply bulk-load pragmas, restoring the previous values afterwards."""
+    pragmas = BULK_LOAD_PRAGMAS if pragmas is None else pragmas
+    conn.commit()
+    saved = {name: conn.execute(f"PRAGMA {name}").fetchone()[0] for name in pragmas}
+    try:
+        for name, value in pragmas.items():
+            conn.execute(f"PRAGMA {name} = {value}")
+        yield
+    finally:
+        for name, value in saved.items():
+            conn.execute(f"PRAGMA {name} = {value}")
+
+def rejection_report_path(filename, kind='rejected'):
+    """Return the path of the rejection (or duplicate) report written next to an imported file."""
+    base, _ = os.path.splitext(filename)
+    return f"{base}_{kind}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv"
+
+class RejectionReport:
+    """CSV report of rows left out of an import, opened on the first one."""
+
+    def __init__(self, path, columns=REJECTION_REPORT_COLUMNS):
+        self.path = path
+        self.columns = columns
+        self.count = 0
+        self._file = None
+        self._writer = None
+
+    def add(self, *values):
+        if self._file is None:
+            self._file = open(self.path, 'w', newline='', encoding='utf-8-sig')
+            self._writer = csv.writer(self._file)
+            self._writer.writerow(self.columns)
+        self._writer.writerow(values)
+        self.count += 1
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+def row_to_student_data(row):
+    """Convert an import row keyed by column name into a student `data` dict."""
+    data = {}
+    for column, label in STUDENT_FIELDS:
+        value = row.get(column)
+        data[label] = '' if value is None else str(value).strip()
+    return data
+
+def _insert_chunk(conn, batch, report):
+    """Insert a chunk with executemany, falling back to per-row inserts on conflicts."""
+    cursor = conn.cursor()
+    try:
+        cursor.executemany(INSERT_STUDENT_SQL, [params for _, params in batch])
+        conn.commit()
+        notify_students_changed([params[0] for _, params in batch])
+        return len(batch)
+    except sqlite3.IntegrityError:
+        conn.rollback()
+
+    # Locate the conflicting rows, which the duplicate check only misses if another
+    # writer added them during the import; the rest of the chunk is still
+    # inserted in one transaction
+    inserted = []
+    for row_number, params in batch:
+        try:
+            cursor.execute(INSERT_STUDENT_SQL, params)
+            inserted.append(params[0])
+        except sqlite3.IntegrityError:
+            report.add(row_number, params[0], "MSSV đã tồn tại!")
+    conn.commit()
+    notify_students_changed(inserted)
+    return len(inserted)
+
+def import_chunk(conn, rows, report, context, start_row, duplicates=None):
+    """Validate and insert one chunk of import rows in a single transaction.
+
+    Rows are numbered from `start_row`. With a `duplicates` filter, known rows
+    are skipped before they are validated. Returns the number of inserted rows.
+    """
+    rows = [row_to_student_data(row) for row in rows]
+    if duplicates is not None:
+        duplicates.prepare(rows)
+    batch = []
+    for row_number, data in enumerate(rows, start_row):
+        if duplicates is not None:
+            keys = duplicates.check(row_number, data)
+            if keys is None:
+                continue
+        error = validate_student_data(data, context)
+        if error:
+            report.add(row_number, data["MSSV"], error)
+            continue
+        if duplicates is not None:
+            duplicates.remember(row_number, keys)
+        batch.append((row_number, student_params(data)))
+    return _insert_chunk(conn, batch, report) if batch else 0
+
+def _finish_counts(result, duplicates):
+    result['duplicates'] = duplicates.count if duplicates is not None else 0
+    result['rejected'] = result['total'] - result['inserted'] - result['duplicates']
+
+def _throughput(result, started):
+    elapsed = time.perf_counter() - started
+    result['seconds'] = elapsed
+    result['rows_per_sec'] = result['total'] / elapsed if elapsed > 0 else 0.0
+    return result
+
+def bulk_insert_students(conn, rows, report, chunk_size=DEFAULT_CHUNK_SIZE, start_row=1,
+                         progress=None, cancel_event=None, duplicates=None):
+    """Validate and insert import rows, committing every `chunk_size` rows.
+
+    `rows` is an iterable of dicts keyed by the import column names. Invalid rows
+    are written to `report` instead of aborting the import, and duplicates are
+    skipped by the `duplicates` filter (or rejected by the database without one).
+    `progress(rows_done, rows_done, total_rows)` is called after each chunk when
+    `rows` has a length, and setting `cancel_event` stops after the current chunk.
+    Returns a dict with the inserted/rejected counts and the measured throughput.
+    """
+    context = get_validation_context()
+    result = {'total': 0, 'inserted': 0, 'rejected': 0, 'cancelled': False}
+    total_rows = len(rows) if hasattr(rows, '__len__') else None
+    rows = iter(rows)
+    started = time.perf_counter()
+
+    with bulk_load_pragmas(conn):
+        while True:
+            if cancel_event is not None and cancel_event.is_set():
+                result['cancelled'] = True
+                break
+            chunk = list(islice(rows, chunk_size))
+            if not chunk:
+                break
+            result['inserted'] += import_chunk(conn, chunk, report, context, start_row + result['total'],
+                                               duplicates)
+            result['total'] += len(chunk)
+            if progress and total_rows:
+                progress(result['total'], result['total'], total_rows)
+
+    _finish_counts(result, duplicates)
+    return _throughput(result, started)
+
+# Streaming CSV import with checkpoints
+
+def checkpoint_path(filename):
+    """Return the path of the resume checkpoint kept next to an imported CSV file."""
+    return f"{filename}.checkpoint.json"
+
+def file_fingerprint(filename):
+    """Identify a file by size, modification time and a hash of its first megabyte."""
+    stat = os.stat(filename)
+    digest = hashlib.sha256()
+    with open(filename, 'rb') as file:
+        digest.update(file.read(FINGERPRINT_BYTES))
+    return {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns, 'head_sha256': digest.hexdigest()}
+
+def load_checkpoint(filename):
+    """Return the saved checkpoint for `filename`, or None if missing or stale."""
+    try:
+        with open(checkpoint_path(filename), encoding='utf-8') as file:
+            checkpoint = json.load(file)
+    except (OSError, ValueError):
+        return None
+    if checkpoint.get('fingerprint') != file_fingerprint(filename):
+        logger.info(f"Ignoring stale import checkpoint for {filename}")
+        return None
+    return checkpoint
+
+def save_checkpoint(filename, checkpoint):
+    """Atomically persist an import checkpoint."""
+    path = checkpoint_path(filename)
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as file:
+        json.dump(checkpoint, file)
+    os.replace(tmp_path, path)
+
+def clear_checkpoint(filename):
+    """Remove the checkpoint of a completed import."""
+    try:
+        os.remove(checkpoint_path(filename))
+    except FileNotFoundError:
+        pass
+
+def iter_csv_rows(filename, start_offset=0):
+    """Yield (row, byte_offset) pairs from a CSV file without loading it into memory.
+
+    The header is always read from the start of the file; data rows are read from
+    `start_offset`. The offset yielded with each row points just past that row, so
+    it can be stored in a checkpoint and passed back as `start_offset`.
+    """
+    with open(filename, 'rb') as file:
+        def lines():
+            for line in iter(file.readline, b''):
+                yield line.decode('utf-8-sig')
+
+        reader = csv.reader(lines())
+        header = [column.strip() for column in next(reader, [])]
+        if start_offset:
+            file.seek(start_offset)
+        for values in reader:
+            if values:
+                yield dict(zip(header, values)), file.tell()
+
+def read_csv_header(filename):
+    """Return the column names of a CSV file."""
+    with open(filename, newline='', encoding='utf-8-sig') as file:
+        return [column.strip() for column in next(csv.reader(file), [])]
+
+def check_columns(columns):
+    """Raise ValueError if any required import column is missing."""
+    missing = [column for column, _ in STUDENT_FIELDS if column not in columns]
+    if missing:
+        raise ValueError(f"File không đúng định dạng! Thiếu cột bắt buộc: {', '.join(missing)}")
+
+def stream_import_csv(filename, conn, report, chunk_size=DEFAULT_CHUNK_SIZE,
+                      resume=True, progress=None, cancel_event=None, duplicates=None):
+    """Import a CSV file chunk by chunk with bounded memory and resumable checkpoints.
+
+    After every committed chunk the file fingerprint, the last committed row, its
+    byte offset and the inserted, duplicate and rejected counts so far are saved,
+    so an interrupted import restarts from there.
+    `progress(rows_done, bytes_done, total_bytes)` is called after each chunk, and
+    setting `cancel_event` stops the import after the current chunk.
+    """
+    check_columns(read_csv_header(filename))
+    fingerprint = file_fingerprint(filename)
+    checkpoint = load_checkpoint(filename) if resume else None
+    if checkpoint:
+        logger.info(f"Resuming import of {filename} after row {checkpoint['row']}")
+        checkpoint.setdefault('duplicates', 0)     # checkpoints saved before duplicates were counted
+    else:
+        checkpoint = {'fingerprint': fingerprint, 'row': 0, 'offset': 0, 'inserted': 0, 'duplicates': 0,
+                      'rejected': 0}
+
+    context = get_validation_context()
+    result = {'total': 0, 'inserted': 0, 'rejected': 0, 'cancelled': False,
+              'resumed_from': checkpoint['row']}
+    rows = iter_csv_rows(filename, checkpoint['offset'])
+    started = time.perf_counter()
+
+    with bulk_load_pragmas(conn):
+        while True:
+            if cancel_event is not None and cancel_event.is_set():
+                result['cancelled'] = True
+                break
+            chunk = list(islice(rows, chunk_size))
+            if not chunk:
+                break
+            skipped = duplicates.count if duplicates is not None else 0
+            inserted = import_chunk(conn, [row for row, _ in chunk], report, context, checkpoint['row'] + 1,
+                                    duplicates)
+            if duplicates is not None:
+                skipped = duplicates.count - skipped
+
+            result['total'] += len(chunk)
+            result['inserted'] += inserted
+            checkpoint['row'] += len(chunk)
+            checkpoint['offset'] = chunk[-1][1]
+            checkpoint['inserted'] += inserted
+            checkpoint['duplicates'] += skipped
+            checkpoint['rejected'] += len(chunk) - inserted - skipped
+            save_checkpoint(filename, checkpoint)
+            if progress:
+                progress(checkpoint['row'], checkpoint['offset'], fingerprint['size'])
+
+    if not result['cancelled']:
+        clear_checkpoint(filename)
+    _finish_counts(result, duplicates)
+    return _throughput(result, started)
+
+@timed()
+def import_students_file(filename, format_type, conn, chunk_size=DEFAULT_CHUNK_SIZE,
+                         resume=True, progress=None, cancel_event=None):
+    """Import a CSV or Excel file through the bulk insert pipeline.
+
+    CSV files are streamed with checkpoints (see stream_import_csv); Excel files
+    are read whole and inserted in chunks. `progress(rows_done, done, total)` counts
+    bytes for CSV files and rows for Excel files. Rows whose MSSV, email or phone
+    is already in the database or earlier in the file are skipped and listed in
+    a duplicate report; invalid rows go to the rejection report.
+    """
+    report = RejectionReport(rejection_report_path(filename))
+    duplicates = DuplicateFilter(conn, RejectionReport(rejection_report_path(filename, 'duplicates'),
+                                                       DUPLICATE_REPORT_COLUMNS))
+    try:
+        if format_type == 'csv':
+            result = stream_import_csv(filename, conn, report, chunk_size, resume, progress, cancel_event,
+                                       duplicates)
+        else:
+            import pandas as pd  # deferred: importing pandas alone takes ~0.4s
+            df = pd.read_excel(filename, dtype=str, keep_default_na=False)
+            check_columns(df.columns)
+            result = bulk_insert_students(conn, df.to_dict('records'), report, chunk_size,
+                                          progress=progress, cancel_event=cancel_event,
+                                          duplicates=duplicates)
+    finally:
+        report.close()
+        duplicates.report.close()
+    prune_changes(conn)
+
+    result['report_path'] = report.path if report.count else None
+    result['duplicates_in_file'] = duplicates.in_file
+    result['duplicates_in_database'] = duplicates.in_database
+    result['duplicate_report_path'] = duplicates.report.path if duplicates.report.count else None
+    state = 'cancelled' if result.get('cancelled') else 'completed'
+    logger.info(f"Import of {filename} {state}: {result['inserted']} inserted, "
+                f"{result['duplicates']} duplicates, {result['rejected']} rejected, "
+                f"{result['rows_per_sec']:.0f} rows/s")
+    return result
@@ -0,0 +1,259 @@
+import hashlib
+import html
+import multiprocessing
+import os
+import time
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+from app_logging import logger
+from metrics import timed
+from student_record import student_cursor, fetch_students
+from database_operations import (STATUS_CONFIRMATION_TEMPLATE, SQL_VARIABLE_BATCH,
+                                 status_confirmation_fields, build_advanced_search_query)
+
+CERTIFICATE_EXTENSIONS = {'html': '.html', 'pdf': '.pdf'}
+CERTIFICATE_CACHE_DIR = os.path.join('cache', 'certificates')
+CACHE_MAX_AGE_DAYS = 30
+RENDER_BATCH_SIZE = 50       # certificates per task sent to a worker process
+PARALLEL_THRESHOLD = 200     # smaller PDF batches are rendered in-process
+ISSUED_MARK = '##/##/####'   # stands in for the issue date in cached renders, same width as dd/mm/yyyy
+
+# Batch generation of student status confirmations. The template is parsed once
+# per run: for HTML the Markdown is converted with the {field} placeholders left
+# in place, so each certificate is a single str.format; for PDF it is split into
+# lines once. Rendered documents are cached by a hash of the template and the
+# student's fields, so re-running a batch only renders certificates whose data
+# changed. The issue date is left out of the hash: certificates are rendered
+# with ISSUED_MARK in its place and stamped with the date as they are written,
+# so a render cached yesterday is reused today. PDFs are written uncompressed
+# for this, and the mark has the width of a date so the xref offsets stay valid.
+
+def compile_template(format_type, template=STATUS_CONFIRMATION_TEMPLATE):
+    """Parse the certificate template for `format_type` ('html' or 'pdf')."""
+    if format_type == 'html':
+        import markdown
+        return markdown.markdown(template)
+    if format_type == 'pdf':
+        return template.split("\n")
+    raise ValueError(f"Unsupported format: {format_type}")
+
+def render_certificate(compiled, format_type, fields):
+    """Render one certificate from a compiled template and return its bytes."""
+    if format_type == 'html':
+        # Same escaping markdown applies to text inside the template's code block
+        values = {name: html.escape(str(value), quote=False) for name, value in fields.items()}
+        return compiled.format(**values).encode('utf-8')
+
+    from fpdf import FPDF
+    pdf = FPDF()
+    pdf.set_compression(False)
+    pdf.add_page()
+    pdf.set_font("Arial", size=12)
+    for line in compiled:
+        pdf.cell(200, 10, txt=line.format(**fields), ln=True, align="L")
+    data = pdf.output(dest='S')
+    # fpdf 1.x returns a latin-1 str, fpdf2 a bytearray
+    return data.encode('latin-1') if isinstance(data, str) else bytes(data)
+
+def stamp_issued(data, issued):
+    """Replace ISSUED_MARK in a rendered certificate with the `issued` date (dd/mm/yyyy)."""
+    return data.replace(ISSUED_MARK.encode('ascii'), issued.encode('ascii'))
+
+def certificate_key(format_type, template, fields):
+    """Content hash identifying a rendered certificate."""
+    digest = hashlib.sha256(f"{format_type}\0{template}\0".encode('utf-8'))
+    for name in sorted(fields):
+        digest.update(f"{name}={fields[name]}\0".encode('utf-8'))
+    return digest.hexdigest()
+
+class CertificateCache:
+    """Rendered certificates stored on disk under their content hash."""
+
+    def __init__(self, directory=CERTIFICATE_CACHE_DIR):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, key, extension):
+        return os.path.join(self.directory, key + extension)
+
+    def get(self, key, extension):
+        try:
+            with open(self._path(key, extension), 'rb') as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+    def put(self, key, extension, data):
+        path = self._path(key, extension)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+
+    def prune(self, max_age_days=CACHE_MAX_AGE_DAYS):
+        """Remove entries not written for `max_age_days`. Returns the number removed."""
+        cutoff = time.time() - max_age_days * 86400
+        removed = 0
+        for entry in os.scandir(self.directory):
+            if entry.is_file() and entry.stat().st_mtime < cutoff:
+                os.remove(entry.path)
+                removed += 1
+        return removed
+
+class CertificateOutput:
+    """Destination for a batch: a directory, or a single zip file if `path` ends in .zip."""
+
+    def __init__(self, path):
+        self.path = path
+        if path.lower().endswith('.zip'):
+            self._zip = zipfile.ZipFile(path, 'w', zipfile.ZIP_DEFLATED)
+        else:
+            self._zip = None
+            os.makedirs(path, exist_ok=True)
+
+    def write(self, name, data):
+        if self._zip is not None:
+            self._zip.writestr(name, data)
+        else:
+            with open(os.path.join(self.path, name), 'wb') as f:
+                f.write(data)
+
+    def close(self):
+        if self._zip is not None:
+            self._zip.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+def select_students(cursor, mssvs=None, faculty=None, name=None, query=None, params=()):
+    """Fetch Student records for a list of MSSVs, a faculty/name search or a query.
+
+    `query` must select full students rows (SELECT * or SELECT students.*).
+    """
+    cursor = student_cursor(cursor.connection)
+    if mssvs is not None:
+        mssvs = list(dict.fromkeys(mssvs))
+        rows = []
+        for start in range(0, len(mssvs), SQL_VARIABLE_BATCH):
+            batch = mssvs[start:start + SQL_VARIABLE_BATCH]
+            placeholders = ", ".join("?" * len(batch))
+            cursor.execute(f"SELECT * FROM students WHERE mssv IN ({placeholders})", batch)
+            rows.extend(fetch_students(cursor))
+        return rows
+    if query is None:
+        query, params = build_advanced_search_query(faculty or '', name or '')
+    cursor.execute(query, params)
+    return fetch_students(cursor)
+
+# Per-process state of the worker pool, set once by _init_worker
+_worker_template = None
+_worker_format = None
+
+def _init_worker(compiled, format_type):
+    global _worker_template, _worker_format
+    _worker_template = compiled
+    _worker_format = format_type
+
+def _render_batch(jobs):
+    """Render (mssv, fields) jobs with the worker's template; returns (mssv, data, error) triples."""
+    results = []
+    for mssv, fields in jobs:
+        try:
+            results.append((mssv, render_certificate(_worker_template, _worker_format, fields), None))
+        except Exception as e:
+            results.append((mssv, None, str(e)))
+    return results
+
+def _batches(items, size):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+@timed()
+def generate_certificates(students, format_type, output, school_name, workers=None,
+                          cache_dir=CERTIFICATE_CACHE_DIR, progress=None, cancel_event=None):
+    """Render status confirmations for the `students` records into `output`.
+
+    `output` is a directory, or a zip file if it ends in .zip; each certificate is
+    named <mssv>.html or <mssv>.pdf. PDFs are rendered across `workers` processes
+    (default: one per CPU) unless the batch is small; cached renders are reused
+    when `cache_dir` is set. `progress(done, total)` is called as
+    certificates are written. Returns a summary dict.
+    """
+    if format_type not in CERTIFICATE_EXTENSIONS:
+        raise ValueError(f"Unsupported format: {format_type}")
+    extension = CERTIFICATE_EXTENSIONS[format_type]
+    started = time.perf_counter()
+    compiled = compile_template(format_type)
+    issued = datetime.now().strftime('%d/%m/%Y')
+    cache = CertificateCache(cache_dir) if cache_dir else None
+    if cache:
+        cache.prune()
+
+    total = len(students)
+    result = {'total': total, 'rendered': 0, 'cached': 0, 'failed': [], 'cancelled': False,
+              'output': output}
+    done = 0
+    pending = []
+    keys = {}
+
+    with CertificateOutput(output) as sink:
+        for student in students:
+            fields = status_confirmation_fields(student, school_name, ISSUED_MARK)
+            key = certificate_key(format_type, STATUS_CONFIRMATION_TEMPLATE, fields)
+            data = cache.get(key, extension) if cache else None
+            if data is None:
+                keys[fields['mssv']] = key
+                pending.append((fields['mssv'], fields))
+                continue
+            sink.write(fields['mssv'] + extension, stamp_issued(data, issued))
+            result['cached'] += 1
+            done += 1
+        if progress and done:
+            progress(done, total)
+
+        def collect(batch_results):
+            nonlocal done
+            for mssv, data, error in batch_results:
+                if error is not None:
+                    result['failed'].append((mssv, error))
+                    continue
+                sink.write(mssv + extension, stamp_issued(data, issued))
+                if cache:
+                    cache.put(keys[mssv], extension, data)
+                result['rendered'] += 1
+            done += len(batch_results)
+            if progress:
+                progress(done, total)
+
+        if workers is None:
+            workers = os.cpu_count() or 1
+        # An HTML certificate is one str.format (~40us), cheaper than shipping it
+        # between processes, so only PDF rendering is spread across workers.
+        if format_type == 'html' or workers <= 1 or len(pending) < PARALLEL_THRESHOLD:
+            _init_worker(compiled, format_type)
+            for batch in _batches(pending, RENDER_BATCH_SIZE):
+                if cancel_event is not None and cancel_event.is_set():
+                    result['cancelled'] = True
+                    break
+                collect(_render_batch(batch))
+        else:
+            # Spawned rather than forked: the caller is usually a thread of the GUI process
+            with ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context('spawn'),
+                                     initializer=_init_worker, initargs=(compiled, format_type)) as pool:
+                for batch_results in pool.map(_render_batch, _batches(pending, RENDER_BATCH_SIZE)):
+                    collect(batch_results)
+                    if cancel_event is not None and cancel_event.is_set():
+                        result['cancelled'] = True
+                        pool.shutdown(wait=False, cancel_futures=True)
+                        break
+
+    result['seconds'] = time.perf_counter() - started
+    logger.info(f"Certificates ({format_type}) written to {output}: {result['rendered']} rendered, "
+                f"{result['cached']} from cache, {len(result['failed'])} failed "
+                f"in {result['seconds']:.2f}s")
+    return result
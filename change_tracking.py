@@ -0,0 +1,112 @@
+from db_connection import borrow_connection
+
+CHANGES_TABLE = 'student_changes'
+CHANGES_KEEP = 100000          # most recent changes kept by prune_changes
+
+# Every insert, update and delete on students appends a row to the change log,
+# from the trigger, in the same transaction as the write, whichever process or
+# code path made it. Readers remember the last sequence number they applied and
+# ask for what came after it, so keeping a view current costs work in proportion
+# to the edits rather than to the table. PRAGMA data_version tells them cheaply
+# when there may be something to read. Updates and deletes also log the MSSV
+# and name the student had before, so an index over them can drop the old
+# entries without searching for them.
+
+CHANGES_SCHEMA = [
+    f'''
+    CREATE TABLE IF NOT EXISTS {CHANGES_TABLE} (
+        seq INTEGER PRIMARY KEY AUTOINCREMENT,
+        student_id INTEGER NOT NULL,
+        mssv TEXT,
+        op TEXT NOT NULL,
+        old_mssv TEXT,
+        old_name TEXT
+    )
+    ''',
+    f'''
+    CREATE TRIGGER IF NOT EXISTS student_changes_insert AFTER INSERT ON students BEGIN
+        INSERT INTO {CHANGES_TABLE} (student_id, mssv, op) VALUES (new.id, new.mssv, 'I');
+    END
+    ''',
+    f'''
+    CREATE TRIGGER IF NOT EXISTS student_changes_update AFTER UPDATE ON students BEGIN
+        INSERT INTO {CHANGES_TABLE} (student_id, mssv, op, old_mssv, old_name)
+        VALUES (new.id, new.mssv, 'U', old.mssv, old.name);
+    END
+    ''',
+    f'''
+    CREATE TRIGGER IF NOT EXISTS student_changes_delete AFTER DELETE ON students BEGIN
+        INSERT INTO {CHANGES_TABLE} (student_id, mssv, op, old_mssv, old_name)
+        VALUES (old.id, old.mssv, 'D', old.mssv, old.name);
+    END
+    '''
+]
+
+CHANGES_TRIGGERS = ('student_changes_insert', 'student_changes_update', 'student_changes_delete')
+
+def install_change_tracking(cursor):
+    """Create the change log table and the triggers that fill it."""
+    for statement in CHANGES_SCHEMA:
+        cursor.execute(statement)
+
+def upgrade_change_tracking(cursor):
+    """Add the old_mssv and old_name columns to a change log created without them."""
+    columns = {row[1] for row in cursor.execute(f"PRAGMA table_info({CHANGES_TABLE})")}
+    for column in ('old_mssv', 'old_name'):
+        if column not in columns:
+            cursor.execute(f"ALTER TABLE {CHANGES_TABLE} ADD COLUMN {column} TEXT")
+    for trigger in CHANGES_TRIGGERS:
+        cursor.execute(f"DROP TRIGGER IF EXISTS {trigger}")
+    install_change_tracking(cursor)
+
+def latest_change(cursor):
+    """Return the sequence number of the most recent change, or 0 if none is logged."""
+    return cursor.execute(f"SELECT coalesce(MAX(seq), 0) FROM {CHANGES_TABLE}").fetchone()[0]
+
+def read_changes(cursor, seq, limit=None):
+    """Return the changes logged after `seq`, oldest first.
+
+    Rows are (seq, student_id, mssv, op, old_mssv, old_name). `mssv` is the
+    student's MSSV after the change, or before it for deletes; old_mssv and
+    old_name are those before an update or delete, None for inserts and for
+    changes logged before migration 11.
+    Returns None when the changes cannot be replayed, because the log was pruned
+    past `seq` or because there are more than `limit` of them; the caller should
+    reload instead.
+    """
+    oldest = cursor.execute(f"SELECT MIN(seq) FROM {CHANGES_TABLE}").fetchone()[0]
+    if oldest is not None and oldest > seq + 1:
+        return None
+    query = (f"SELECT seq, student_id, mssv, op, old_mssv, old_name FROM {CHANGES_TABLE} "
+             f"WHERE seq > ? ORDER BY seq")
+    params = [seq]
+    if limit is not None:
+        query += " LIMIT ?"
+        params.append(limit + 1)
+    rows = cursor.execute(query, params).fetchall()
+    if limit is not None and len(rows) > limit:
+        return None
+    return rows
+
+def changes_since(cursor, seq, limit=None):
+    """Return (latest seq, changed student ids) for the changes logged after `seq`.
+
+    Several changes to one student are reported once. Returns None in the same
+    cases as read_changes.
+    """
+    rows = read_changes(cursor, seq, limit)
+    if rows is None:
+        return None
+    if not rows:
+        return seq, []
+    return rows[-1][0], list(dict.fromkeys(row[1] for row in rows))
+
+def prune_changes(db_connection=None, keep=CHANGES_KEEP):
+    """Delete all but the `keep` most recent changes. Returns the number deleted."""
+    with borrow_connection(db_connection) as conn:
+        cursor = conn.execute(f'''
+            DELETE FROM {CHANGES_TABLE}
+            WHERE seq <= (SELECT MAX(seq) FROM {CHANGES_TABLE}) - ?
+        ''', (keep,))
+        conn.commit()
+        return cursor.rowcount
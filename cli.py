@@ -0,0 +1,306 @@
+"""Headless command-line interface for batch operations.
+
+Usage examples:
+    python cli.py import students.csv
+    python cli.py export students.xlsx --faculty "Khoa Luật"
+    python cli.py --json search --name "nguyen van"
+    python cli.py search --course K21 --status "Đang học" --sort name --limit 50
+    python cli.py certificate 21127342 --format html --output cert.html
+    python cli.py certificates --faculty "Khoa Luật" --output k_luat.zip
+    python cli.py category add faculty "Khoa Toán"
+    python cli.py notifications send
+    python cli.py history --status "Đã thôi học" --from 2025-09-01 --to 2025-12-31
+    python cli.py --metrics import-metrics.json import students.csv
+
+Nothing here imports tkinter, so it runs on servers and from cron.
+"""
+import argparse
+import json
+import os
+import sqlite3
+import sys
+
+from database_initialization import initialize_database, get_connection, close_database
+from metrics import export_metrics
+from student_query import RANK, SORT_KEYS
+
+# Exit codes
+EXIT_OK = 0
+EXIT_ERROR = 1
+EXIT_USAGE = 2
+EXIT_NOT_FOUND = 3
+EXIT_ROWS_REJECTED = 4
+
+def _format_type(path, explicit):
+    if explicit:
+        return explicit
+    return 'excel' if os.path.splitext(path)[1].lower() in ('.xlsx', '.xls') else 'csv'
+
+def _emit(args, payload, lines):
+    """Print `payload` as JSON with --json, otherwise the human-readable `lines`."""
+    if args.json:
+        print(json.dumps(payload, ensure_ascii=False, default=str))
+    else:
+        for line in lines:
+            print(line)
+
+# Options of the search command passed to student_query.query_students
+SEARCH_FILTERS = ('faculty', 'name', 'status', 'program', 'course', 'gender',
+                  'dob_from', 'dob_to', 'email_domain')
+
+def cmd_import(args):
+    from bulk_import import import_students_file
+
+    def progress(rows_done, done, total):
+        if not args.json:
+            print(f"  {rows_done} rows ({done * 100 // total if total else 0}%)", file=sys.stderr)
+
+    result = import_students_file(args.file, _format_type(args.file, args.format), get_connection(),
+                                  chunk_size=args.chunk_size, resume=not args.no_resume,
+                                  progress=progress)
+    _emit(args, result, [
+        f"Inserted: {result['inserted']}",
+        f"Duplicates skipped: {result['duplicates']} ({result['duplicates_in_file']} within the file, "
+        f"{result['duplicates_in_database']} already in the database)",
+        f"Rejected: {result['rejected']}",
+        f"Throughput: {result['rows_per_sec']:.0f} rows/s",
+    ] + ([f"Duplicate report: {result['duplicate_report_path']}"] if result['duplicate_report_path'] else [])
+      + ([f"Rejection report: {result['report_path']}"] if result['report_path'] else []))
+    return EXIT_ROWS_REJECTED if result['rejected'] else EXIT_OK
+
+def cmd_export(args):
+    from database_operations import build_advanced_search_query, STUDENT_COLUMNS
+    from data_export import export_query
+
+    query, params = build_advanced_search_query(args.faculty, args.name, STUDENT_COLUMNS)
+    count = export_query(args.file, _format_type(args.file, args.format), get_connection(), query, params)
+    _emit(args, {'file': args.file, 'rows': count}, [f"Exported {count} students to {args.file}"])
+    return EXIT_OK if count else EXIT_NOT_FOUND
+
+def cmd_search(args):
+    from database_operations import fetch_student_by_mssv
+    from student_query import query_students
+
+    conn = get_connection()
+    if args.mssv:
+        student = fetch_student_by_mssv(args.mssv, conn.cursor())
+        results = [student.as_dict()] if student else []
+    else:
+        filters = {key: getattr(args, key) for key in SEARCH_FILTERS}
+        if not any(filters.values()):
+            print("search: give --mssv or at least one filter", file=sys.stderr)
+            return EXIT_USAGE
+        students, _ = query_students(filters, args.sort, args.desc, args.limit, args.offset, db_connection=conn)
+        results = [student.as_dict() for student in students]
+
+    _emit(args, results, [
+        f"{student['mssv']}\t{student['name']}\t{student['faculty']}\t{student['status']}"
+        for student in results
+    ] or ["No students found."])
+    return EXIT_OK if results else EXIT_NOT_FOUND
+
+def cmd_certificate(args):
+    from database_operations import fetch_student_by_mssv, render_student_status
+
+    student = fetch_student_by_mssv(args.mssv, get_connection().cursor())
+    if not student:
+        _emit(args, {'mssv': args.mssv, 'error': 'not_found'}, [f"Student {args.mssv} not found."])
+        return EXIT_NOT_FOUND
+    render_student_status(student, args.format, args.output)
+    _emit(args, {'mssv': args.mssv, 'file': args.output}, [f"Wrote {args.output}"])
+    return EXIT_OK
+
+def cmd_certificates(args):
+    from database_operations import get_config
+    from certificates import generate_certificates, select_students, CERTIFICATE_CACHE_DIR
+
+    conn = get_connection()
+    students = select_students(conn.cursor(), mssvs=args.mssv, faculty=args.faculty, name=args.name)
+    if not students:
+        _emit(args, {'total': 0, 'error': 'not_found'}, ["No students found."])
+        return EXIT_NOT_FOUND
+
+    def progress(done, total):
+        if not args.json:
+            print(f"  {done}/{total} certificates", file=sys.stderr)
+
+    result = generate_certificates(students, args.format, args.output,
+                                   get_config('school_name', 'Trường Đại học ABC', conn),
+                                   workers=args.workers, cache_dir=None if args.no_cache else CERTIFICATE_CACHE_DIR,
+                                   progress=progress)
+    _emit(args, result, [
+        f"Rendered: {result['rendered']}",
+        f"From cache: {result['cached']}",
+        f"Failed: {len(result['failed'])}",
+    ] + [f"  {mssv}: {error}" for mssv, error in result['failed'][:10]])
+    return EXIT_ERROR if result['failed'] else EXIT_OK
+
+def cmd_category(args):
+    from database_operations import CATEGORIES, get_valid_options, add_category, delete_category
+
+    if args.action == 'list':
+        categories = [args.category] if args.category else list(CATEGORIES)
+        options = {category: get_valid_options(category) for category in categories}
+        _emit(args, options, [f"{category}: {', '.join(values)}" for category, values in options.items()])
+        return EXIT_OK
+
+    if not args.category or args.value is None:
+        print(f"category {args.action}: CATEGORY and VALUE are required", file=sys.stderr)
+        return EXIT_USAGE
+
+    if args.action == 'add':
+        try:
+            add_category(args.category, args.value)
+        except sqlite3.IntegrityError:
+            _emit(args, {'added': False, 'error': 'exists'}, ["Giá trị này đã tồn tại!"])
+            return EXIT_ERROR
+        _emit(args, {'added': True}, [f"Added {args.category}: {args.value}"])
+        return EXIT_OK
+
+    deleted, message = delete_category(args.category, args.value)
+    _emit(args, {'deleted': deleted, 'message': message}, [message])
+    return EXIT_OK if deleted else EXIT_ERROR
+
+def cmd_notifications(args):
+    from notifications import (NotificationDispatcher, default_transports, outbox_summary,
+                               set_notification_preferences, CHANNELS)
+
+    if args.action == 'send':
+        # Deliver everything that is due and exit; suitable for cron
+        processed = NotificationDispatcher(default_transports()).drain()
+        _emit(args, {'processed': processed}, [f"Processed {processed} notifications"])
+        return EXIT_OK
+
+    if args.action == 'status':
+        summary = outbox_summary()
+        _emit(args, [{'channel': channel, 'status': status, 'count': count}
+                     for (channel, status), count in sorted(summary.items())],
+              [f"{channel}\t{status}\t{count}" for (channel, status), count in sorted(summary.items())]
+              or ["Outbox is empty."])
+        return EXIT_OK
+
+    if not args.mssv or args.channels is None:
+        print("notifications prefs: MSSV and CHANNELS are required", file=sys.stderr)
+        return EXIT_USAGE
+    channels = [channel for channel in args.channels.split(',') if channel]
+    conn = get_connection()
+    with conn:
+        found = set_notification_preferences(args.mssv, channels, conn)
+    if not found:
+        _emit(args, {'mssv': args.mssv, 'error': 'not_found'}, [f"Student {args.mssv} not found."])
+        return EXIT_NOT_FOUND
+    _emit(args, {'mssv': args.mssv, 'channels': channels},
+          [f"{args.mssv}: {', '.join(channels) or 'no notifications'} (available: {', '.join(CHANNELS)})"])
+    return EXIT_OK
+
+def cmd_history(args):
+    from status_history import get_status_timeline, find_status_changes
+
+    if args.mssv:
+        rows = get_status_timeline(args.mssv, get_connection())
+        results = [{'changed_at': changed_at, 'old_status': old, 'new_status': new}
+                   for changed_at, old, new in rows]
+        lines = [f"{changed_at}\t{old or '-'} -> {new}" for changed_at, old, new in rows]
+    elif args.status and args.start and args.end:
+        rows = find_status_changes(args.status, args.start, args.end, get_connection(), args.limit)
+        results = [{'mssv': mssv, 'old_status': old, 'changed_at': changed_at}
+                   for mssv, old, changed_at in rows]
+        lines = [f"{changed_at}\t{mssv}\t{old or '-'} -> {args.status}" for mssv, old, changed_at in rows]
+    else:
+        print("history: give --mssv, or --status with --from and --to", file=sys.stderr)
+        return EXIT_USAGE
+
+    _emit(args, results, lines or ["No status changes found."])
+    return EXIT_OK if results else EXIT_NOT_FOUND
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog='cli.py', description="Quản lý sinh viên - command line")
+    parser.add_argument('--json', action='store_true', help="machine-readable JSON output")
+    parser.add_argument('--metrics', metavar='FILE', help="write timings and query statistics to FILE (JSON)")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    command = commands.add_parser('import', help="import students from CSV/Excel")
+    command.add_argument('file')
+    command.add_argument('--format', choices=['csv', 'excel'])
+    command.add_argument('--chunk-size', type=int, default=5000)
+    command.add_argument('--no-resume', action='store_true', help="ignore a saved checkpoint")
+    command.set_defaults(handler=cmd_import)
+
+    command = commands.add_parser('export', help="export students to CSV/Excel")
+    command.add_argument('file')
+    command.add_argument('--format', choices=['csv', 'excel'])
+    command.add_argument('--faculty', default='')
+    command.add_argument('--name', default='')
+    command.set_defaults(handler=cmd_export)
+
+    command = commands.add_parser('search', help="search students")
+    command.add_argument('--mssv')
+    command.add_argument('--faculty', default='')
+    command.add_argument('--name', default='')
+    command.add_argument('--status', default='')
+    command.add_argument('--program', default='')
+    command.add_argument('--course', default='', help="cohort, e.g. K21")
+    command.add_argument('--gender', default='')
+    command.add_argument('--born-from', dest='dob_from', help="YYYY-MM-DD or DD/MM/YYYY")
+    command.add_argument('--born-to', dest='dob_to', help="YYYY-MM-DD or DD/MM/YYYY (inclusive)")
+    command.add_argument('--email-domain', default='', help="e.g. student.university.edu.vn")
+    command.add_argument('--sort', choices=sorted(SORT_KEYS) + [RANK],
+                         help="default: relevance for --name, otherwise id")
+    command.add_argument('--desc', action='store_true', help="sort descending")
+    command.add_argument('--limit', type=int, default=100)
+    command.add_argument('--offset', type=int)
+    command.set_defaults(handler=cmd_search)
+
+    command = commands.add_parser('certificate', help="export a student status confirmation")
+    command.add_argument('mssv')
+    command.add_argument('--format', choices=['html', 'pdf'], default='html')
+    command.add_argument('--output', required=True)
+    command.set_defaults(handler=cmd_certificate)
+
+    command = commands.add_parser('certificates', help="export status confirmations in bulk")
+    command.add_argument('--mssv', nargs='+', help="MSSVs to include (default: use --faculty/--name)")
+    command.add_argument('--faculty', default='')
+    command.add_argument('--name', default='')
+    command.add_argument('--format', choices=['html', 'pdf'], default='html')
+    command.add_argument('--output', required=True, help="output directory, or a .zip file")
+    command.add_argument('--workers', type=int, help="render processes (default: one per CPU)")
+    command.add_argument('--no-cache', action='store_true', help="re-render every certificate")
+    command.set_defaults(handler=cmd_certificates)
+
+    command = commands.add_parser('category', help="list, add or delete category values")
+    command.add_argument('action', choices=['list', 'add', 'delete'])
+    command.add_argument('category', nargs='?', choices=['faculty', 'status', 'program'])
+    command.add_argument('value', nargs='?')
+    command.set_defaults(handler=cmd_category)
+
+    command = commands.add_parser('history', help="status change history")
+    command.add_argument('--mssv', help="timeline of one student")
+    command.add_argument('--status', help="students who changed to this status")
+    command.add_argument('--from', dest='start', help="start date, YYYY-MM-DD")
+    command.add_argument('--to', dest='end', help="end date, YYYY-MM-DD (inclusive)")
+    command.add_argument('--limit', type=int)
+    command.set_defaults(handler=cmd_history)
+
+    command = commands.add_parser('notifications', help="deliver queued notifications or manage preferences")
+    command.add_argument('action', choices=['send', 'status', 'prefs'])
+    command.add_argument('mssv', nargs='?')
+    command.add_argument('channels', nargs='?', help="comma-separated, e.g. email,sms ('' to opt out)")
+    command.set_defaults(handler=cmd_notifications)
+
+    return parser
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    try:
+        initialize_database()
+        return args.handler(args)
+    except (ValueError, OSError, sqlite3.Error) as e:
+        _emit(args, {'error': str(e)}, [f"Lỗi: {str(e)}"])
+        return EXIT_ERROR
+    finally:
+        close_database()
+        if args.metrics:
+            export_metrics(args.metrics)
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,80 @@
+import csv
+
+from app_logging import logger
+from metrics import timed
+from database_operations import STUDENT_COLUMNS
+
+EXPORT_BATCH_SIZE = 5000
+
+ALL_STUDENTS_QUERY = f"SELECT {', '.join(STUDENT_COLUMNS)} FROM students"
+
+def iter_query_batches(cursor, query, params=(), batch_size=EXPORT_BATCH_SIZE):
+    """Execute a query and yield its rows in lists of at most `batch_size`."""
+    cursor.execute(query, params)
+    while True:
+        rows = cursor.fetchmany(batch_size)
+        if not rows:
+            return
+        yield rows
+
+def write_csv(filename, columns, batches, progress=None, cancel_event=None):
+    """Write row batches to a CSV file as they arrive. Returns the number of rows written."""
+    count = 0
+    with open(filename, 'w', newline='', encoding='utf-8-sig') as file:
+        writer = csv.writer(file)
+        writer.writerow(columns)
+        for rows in batches:
+            if cancel_event is not None and cancel_event.is_set():
+                break
+            writer.writerows(rows)
+            count += len(rows)
+            if progress:
+                progress(count)
+    return count
+
+def write_xlsx(filename, columns, batches, progress=None, cancel_event=None):
+    """Write row batches to an XLSX file using openpyxl's write-only streaming mode."""
+    import openpyxl
+    workbook = openpyxl.Workbook(write_only=True)
+    sheet = workbook.create_sheet()
+    sheet.append(columns)
+    count = 0
+    for rows in batches:
+        if cancel_event is not None and cancel_event.is_set():
+            break
+        for row in rows:
+            sheet.append(row)
+        count += len(rows)
+        if progress:
+            progress(count)
+    workbook.save(filename)
+    return count
+
+@timed()
+def export_query(filename, format_type, conn, query=ALL_STUDENTS_QUERY, params=(),
+                 columns=STUDENT_COLUMNS, batch_size=EXPORT_BATCH_SIZE,
+                 progress=None, cancel_event=None):
+    """Stream the result of `query` to a CSV or Excel file with bounded memory.
+
+    Rows are fetched `batch_size` at a time and written immediately, so peak
+    memory does not depend on the size of the result. Returns the number of
+    rows written; 0 means the query returned nothing and no file was created.
+    Setting `cancel_event` stops before the next batch, leaving a partial file
+    for the caller to remove.
+    """
+    batches = iter_query_batches(conn.cursor(), query, params, batch_size)
+    first = next(batches, None)
+    if first is None:
+        return 0
+
+    def all_batches():
+        yield first
+        yield from batches
+
+    writer = write_csv if format_type == 'csv' else write_xlsx
+    count = writer(filename, list(columns), all_batches(), progress, cancel_event)
+    if cancel_event is not None and cancel_event.is_set():
+        logger.info(f"Export to {filename} cancelled after {count} rows")
+    else:
+        logger.info(f"Exported {count} rows to {filename}")
+    return count
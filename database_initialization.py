@@ -1,48 +1,25 @@
-import sqlite3
+import threading
 
-conn = sqlite3.connect("students.db")
-cursor = conn.cursor()
+from change_tracking import prune_changes
+from db_connection import get_pool
+from migrations import migrate
+from fulltext_search import detect_fulltext_index
 
-cursor.execute('''
-    CREATE TABLE IF NOT EXISTS students (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        mssv TEXT UNIQUE NOT NULL,
-        name TEXT NOT NULL,
-        dob TEXT,
-        gender TEXT,
-        faculty TEXT,
-        course TEXT,
-        program TEXT,
-        address TEXT,
-        email TEXT,
-        phone TEXT,
-        status TEXT
-    )
-''')
+# Connection reserved for the UI thread for the lifetime of the application;
+# other threads check out their own connections from the pool. It is opened,
+# and the schema brought up to date, on first use rather than at import time.
+_conn = None
+_cursor = None
+_init_lock = threading.Lock()
 
-cursor.execute('''
-    CREATE TABLE IF NOT EXISTS settings (
-        category TEXT,
-        value TEXT,
-        UNIQUE(category, value)
-    )
-''')
-
-cursor.execute('''
-    CREATE TABLE IF NOT EXISTS config (
-        key TEXT PRIMARY KEY,
-        value TEXT,
-        description TEXT
-    )
-''')
-
-def init_default_settings():
+def init_default_settings(conn):
     """Initialize default settings in the database."""
     default_values = {
         'faculty': ["Khoa Luật", "Khoa Tiếng Anh thương mại", "Khoa Tiếng Nhật", "Khoa Tiếng Pháp"],
         'status': ["Đang học", "Đã tốt nghiệp", "Đã thôi học", "Tạm dừng học"],
         'program': ["Cử nhân", "Thạc sĩ", "Tiến sĩ"]
     }
+    cursor = conn.cursor()
     cursor.execute("SELECT COUNT(*) FROM settings")
     if cursor.fetchone()[0] == 0:
         for category, values in default_values.items():
@@ -50,7 +27,7 @@ def init_default_settings():
                 cursor.execute("INSERT INTO settings (category, value) VALUES (?, ?)", (category, value))
         conn.commit()
 
-def init_default_config():
+def init_default_config(conn):
     """Initialize default configuration values in the database."""
     default_config = {
         'allowed_email_domains': '@student.university.edu.vn',
@@ -67,11 +44,57 @@ def init_default_config():
         'enable_rules': 'true',
         'school_name': 'Trường Đại học ABC'
     }
-    cursor.execute("SELECT COUNT(*) FROM config")
-    if cursor.fetchone()[0] == 0:
-        for key, value in default_config.items():
-            cursor.execute("INSERT INTO config (key, value) VALUES (?, ?)", (key, value))
-        conn.commit()
+    # Per key, so keys added by later versions or migrations don't hide missing defaults
+    with conn:
+        conn.executemany("INSERT OR IGNORE INTO config (key, value) VALUES (?, ?)", default_config.items())
+
+def initialize_database():
+    """Open the UI connection, migrate the schema and insert default values.
+
+    Safe to call any number of times from any thread; only the first call does
+    any work. Returns the UI connection.
+    """
+    global _conn, _cursor
+    if _conn is None:
+        with _init_lock:
+            if _conn is None:
+                conn = get_pool().acquire()
+                migrate(conn)
+                detect_fulltext_index(conn)
+                prune_changes(conn)
+                init_default_settings(conn)
+                init_default_config(conn)
+                _cursor = conn.cursor()
+                _conn = conn
+    return _conn
+
+def is_initialized():
+    return _conn is not None
+
+def get_connection():
+    """Return the UI connection, initializing the database if needed."""
+    return initialize_database()
+
+def get_cursor():
+    """Return the shared cursor of the UI connection, initializing the database if needed."""
+    initialize_database()
+    return _cursor
+
+def __getattr__(name):
+    # Keeps `from database_initialization import conn, cursor` working; the
+    # database is initialized when the name is first imported.
+    if name == 'conn':
+        return get_connection()
+    if name == 'cursor':
+        return get_cursor()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
-init_default_settings()
-init_default_config()
\ No newline at end of file
+def close_database():
+    """Return the UI connection to the pool and close all pooled connections."""
+    global _conn, _cursor
+    pool = get_pool()
+    with _init_lock:
+        if _conn is not None:
+            pool.release(_conn)
+            _conn = _cursor = None
+    pool.close_all()
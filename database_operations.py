@@ -1,69 +1,103 @@
-import sqlite3
-from tkinter import messagebox, filedialog
-from database_initialization import conn, cursor
+from database_initialization import get_connection
+from db_connection import borrow_connection
 from app_logging import logger
 from datetime import datetime
-from fpdf import FPDF
-import markdown
-
-def with_db_connection(func):
-    """Decorator to manage database connections."""
-    def wrapper(*args, **kwargs):
-        conn = sqlite3.connect("students.db")
-        try:
-            result = func(conn, *args, **kwargs)
-        finally:
-            conn.close()
-        return result
-    return wrapper
-
-@with_db_connection
-def get_config(conn, key, default=None):
+from enrollment_stats import count_students
+from metrics import timed
+from student_record import student_cursor
+from student_query import build_student_filter, build_student_query, query_students
+
+# Incremented on every write to the settings/config tables so cached snapshots
+# (see validation.get_validation_context) know when to rebuild.
+_settings_version = 0
+
+def bump_settings_version():
+    """Mark cached settings/config snapshots as stale."""
+    global _settings_version
+    _settings_version += 1
+
+def get_settings_version():
+    """Return the current settings/config version counter."""
+    return _settings_version
+
+# Called with a list of MSSVs after a write to those students has been committed,
+# so caches (see student_repository) can drop exactly the entries that changed.
+_student_listeners = []
+
+def add_student_listener(listener):
+    """Call `listener(mssvs)` after every committed add, update or delete of students."""
+    _student_listeners.append(listener)
+
+def remove_student_listener(listener):
+    _student_listeners.remove(listener)
+
+def notify_students_changed(mssvs):
+    """Tell the student listeners that the given students were written."""
+    for listener in list(_student_listeners):
+        listener(mssvs)
+
+@timed()
+def get_config(key, default=None, db_connection=None):
     """Retrieve a configuration value from the database."""
-    cursor = conn.cursor()
-    cursor.execute("SELECT value FROM config WHERE key = ?", (key,))
-    result = cursor.fetchone()
+    with borrow_connection(db_connection) as conn:
+        cursor = conn.cursor()
+        cursor.execute("SELECT value FROM config WHERE key = ?", (key,))
+        result = cursor.fetchone()
     return result[0] if result else default
 
-@with_db_connection
-def can_delete_student(conn, mssv):
+@timed()
+def can_delete_student(mssv, db_connection=None):
     """Check if a student can be deleted within the allowed time window."""
-    deletion_window = int(get_config(conn, 'deletion_window_minutes', '30'))
-    cursor = conn.cursor()
-    cursor.execute("""
-        SELECT created_at FROM students 
-        WHERE mssv = ? AND 
-        datetime(created_at) >= datetime('now', ?) 
-    """, (mssv, f'-{deletion_window} minutes'))
-    return cursor.fetchone() is not None
-
-def get_valid_options(category):
+    with borrow_connection(db_connection) as conn:
+        deletion_window = int(get_config('deletion_window_minutes', '30', conn))
+        cursor = conn.cursor()
+        cursor.execute("""
+            SELECT created_at FROM students 
+            WHERE mssv = ? AND 
+            datetime(created_at) >= datetime('now', ?) 
+        """, (mssv, f'-{deletion_window} minutes'))
+        return cursor.fetchone() is not None
+
+@timed()
+def get_valid_options(category, db_connection=None):
     """Retrieve valid options for a given category from the database."""
-    cursor.execute("SELECT value FROM settings WHERE category = ?", (category,))
-    return [row[0] for row in cursor.fetchall()]
+    with borrow_connection(db_connection) as conn:
+        rows = conn.execute("SELECT value FROM settings WHERE category = ?", (category,)).fetchall()
+    return [row[0] for row in rows]
+
+CATEGORIES = ('faculty', 'status', 'program')
+
+def _check_category(category):
+    if category not in CATEGORIES:
+        raise ValueError(f"Danh mục không hợp lệ: {category}")
+
+def add_category(category, value):
+    """Add a value to a category. Raises sqlite3.IntegrityError if it already exists."""
+    _check_category(category)
+    conn = get_connection()
+    conn.execute("INSERT INTO settings (category, value) VALUES (?, ?)", (category, value))
+    conn.commit()
+    bump_settings_version()
+    logger.info(f"Added {category}: {value}")
 
 def delete_category(category, value):
-    """Delete a category value if no students are associated with it."""
-    cursor.execute(f"SELECT COUNT(*) FROM students WHERE {category} = ?", (value,))
-    if cursor.fetchone()[0] > 0:
-        messagebox.showerror("Lỗi", f"Không thể xóa {category} vì có sinh viên liên quan!")
-        return
+    """Delete a category value if no students are associated with it.
 
-    cursor.execute(f"DELETE FROM settings WHERE category = ? AND value = ?", (category, value))
+    Returns a (deleted, message) pair describing the outcome.
+    """
+    _check_category(category)
+    conn = get_connection()
+    if count_students(conn, **{category: value}) > 0:
+        return False, f"Không thể xóa {category} vì có sinh viên liên quan!"
+
+    conn.execute("DELETE FROM settings WHERE category = ? AND value = ?", (category, value))
     conn.commit()
+    bump_settings_version()
     logger.info(f"Deleted {category}: {value}")
-    messagebox.showinfo("Thành công", f"Đã xóa {category}: {value}")
-
-def export_student_status(mssv, format_type):
-    """Export student status confirmation in the specified format."""
-    cursor.execute("SELECT * FROM students WHERE mssv = ?", (mssv,))
-    student = cursor.fetchone()
-    if not student:
-        messagebox.showerror("Lỗi", "Không tìm thấy sinh viên!")
-        return
+    return True, f"Đã xóa {category}: {value}"
 
-    school_name = get_config('school_name', 'Trường Đại học ABC')
-    confirmation_data = f"""
+# Markdown text of a student status confirmation; fields come from status_confirmation_fields
+STATUS_CONFIRMATION_TEMPLATE = """
     **TRƯỜNG ĐẠI HỌC {school_name}**  
     **PHÒNG ĐÀO TẠO**  
     📍 Địa chỉ: [Địa chỉ trường]  
@@ -74,103 +108,321 @@ def export_student_status(mssv, format_type):
     Trường Đại học {school_name} xác nhận:  
 
     **1. Thông tin sinh viên:**  
-    - **Họ và tên:** {student[2]}  
-    - **Mã số sinh viên:** {student[1]}  
-    - **Ngày sinh:** {student[3]}  
-    - **Giới tính:** {student[4]}  
-    - **Khoa:** {student[5]}  
-    - **Chương trình đào tạo:** {student[7]}  
-    - **Khóa:** {student[6]}  
+    - **Họ và tên:** {name}  
+    - **Mã số sinh viên:** {mssv}  
+    - **Ngày sinh:** {dob}  
+    - **Giới tính:** {gender}  
+    - **Khoa:** {faculty}  
+    - **Chương trình đào tạo:** {program}  
+    - **Khóa:** {course}  
 
     **2. Tình trạng sinh viên hiện tại:**  
-    - {student[11]}  
+    - {status}  
 
-    📅 Ngày cấp: {datetime.now().strftime('%d/%m/%Y')}  
+    📅 Ngày cấp: {issued}  
 
     🖋 **Trưởng Phòng Đào Tạo**  
     (Ký, ghi rõ họ tên, đóng dấu)
     """
 
+def status_confirmation_fields(student, school_name, issued=None):
+    """Return the STATUS_CONFIRMATION_TEMPLATE fields for a Student record."""
+    return {
+        'school_name': school_name,
+        'mssv': student.mssv, 'name': student.name, 'dob': student.dob, 'gender': student.gender,
+        'faculty': student.faculty, 'course': student.course, 'program': student.program,
+        'status': student.status,
+        'issued': issued or datetime.now().strftime('%d/%m/%Y')
+    }
+
+def build_status_confirmation(student, school_name):
+    """Build the Markdown text of a student status confirmation."""
+    return STATUS_CONFIRMATION_TEMPLATE.format(**status_confirmation_fields(student, school_name))
+
+@timed()
+def render_student_status(student, format_type, filename, school_name=None):
+    """Write a student status confirmation to `filename` as HTML or PDF."""
+    if school_name is None:
+        school_name = get_config('school_name', 'Trường Đại học ABC')
+    confirmation_data = build_status_confirmation(student, school_name)
+
+    # markdown and fpdf are only needed here, so they are imported on first use
     if format_type == "html":
-        filename = filedialog.asksaveasfilename(defaultextension=".html", filetypes=[("HTML files", "*.html")])
-        if filename:
-            with open(filename, "w", encoding="utf-8") as file:
-                file.write(markdown.markdown(confirmation_data))
-            messagebox.showinfo("Thành công", f"Đã xuất giấy xác nhận ra {filename}")
+        import markdown
+        with open(filename, "w", encoding="utf-8") as file:
+            file.write(markdown.markdown(confirmation_data))
 
     elif format_type == "pdf":
-        filename = filedialog.asksaveasfilename(defaultextension=".pdf", filetypes=[("PDF files", "*.pdf")])
-        if filename:
-            pdf = FPDF()
-            pdf.add_page()
-            pdf.set_font("Arial", size=12)
-            for line in confirmation_data.split("\n"):
-                pdf.cell(200, 10, txt=line, ln=True, align="L")
-            pdf.output(filename)
-            messagebox.showinfo("Thành công", f"Đã xuất giấy xác nhận ra {filename}")
+        from fpdf import FPDF
+        pdf = FPDF()
+        pdf.add_page()
+        pdf.set_font("Arial", size=12)
+        for line in confirmation_data.split("\n"):
+            pdf.cell(200, 10, txt=line, ln=True, align="L")
+        pdf.output(filename)
+
+    else:
+        raise ValueError(f"Unsupported format: {format_type}")
 
+# Column names used by import/export files, paired with the form labels used in `data` dicts
+STUDENT_FIELDS = [
+    ('mssv', 'MSSV'), ('name', 'Họ Tên'), ('dob', 'Ngày sinh'), ('gender', 'Giới tính'),
+    ('faculty', 'Khoa'), ('course', 'Khóa'), ('program', 'Chương trình'), ('address', 'Địa chỉ'),
+    ('email', 'Email'), ('phone', 'Số điện thoại'), ('status', 'Tình trạng')
+]
+STUDENT_COLUMNS = [column for column, _ in STUDENT_FIELDS]
+
+INSERT_STUDENT_SQL = '''
+    INSERT INTO students (mssv, name, dob, gender, faculty, course, program, 
+                          address, email, phone, status, created_at)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, CURRENT_TIMESTAMP)
+'''
+
+def student_params(data):
+    """Return the INSERT parameters for a student `data` dict, in STUDENT_COLUMNS order."""
+    return tuple(data[label] for _, label in STUDENT_FIELDS)
+
+@timed()
 def add_student_to_db(data, cursor, conn):
     """Add a new student to the database."""
-    cursor.execute('''
-        INSERT INTO students (mssv, name, dob, gender, faculty, course, program, 
-                              address, email, phone, status)
-        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-    ''', (
-        data["MSSV"], data["Họ Tên"], data["Ngày sinh"], data["Giới tính"],
-        data["Khoa"], data["Khóa"], data["Chương trình"], data["Địa chỉ"],
-        data["Email"], data["Số điện thoại"], data["Tình trạng"]
-    ))
+    cursor.execute(INSERT_STUDENT_SQL, student_params(data))
     conn.commit()
+    notify_students_changed([data["MSSV"]])
 
 
+@timed()
 def delete_student_from_db(mssv, cursor, conn):
     """Delete a student from the database."""
     cursor.execute("DELETE FROM students WHERE mssv = ?", (mssv,))
     conn.commit()
+    notify_students_changed([mssv])
+
 
+UPDATE_STUDENT_SQL = '''
+    UPDATE students 
+    SET name = ?, dob = ?, gender = ?, faculty = ?, course = ?,
+        program = ?, address = ?, email = ?, phone = ?, status = ?
+    WHERE mssv = ?
+'''
 
+UPSERT_STUDENT_SQL = INSERT_STUDENT_SQL + '''
+    ON CONFLICT(mssv) DO UPDATE SET
+        name = excluded.name, dob = excluded.dob, gender = excluded.gender,
+        faculty = excluded.faculty, course = excluded.course, program = excluded.program,
+        address = excluded.address, email = excluded.email, phone = excluded.phone,
+        status = excluded.status
+'''
+
+def update_params(mssv, data):
+    """Return the UPDATE_STUDENT_SQL parameters for a student `data` dict."""
+    return student_params(data)[1:] + (mssv,)
+
+@timed()
 def update_student_in_db(mssv, data, cursor, conn):
     """Update a student's information in the database."""
-    cursor.execute('''
-        UPDATE students 
-        SET name = ?, dob = ?, gender = ?, faculty = ?, course = ?,
-            program = ?, address = ?, email = ?, phone = ?, status = ?
-        WHERE mssv = ?
-    ''', (
-        data["Họ Tên"], data["Ngày sinh"], data["Giới tính"],
-        data["Khoa"], data["Khóa"], data["Chương trình"],
-        data["Địa chỉ"], data["Email"], data["Số điện thoại"],
-        data["Tình trạng"], mssv
-    ))
+    cursor.execute(UPDATE_STUDENT_SQL, update_params(mssv, data))
     conn.commit()
+    notify_students_changed([mssv])
+
+# Bulk operations: each call runs in a single transaction and returns a list of
+# (mssv, outcome) pairs in input order. Records are validated first, and invalid
+# ones are reported as 'invalid' and left out rather than failing the batch.
 
+SQL_VARIABLE_BATCH = 500
 
+def find_existing_mssvs(cursor, mssvs):
+    """Return the subset of `mssvs` that already exist in the students table."""
+    mssvs = list(mssvs)
+    existing = set()
+    for start in range(0, len(mssvs), SQL_VARIABLE_BATCH):
+        batch = mssvs[start:start + SQL_VARIABLE_BATCH]
+        placeholders = ", ".join("?" * len(batch))
+        cursor.execute(f"SELECT mssv FROM students WHERE mssv IN ({placeholders})", batch)
+        existing.update(row[0] for row in cursor.fetchall())
+    return existing
+
+def find_invalid_records(records, conn, context=None):
+    """Return {index: error} for the student `data` dicts in `records` that fail validation."""
+    from validation import build_validation_context, validate_student_data  # validation imports this module
+
+    context = context or build_validation_context(conn)
+    invalid = {}
+    for index, data in enumerate(records):
+        error = validate_student_data(data, context)
+        if error:
+            invalid[index] = error
+    if invalid:
+        index, error = next(iter(invalid.items()))
+        logger.warning(f"{len(invalid)} of {len(records)} students not written, invalid: "
+                       f"{records[index]['MSSV']}: {error}")
+    return invalid
+
+@timed()
+def add_students_bulk(records, conn, context=None):
+    """Insert many students; rows whose MSSV already exists are reported as 'duplicate'."""
+    records = list(records)
+    invalid = find_invalid_records(records, conn, context)
+    cursor = conn.cursor()
+    with conn:
+        seen = find_existing_mssvs(cursor, (data["MSSV"] for data in records))
+        outcomes = []
+        params = []
+        for index, data in enumerate(records):
+            if index in invalid:
+                outcomes.append((data["MSSV"], 'invalid'))
+                continue
+            if data["MSSV"] in seen:
+                outcomes.append((data["MSSV"], 'duplicate'))
+                continue
+            seen.add(data["MSSV"])
+            params.append(student_params(data))
+            outcomes.append((data["MSSV"], 'inserted'))
+        cursor.executemany(INSERT_STUDENT_SQL, params)
+    notify_students_changed([mssv for mssv, outcome in outcomes if outcome == 'inserted'])
+    return outcomes
+
+@timed()
+def update_students_bulk(records, conn, context=None):
+    """Update many students by MSSV; unknown MSSVs are reported as 'not_found'."""
+    records = list(records)
+    invalid = find_invalid_records(records, conn, context)
+    cursor = conn.cursor()
+    with conn:
+        existing = find_existing_mssvs(cursor, (data["MSSV"] for data in records))
+        outcomes = [(data["MSSV"], 'invalid' if index in invalid
+                     else 'updated' if data["MSSV"] in existing else 'not_found')
+                    for index, data in enumerate(records)]
+        cursor.executemany(UPDATE_STUDENT_SQL, [update_params(data["MSSV"], data)
+                                                for data, (_, outcome) in zip(records, outcomes)
+                                                if outcome == 'updated'])
+    notify_students_changed([mssv for mssv, outcome in outcomes if outcome == 'updated'])
+    return outcomes
+
+@timed()
+def upsert_students(records, conn, context=None):
+    """Insert new students and update existing ones (matched on MSSV) in one pass."""
+    records = list(records)
+    invalid = find_invalid_records(records, conn, context)
+    cursor = conn.cursor()
+    with conn:
+        seen = find_existing_mssvs(cursor, (data["MSSV"] for data in records))
+        outcomes = []
+        params = []
+        for index, data in enumerate(records):
+            if index in invalid:
+                outcomes.append((data["MSSV"], 'invalid'))
+                continue
+            outcomes.append((data["MSSV"], 'updated' if data["MSSV"] in seen else 'inserted'))
+            seen.add(data["MSSV"])
+            params.append(student_params(data))
+        cursor.executemany(UPSERT_STUDENT_SQL, params)
+    notify_students_changed([mssv for mssv, outcome in outcomes if outcome != 'invalid'])
+    return outcomes
+
+@timed()
+def delete_students_bulk(mssvs, conn):
+    """Delete many students by MSSV.
+
+    Unknown MSSVs are reported as 'not_found', and repeats of an MSSV earlier in
+    the list as 'duplicate'.
+    """
+    mssvs = list(mssvs)
+    cursor = conn.cursor()
+    with conn:
+        existing = find_existing_mssvs(cursor, mssvs)
+        cursor.executemany("DELETE FROM students WHERE mssv = ?", [(mssv,) for mssv in existing])
+    notify_students_changed(list(existing))
+    outcomes, seen = [], set()
+    for mssv in mssvs:
+        if mssv in seen:
+            outcomes.append((mssv, 'duplicate'))
+        else:
+            outcomes.append((mssv, 'deleted' if mssv in existing else 'not_found'))
+            seen.add(mssv)
+    return outcomes
+
+
+@timed()
 def fetch_student_by_mssv(mssv, cursor):
-    """Fetch a student's information by MSSV."""
+    """Fetch a student's information by MSSV, as a Student record (None if not found)."""
+    cursor = student_cursor(cursor.connection)
     cursor.execute("SELECT * FROM students WHERE mssv = ?", (mssv,))
     return cursor.fetchone()
 
-def perform_advanced_search(faculty, name, cursor):
-    """Perform an advanced search based on faculty and name."""
-    if not faculty and not name:
-        return [], "Vui lòng nhập ít nhất một điều kiện tìm kiếm!"
+TREE_COLUMNS = ['mssv', 'name', 'dob', 'gender', 'faculty', 'course', 'program', 'status']
+PAGE_SIZE = 200
 
-    # Build query based on search conditions
-    query = "SELECT * FROM students WHERE 1=1"
-    params = []
+@timed()
+def fetch_students_page(cursor, where="1=1", params=(), after_id=None, before_id=None,
+                        limit=PAGE_SIZE, columns=TREE_COLUMNS):
+    """Fetch one page of students in id order using keyset pagination.
 
-    if faculty:
-        query += " AND faculty = ?"
-        params.append(faculty)
-
-    if name:
-        query += " AND name LIKE ?"
-        params.append(f"%{name}%")
+    Returns rows of (id, *columns) following `after_id`, or preceding `before_id`,
+    so each page costs an index seek regardless of how deep into the table it is.
+    """
+    query = f"SELECT id, {', '.join(columns)} FROM students WHERE ({where})"
+    params = list(params)
+    if before_id is not None:
+        query += " AND id < ? ORDER BY id DESC LIMIT ?"
+        params += [before_id, limit]
+        cursor.execute(query, params)
+        return cursor.fetchall()[::-1]
 
+    if after_id is not None:
+        query += " AND id > ?"
+        params.append(after_id)
+    query += " ORDER BY id LIMIT ?"
+    params.append(limit)
     cursor.execute(query, params)
-    results = cursor.fetchall()
+    return cursor.fetchall()
+
+@timed()
+def fetch_students_by_id(cursor, ids, where="1=1", params=(), columns=TREE_COLUMNS):
+    """Fetch the students with the given ids that match a WHERE clause.
+
+    Returns rows of (id, *columns), as fetch_students_page does, in id order.
+    Ids of deleted or non-matching students are simply absent from the result.
+    """
+    ids = list(ids)
+    rows = []
+    for start in range(0, len(ids), SQL_VARIABLE_BATCH):
+        batch = ids[start:start + SQL_VARIABLE_BATCH]
+        cursor.execute(f'''
+            SELECT id, {', '.join(columns)} FROM students
+            WHERE ({where}) AND id IN ({', '.join('?' * len(batch))})
+        ''', [*params, *batch])
+        rows.extend(cursor.fetchall())
+    rows.sort()
+    return rows
+
+def build_advanced_search_filter(faculty, name):
+    """Return a WHERE clause and parameters for an advanced search, without ranking."""
+    return build_student_filter(faculty=faculty, name=name)
+
+def build_advanced_search_query(faculty, name, columns=None):
+    """Build the SQL and parameters for an advanced search on faculty and name.
+
+    Names are matched through the full-text index (diacritic-insensitive word
+    prefixes, best matches first) when it is available, otherwise with LIKE.
+    """
+    return build_student_query({'faculty': faculty, 'name': name}, columns=columns)
+
+@timed()
+def perform_advanced_search(faculty, name, cursor, order_by=None, descending=False, limit=None,
+                            offset=None, **filters):
+    """Perform an advanced search based on faculty, name and any other student_query filters.
+
+    Returns all matching Student records, or the first `limit` of them, ordered
+    as query_students orders them.
+    """
+    filters.update(faculty=faculty, name=name)
+    if not any(filters.values()):
+        return [], "Vui lòng nhập ít nhất một điều kiện tìm kiếm!"
+
+    results, _ = query_students(filters, order_by, descending, limit, offset,
+                                db_connection=cursor.connection)
 
     if not results:
         return [], "Không tìm thấy kết quả nào!"
 
-    return results, None
\ No newline at end of file
+    return results, None
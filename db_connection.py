@@ -0,0 +1,176 @@
+import queue
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+from app_logging import logger
+from metrics import InstrumentedConnection, increment, observe
+
+DATABASE_PATH = "students.db"
+POOL_SIZE = 5
+BUSY_TIMEOUT_MS = 5000
+STATEMENT_CACHE_SIZE = 256
+
+# Applied once to every connection when it is opened
+CONNECTION_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'busy_timeout': str(BUSY_TIMEOUT_MS),
+    'cache_size': '-16384',     # 16 MiB per connection
+    'mmap_size': '268435456',   # 256 MiB
+    'temp_store': 'MEMORY'
+}
+
+class ConnectionPool:
+    """A small pool of pre-configured SQLite connections shared across threads.
+
+    A connection is used by one thread at a time: it is checked out with
+    `connection()` (or `acquire()`) and returned to the pool afterwards.
+    """
+
+    def __init__(self, path=DATABASE_PATH, size=POOL_SIZE):
+        self.path = path
+        self.size = size
+        self.opened = 0
+        self._idle = queue.LifoQueue()
+        self._lock = threading.Lock()
+        self._checked_out = set()
+        # Connections that were checked out during close_all(); closed when returned
+        self._retired = set()
+        self._monitor = None
+        self._monitor_lock = threading.Lock()
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=BUSY_TIMEOUT_MS / 1000,
+                               check_same_thread=False,
+                               cached_statements=STATEMENT_CACHE_SIZE,
+                               factory=InstrumentedConnection)
+        for name, value in CONNECTION_PRAGMAS.items():
+            conn.execute(f"PRAGMA {name} = {value}")
+        logger.info(f"Opened database connection {self.opened + 1}/{self.size} to {self.path}")
+        increment('db.connections_opened')
+        return conn
+
+    def acquire(self, timeout=None):
+        """Check out a connection, opening a new one while the pool is below its size."""
+        increment('db.connections_acquired')
+        conn = self._checkout(timeout)
+        with self._lock:
+            self._checked_out.add(conn)
+        return conn
+
+    def _checkout(self, timeout):
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+        with self._lock:
+            if self.opened < self.size:
+                conn = self._connect()
+                self.opened += 1
+                return conn
+        started = time.perf_counter()
+        try:
+            return self._idle.get(timeout=timeout)
+        finally:
+            observe('db.pool_wait', time.perf_counter() - started)
+
+    def release(self, conn):
+        """Return a connection to the pool, rolling back anything left uncommitted."""
+        if conn.in_transaction:
+            conn.rollback()
+        with self._lock:
+            self._checked_out.discard(conn)
+            retired = conn in self._retired
+            if retired:
+                self._retired.discard(conn)
+                self.opened -= 1
+        if retired:
+            conn.close()
+        else:
+            self._idle.put(conn)
+
+    @contextmanager
+    def connection(self):
+        """Context manager that checks a connection out for the duration of the block."""
+        conn = self.acquire()
+        try:
+            yield conn
+        finally:
+            self.release(conn)
+
+    @contextmanager
+    def transaction(self):
+        """Context manager for a pooled connection inside one transaction.
+
+        Commits when the block succeeds and rolls back if it raises.
+        """
+        with self.connection() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield conn
+            except BaseException:
+                conn.rollback()
+                raise
+            conn.commit()
+
+    def data_version(self):
+        """Return a number that changes whenever any connection commits to the database.
+
+        Read with PRAGMA data_version on a dedicated connection that never writes,
+        so commits from the pool's own connections count as well as those from
+        other processes.
+        """
+        with self._monitor_lock:
+            if self._monitor is None:
+                self._monitor = sqlite3.connect(self.path, check_same_thread=False)
+            return self._monitor.execute("PRAGMA data_version").fetchone()[0]
+
+    def close_all(self):
+        """Close every idle connection.
+
+        Connections checked out at the time are closed when they are released,
+        and keep counting towards the pool size until then.
+        """
+        with self._lock:
+            while True:
+                try:
+                    self._idle.get_nowait().close()
+                except queue.Empty:
+                    break
+                self.opened -= 1
+            self._retired |= self._checked_out
+        with self._monitor_lock:
+            if self._monitor is not None:
+                self._monitor.close()
+                self._monitor = None
+
+_pool = None
+_pool_lock = threading.Lock()
+
+def get_pool():
+    """Return the process-wide connection pool, creating it on first use."""
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ConnectionPool()
+    return _pool
+
+def connection():
+    """Check out a pooled connection (context manager)."""
+    return get_pool().connection()
+
+def transaction():
+    """Run a block in a transaction on a pooled connection (context manager)."""
+    return get_pool().transaction()
+
+@contextmanager
+def borrow_connection(db_connection=None):
+    """Yield `db_connection` if given, otherwise a pooled connection."""
+    if db_connection is not None:
+        yield db_connection
+    else:
+        with connection() as conn:
+            yield conn
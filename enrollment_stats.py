@@ -0,0 +1,118 @@
+from app_logging import logger
+from db_connection import borrow_connection
+from metrics import timed
+
+STATS_TABLE = 'enrollment_stats'
+STATS_DIMENSIONS = ('faculty', 'program', 'status')
+
+# Student counts per (faculty, program, status), kept in step with the students
+# table by triggers so reports read one row per combination instead of scanning
+# students. Missing values are stored as '' because the key columns are NOT NULL.
+
+def _key_values(prefix):
+    return ', '.join(f"coalesce({prefix}.{dimension}, '')" for dimension in STATS_DIMENSIONS)
+
+def _key_match(prefix):
+    return ' AND '.join(f"{dimension} = coalesce({prefix}.{dimension}, '')" for dimension in STATS_DIMENSIONS)
+
+def _increment(prefix):
+    return f'''
+        INSERT INTO {STATS_TABLE} ({', '.join(STATS_DIMENSIONS)}, count)
+        VALUES ({_key_values(prefix)}, 1)
+        ON CONFLICT ({', '.join(STATS_DIMENSIONS)}) DO UPDATE SET count = count + 1;
+    '''
+
+def _decrement(prefix):
+    return f'''
+        UPDATE {STATS_TABLE} SET count = count - 1 WHERE {_key_match(prefix)};
+        DELETE FROM {STATS_TABLE} WHERE {_key_match(prefix)} AND count <= 0;
+    '''
+
+STATS_SCHEMA = [
+    f'''
+    CREATE TABLE IF NOT EXISTS {STATS_TABLE} (
+        faculty TEXT NOT NULL,
+        program TEXT NOT NULL,
+        status TEXT NOT NULL,
+        count INTEGER NOT NULL,
+        PRIMARY KEY (faculty, program, status)
+    ) WITHOUT ROWID
+    ''',
+    f'''
+    CREATE TRIGGER IF NOT EXISTS enrollment_stats_insert AFTER INSERT ON students BEGIN
+        {_increment('new')}
+    END
+    ''',
+    f'''
+    CREATE TRIGGER IF NOT EXISTS enrollment_stats_delete AFTER DELETE ON students BEGIN
+        {_decrement('old')}
+    END
+    ''',
+    f'''
+    CREATE TRIGGER IF NOT EXISTS enrollment_stats_update AFTER UPDATE OF {', '.join(STATS_DIMENSIONS)} ON students
+    WHEN {' OR '.join(f"old.{d} IS NOT new.{d}" for d in STATS_DIMENSIONS)} BEGIN
+        {_decrement('old')}
+        {_increment('new')}
+    END
+    '''
+]
+
+def install_enrollment_stats(cursor):
+    """Create the statistics table and its triggers, and fill it from the students table."""
+    for statement in STATS_SCHEMA:
+        cursor.execute(statement)
+    rebuild_enrollment_stats(cursor)
+
+def rebuild_enrollment_stats(cursor):
+    """Recompute every counter from the students table."""
+    cursor.execute(f"DELETE FROM {STATS_TABLE}")
+    cursor.execute(f'''
+        INSERT INTO {STATS_TABLE} ({', '.join(STATS_DIMENSIONS)}, count)
+        SELECT {_key_values('students')}, COUNT(*) FROM students
+        GROUP BY {_key_values('students')}
+    ''')
+    logger.info("Enrollment statistics rebuilt.")
+
+def _check_dimension(dimension):
+    if dimension not in STATS_DIMENSIONS:
+        raise ValueError(f"Danh mục không hợp lệ: {dimension}")
+
+def _filter(filters):
+    clauses, params = [], []
+    for dimension, value in filters.items():
+        if value is not None:
+            _check_dimension(dimension)
+            clauses.append(f"{dimension} = ?")
+            params.append(value)
+    return (' AND '.join(clauses) or '1=1'), params
+
+@timed()
+def get_enrollment_stats(faculty=None, program=None, status=None, db_connection=None):
+    """Return (faculty, program, status, count) rows, optionally filtered on any dimension."""
+    where, params = _filter({'faculty': faculty, 'program': program, 'status': status})
+    with borrow_connection(db_connection) as conn:
+        return conn.execute(f'''
+            SELECT faculty, program, status, count FROM {STATS_TABLE}
+            WHERE {where} ORDER BY faculty, program, status
+        ''', params).fetchall()
+
+@timed()
+def get_enrollment_totals(dimension, db_connection=None, **filters):
+    """Return (value, count) pairs summed over one dimension, e.g. students per faculty.
+
+    Keyword filters restrict the other dimensions: get_enrollment_totals('faculty', status='Đang học').
+    """
+    _check_dimension(dimension)
+    where, params = _filter(filters)
+    with borrow_connection(db_connection) as conn:
+        return conn.execute(f'''
+            SELECT {dimension}, SUM(count) FROM {STATS_TABLE}
+            WHERE {where} GROUP BY {dimension} ORDER BY {dimension}
+        ''', params).fetchall()
+
+def count_students(db_connection=None, **filters):
+    """Return the number of students matching the given faculty/program/status values."""
+    where, params = _filter(filters)
+    with borrow_connection(db_connection) as conn:
+        return conn.execute(f"SELECT coalesce(SUM(count), 0) FROM {STATS_TABLE} WHERE {where}",
+                            params).fetchone()[0]
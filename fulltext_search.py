@@ -0,0 +1,131 @@
+import re
+import sqlite3
+import unicodedata
+
+from app_logging import logger
+from student_record import student_cursor
+
+FTS_TABLE = 'students_fts'
+FTS_FIELDS = ('name', 'address', 'email')
+
+# Set by detect_fulltext_index; searches fall back to LIKE when FTS5 is unavailable
+fts_enabled = False
+
+def fold_vietnamese(text):
+    """Lowercase `text` and strip Vietnamese diacritics ("Nguyễn Đức" -> "nguyen duc")."""
+    decomposed = unicodedata.normalize('NFD', text.replace('đ', 'd').replace('Đ', 'D'))
+    return ''.join(ch for ch in decomposed if not unicodedata.combining(ch)).lower()
+
+def _sql_fold(expr):
+    # unicode61's remove_diacritics strips combining marks but keeps "đ", which is
+    # a separate letter rather than "d" plus a mark, so fold it before indexing.
+    return f"replace(replace({expr}, 'đ', 'd'), 'Đ', 'D')"
+
+def _index_values(prefix):
+    return ', '.join(_sql_fold(f"{prefix}.{field}") for field in FTS_FIELDS)
+
+FTS_SCHEMA = [
+    f'''
+    CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5(
+        {', '.join(FTS_FIELDS)},
+        content='',
+        tokenize='unicode61 remove_diacritics 2'
+    )
+    ''',
+    f'''
+    CREATE TRIGGER IF NOT EXISTS students_fts_insert AFTER INSERT ON students BEGIN
+        INSERT INTO {FTS_TABLE} (rowid, {', '.join(FTS_FIELDS)})
+        VALUES (new.id, {_index_values('new')});
+    END
+    ''',
+    f'''
+    CREATE TRIGGER IF NOT EXISTS students_fts_delete AFTER DELETE ON students BEGIN
+        INSERT INTO {FTS_TABLE} ({FTS_TABLE}, rowid, {', '.join(FTS_FIELDS)})
+        VALUES ('delete', old.id, {_index_values('old')});
+    END
+    ''',
+    f'''
+    CREATE TRIGGER IF NOT EXISTS students_fts_update AFTER UPDATE OF {', '.join(FTS_FIELDS)} ON students BEGIN
+        INSERT INTO {FTS_TABLE} ({FTS_TABLE}, rowid, {', '.join(FTS_FIELDS)})
+        VALUES ('delete', old.id, {_index_values('old')});
+        INSERT INTO {FTS_TABLE} (rowid, {', '.join(FTS_FIELDS)})
+        VALUES (new.id, {_index_values('new')});
+    END
+    '''
+]
+
+def install_fulltext_index(cursor):
+    """Create the FTS5 index and its sync triggers, populating the index if it is new.
+
+    Raises sqlite3.OperationalError if SQLite was built without FTS5.
+    """
+    exists = fulltext_index_exists(cursor)
+    for statement in FTS_SCHEMA:
+        cursor.execute(statement)
+    if not exists:
+        rebuild_fulltext_index(cursor)
+
+def fulltext_index_exists(cursor):
+    """Return True if the FTS5 index table exists."""
+    return cursor.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (FTS_TABLE,)
+    ).fetchone() is not None
+
+def detect_fulltext_index(conn):
+    """Enable full-text search, installing the index if the migrations could not.
+
+    Migration 4 skips the index when SQLite lacks FTS5 and the schema version
+    moves on regardless, so the install is retried here on every start.
+    """
+    global fts_enabled
+    fts_enabled = fulltext_index_exists(conn.cursor())
+    if fts_enabled:
+        return True
+    conn.commit()
+    cursor = conn.cursor()
+    cursor.execute("BEGIN IMMEDIATE")
+    try:
+        install_fulltext_index(cursor)
+        conn.commit()
+    except sqlite3.OperationalError as e:
+        conn.rollback()
+        logger.warning(f"Full-text index not installed, name search falls back to LIKE: {str(e)}")
+        return False
+    logger.info("Full-text index installed.")
+    fts_enabled = True
+    return True
+
+def rebuild_fulltext_index(cursor):
+    """Re-index every student row."""
+    cursor.execute(f"INSERT INTO {FTS_TABLE} ({FTS_TABLE}) VALUES ('delete-all')")
+    cursor.execute(f'''
+        INSERT INTO {FTS_TABLE} (rowid, {', '.join(FTS_FIELDS)})
+        SELECT id, {_index_values('students')} FROM students
+    ''')
+    logger.info("Full-text index rebuilt.")
+
+def build_match_query(text, fields=('name',)):
+    """Build an FTS5 MATCH expression: every word of `text` as a prefix, within `fields`.
+
+    Returns None if `text` contains no searchable words.
+    """
+    tokens = re.findall(r'\w+', fold_vietnamese(text))
+    if not tokens:
+        return None
+    terms = ' AND '.join(f'"{token}"*' for token in tokens)
+    return f"{{{' '.join(fields)}}} : ({terms})"
+
+def search_students_fulltext(text, cursor, fields=('name',), limit=100):
+    """Return Student records matching `text` in `fields`, best matches first."""
+    match = build_match_query(text, fields)
+    if match is None:
+        return []
+    cursor = student_cursor(cursor.connection)
+    cursor.execute(f'''
+        SELECT students.* FROM {FTS_TABLE}
+        JOIN students ON students.id = {FTS_TABLE}.rowid
+        WHERE {FTS_TABLE} MATCH ?
+        ORDER BY {FTS_TABLE}.rank
+        LIMIT ?
+    ''', (match, limit))
+    return cursor.fetchall()
@@ -0,0 +1,157 @@
+import string
+from array import array
+from bisect import bisect_left
+
+from metrics import timed
+
+LOOKUP_BATCH = 500             # keys per IN (...) lookup, below SQLite's host parameter limit
+MERGE_SIZE = 50000             # new keys collected before they are merged into the sorted arrays
+
+# Keys that must be unique among students: column, form label, and the SQL
+# expression they are compared on. Emails compare case-insensitively; SQLite's
+# lower() only folds ASCII, and _key_value folds the same way.
+DEDUP_KEYS = (
+    ('mssv', 'MSSV', 'mssv'),
+    ('email', 'Email', 'lower(email)'),
+    ('phone', 'Số điện thoại', 'phone'),
+)
+
+# mssv already has its UNIQUE index
+DEDUP_INDEX_SCHEMA = [
+    "CREATE INDEX IF NOT EXISTS idx_students_email_lower ON students (lower(email))",
+    "CREATE INDEX IF NOT EXISTS idx_students_phone ON students (phone)",
+]
+
+_ASCII_LOWER = str.maketrans(string.ascii_uppercase, string.ascii_lowercase)
+
+# Import rows are checked against the students already in the database and
+# against the earlier rows of the same file before anything is written, so
+# re-importing mostly-known data costs lookups instead of failed inserts and
+# rollbacks. The database is asked once per chunk, through the indexes, for
+# the chunk's keys only: the cost follows the size of the import, not of the
+# table. Earlier chunks are committed by then, so the same lookup finds their
+# rows, and rows written by anyone else during the import. Within a chunk the
+# keys are compared exactly in a dict.
+#
+# Whether a row is a duplicate is only ever decided by comparing values. To
+# name the earlier row of the file it repeats, every key is also kept as a
+# 64-bit hash() with its row number, 16 bytes per key against about 70 in a
+# dict. Two values sharing a hash can at worst point the report at the wrong
+# row; for a million-row file the chance of that is about one in 10^7.
+
+def install_dedup_indexes(cursor):
+    """Create the indexes used to look up import rows by email and phone."""
+    for statement in DEDUP_INDEX_SCHEMA:
+        cursor.execute(statement)
+
+def _key_value(column, value):
+    return value.translate(_ASCII_LOWER) if column == 'email' else value
+
+class KeySet:
+    """Set of key hashes, each remembering the import row it came from."""
+
+    __slots__ = ('_hashes', '_rows', '_pending')
+
+    def __init__(self):
+        self._hashes = array('q')
+        self._rows = array('q')
+        self._pending = {}
+
+    def __len__(self):
+        return len(self._hashes) + len(self._pending)
+
+    def get(self, key_hash):
+        """Return the row that added `key_hash`, or None if it is new."""
+        row = self._pending.get(key_hash)
+        if row is not None:
+            return row
+        index = bisect_left(self._hashes, key_hash)
+        if index < len(self._hashes) and self._hashes[index] == key_hash:
+            return self._rows[index]
+        return None
+
+    def add(self, key_hash, row):
+        self._pending[key_hash] = row
+        if len(self._pending) >= MERGE_SIZE:
+            self._merge()
+
+    def _merge(self):
+        # Copy the runs between insertion points as slices, so the Python-level
+        # loop is over the new keys only
+        hashes, rows = array('q'), array('q')
+        start = 0
+        for key_hash, row in sorted(self._pending.items()):
+            index = bisect_left(self._hashes, key_hash, start)
+            hashes += self._hashes[start:index]
+            rows += self._rows[start:index]
+            hashes.append(key_hash)
+            rows.append(row)
+            start = index
+        hashes += self._hashes[start:]
+        rows += self._rows[start:]
+        self._hashes, self._rows = hashes, rows
+        self._pending.clear()
+
+class DuplicateFilter:
+    """Classifies import rows as new, duplicate in the file or duplicate in the database.
+
+    Call prepare() with a chunk's rows, then check() each row in order and
+    remember() the ones that will be inserted. Duplicates are written to
+    `report` (row, mssv, field, value, duplicate_of) and counted.
+    """
+
+    def __init__(self, conn, report):
+        self.conn = conn
+        self.report = report
+        self.seen = {column: KeySet() for column, _, _ in DEDUP_KEYS}
+        self.existing = {column: set() for column, _, _ in DEDUP_KEYS}
+        self.chunk = {column: {} for column, _, _ in DEDUP_KEYS}
+        self.in_file = 0
+        self.in_database = 0
+
+    @property
+    def count(self):
+        return self.in_file + self.in_database
+
+    @timed('import_dedup_lookup')
+    def prepare(self, rows):
+        """Find which keys of a chunk's student `data` dicts are already in the database."""
+        for column, label, expr in DEDUP_KEYS:
+            values = list({_key_value(column, data[label]) for data in rows if data[label]})
+            found = set()
+            for start in range(0, len(values), LOOKUP_BATCH):
+                batch = values[start:start + LOOKUP_BATCH]
+                found.update(value for value, in self.conn.execute(
+                    f"SELECT {expr} FROM students WHERE {expr} IN ({', '.join('?' * len(batch))})", batch))
+            self.existing[column] = found
+            self.chunk[column].clear()
+
+    def check(self, row_number, data):
+        """Return the row's keys if it is new; report it and return None if it is a duplicate.
+
+        A new row's keys are only taken as seen once passed to remember().
+        """
+        keys = []
+        for column, label, _ in DEDUP_KEYS:
+            value = data[label]
+            if not value:
+                continue
+            key = _key_value(column, value)
+            first_row = self.chunk[column].get(key)
+            if first_row is None and key in self.existing[column]:
+                first_row = self.seen[column].get(hash(key)) or 'database'
+            if first_row is not None:
+                if first_row == 'database':
+                    self.in_database += 1
+                else:
+                    self.in_file += 1
+                self.report.add(row_number, data["MSSV"], column, value, first_row)
+                return None
+            keys.append((column, key))
+        return keys
+
+    def remember(self, row_number, keys):
+        """Record the keys of a row about to be inserted, so later copies are duplicates."""
+        for column, key in keys:
+            self.chunk[column][key] = row_number
+            self.seen[column].add(hash(key), row_number)
@@ -1,68 +1,32 @@
+import os
 import sqlite3
-import re
 import tkinter as tk
 from tkinter import messagebox, ttk
-from datetime import datetime
-import csv
-import pandas as pd
 from tkinter import filedialog
-import openpyxl
-from fpdf import FPDF  # For PDF generation
-import markdown  # For Markdown generation
 
 from app_logging import logger
-from database_operations import get_config, can_delete_student, add_student_to_db, fetch_student_by_mssv, update_student_in_db, delete_student_from_db, get_valid_options, delete_category, export_student_status, perform_advanced_search
-from database_initialization import conn, cursor
+from database_operations import get_config, add_student_to_db, update_student_in_db, delete_student_from_db, get_valid_options, add_category, delete_category, render_student_status, bump_settings_version, STUDENT_COLUMNS, STUDENT_FIELDS
+from database_initialization import initialize_database, get_connection, get_cursor, close_database
 from validation import validate_student_data
+from bulk_import import import_students_file, load_checkpoint
+from data_export import export_query, ALL_STUDENTS_QUERY
+from certificates import generate_certificates, select_students
+from ui_widgets import VirtualStudentList, ProgressDialog, create_treeview
+from enrollment_stats import get_enrollment_stats, get_enrollment_totals
+from notifications import NotificationDispatcher, default_transports
+from status_history import get_status_timeline
+from student_query import build_student_filter, build_student_query
+from student_repository import get_student
+from prefix_index import get_prefix_index, prefix_search
+from task_runner import TaskRunner
+from db_connection import connection
+import metrics
 
 # Constants
 VERSION = "4.0.0"
 BUILD_DATE = "21/02/2025"  # Update this when building new versions
 VALID_GENDERS = ["Nam", "Nữ", "Khác"]  # Static gender options
-
-def create_treeview(parent, columns, headings):
-    """Create a TreeView widget with scrollbars."""
-    tree = ttk.Treeview(parent, columns=columns, show='headings')
-    vsb = ttk.Scrollbar(parent, orient="vertical", command=tree.yview)
-    hsb = ttk.Scrollbar(parent, orient="horizontal", command=tree.xview)
-    tree.configure(yscrollcommand=vsb.set, xscrollcommand=hsb.set)
-    tree.grid(column=0, row=0, sticky='nsew')
-    vsb.grid(column=1, row=0, sticky='ns')
-    hsb.grid(column=0, row=1, sticky='ew')
-    parent.grid_columnconfigure(0, weight=1)
-    parent.grid_rowconfigure(0, weight=1)
-    for col, heading in headings.items():
-        tree.heading(col, text=heading)
-        tree.column(col, width=100)
-    return tree
-
-def log_status_change(mssv, old_status, new_status):
-    """Log status changes for a student."""
-    logger.info(f"Status change for {mssv}: {old_status} -> {new_status}")
-    # Placeholder for notification logic (e.g., email, SMS)
-
-def send_notification(mssv, message):
-    """Send notifications to a student based on their registered preferences."""
-    cursor.execute("SELECT email, phone, notification_preferences FROM students WHERE mssv = ?", (mssv,))
-    student = cursor.fetchone()
-    if not student:
-        logger.warning(f"Notification failed - Student not found: {mssv}")
-        return
-
-    email, phone, preferences = student
-    preferences = preferences.split(",") if preferences else []
-
-    if "email" in preferences and email:
-        logger.info(f"Sending email to {email}: {message}")
-        # Placeholder for email sending logic
-
-    if "sms" in preferences and phone:
-        logger.info(f"Sending SMS to {phone}: {message}")
-        # Placeholder for SMS sending logic
-
-    if "zalo" in preferences:
-        logger.info(f"Sending Zalo message to {mssv}: {message}")
-        # Placeholder for Zalo API integration
+LIVE_SEARCH_DELAY_MS = 150  # pause in typing before the list is searched
 
 def get_current_valid_options():
     """Retrieve all current valid options for dynamic fields."""
@@ -72,8 +36,13 @@ def get_current_valid_options():
         'program': get_valid_options('program')
     }
 
-def display_student_info_frame(parent, student):
-    """Display student information in a new frame."""
+def load_student_info(task, mssv):
+    """Fetch a student and their status timeline (runs on a reader thread)."""
+    student = get_student(mssv)
+    return student, get_status_timeline(mssv) if student else []
+
+def display_student_info_frame(parent, student, timeline):
+    """Display student information and its status timeline in a new frame."""
     # Clear previous student info if exists
     for widget in parent.winfo_children():
         widget.destroy()
@@ -90,20 +59,20 @@ def display_student_info_frame(parent, student):
 
     # Define fields and their values
     left_fields = [
-        ("MSSV", student[1]),
-        ("Họ Tên", student[2]),
-        ("Ngày sinh", student[3]),
-        ("Giới tính", student[4]),
-        ("Khoa", student[5]),
-        ("Khóa", student[6])
+        ("MSSV", student.mssv),
+        ("Họ Tên", student.name),
+        ("Ngày sinh", student.dob),
+        ("Giới tính", student.gender),
+        ("Khoa", student.faculty),
+        ("Khóa", student.course)
     ]
 
     right_fields = [
-        ("Chương trình", student[7]),
-        ("Địa chỉ", student[8]),
-        ("Email", student[9]),
-        ("Số điện thoại", student[10]),
-        ("Tình trạng", student[11])
+        ("Chương trình", student.program),
+        ("Địa chỉ", student.address),
+        ("Email", student.email),
+        ("Số điện thoại", student.phone),
+        ("Tình trạng", student.status)
     ]
 
     # Display left column information
@@ -120,47 +89,84 @@ def display_student_info_frame(parent, student):
         tk.Label(right_frame, text=value, anchor="w").grid(
             row=i, column=1, sticky="w", padx=5, pady=5)
 
-    return student_info_frame
-
-
-def refresh_tree(tree, cursor):
-    """Refresh the TreeView with the latest data from the database."""
-    # Clear existing items in the TreeView
-    for item in tree.get_children():
-        tree.delete(item)
-
-    # Fetch all students from the database
-    cursor.execute('''
-        SELECT mssv, name, dob, gender, faculty, course, program, status
-        FROM students
-    ''')
-    rows = cursor.fetchall()
-
-    # Insert rows into the TreeView
-    for row in rows:
-        tree.insert('', 'end', values=row)
-
-    logger.info("TreeView refreshed successfully.")
-
-
+    # Status timeline, most recent change first
+    if timeline:
+        history_frame = tk.Frame(student_info_frame)
+        history_frame.pack(side=tk.LEFT, padx=20, pady=10, fill=tk.BOTH, expand=True)
+        tk.Label(history_frame, text="Lịch sử tình trạng:", font=("Arial", 10, "bold")).pack(anchor="w")
+        for changed_at, old_status, new_status in reversed(timeline):
+            tk.Label(history_frame, text=f"{changed_at[:16]}  {old_status or '-'} → {new_status}",
+                     anchor="w").pack(anchor="w")
 
+    return student_info_frame
 
 
 class StudentApp:
     def __init__(self, root):
         logger.info(f"Starting Student Management Application v{VERSION} (Build: {BUILD_DATE})")
         self.root = root
-        school_name = get_config('school_name', 'Trường Đại học ABC')
-        self.root.title(f"{school_name} - Quản Lý Sinh Viên - v{VERSION}")
+        self.root.title(f"Quản Lý Sinh Viên - v{VERSION}")
         self.root.geometry("1000x600")
         
         # Create main container
         self.main_container = tk.Frame(self.root)
         self.main_container.pack(fill=tk.BOTH, expand=True, padx=20, pady=10)
         
+        self.runner = TaskRunner(self.root)
         self.create_main_buttons()
         self.current_frame = None
         self.student_info_frame = None
+        self.student_list = None
+        self.dispatcher = None
+        self.live_search_job = None
+        self.live_search_task = None
+        self.live_query = None
+
+        # Open and migrate the database once the first frame has been drawn
+        self.root.after_idle(self.finish_startup)
+
+    def finish_startup(self):
+        """Initialize the database and show the school name in the title bar."""
+        try:
+            initialize_database()
+        except sqlite3.Error as e:
+            logger.error(f"Database initialization failed: {str(e)}")
+            messagebox.showerror("Lỗi", f"Không thể mở cơ sở dữ liệu: {str(e)}")
+            return
+        school_name = get_config('school_name', 'Trường Đại học ABC')
+        self.root.title(f"{school_name} - Quản Lý Sinh Viên - v{VERSION}")
+        self.dispatcher = NotificationDispatcher(default_transports())
+        self.dispatcher.start()
+
+    def run_in_background(self, title, func, *args, write=False, on_done=None, on_error=None,
+                          describe_progress=None):
+        """Run `func(task, *args)` on the task runner behind a progress dialog.
+
+        `describe_progress(*values)` turns the task's progress values into a
+        (text, fraction) pair for the dialog; fraction may be None if unknown.
+        """
+        dialog = ProgressDialog(self.root, title)
+
+        def progress(*values):
+            text, fraction = describe_progress(*values)
+            dialog.update(text, fraction)
+
+        def done(result):
+            dialog.close()
+            if on_done:
+                on_done(result)
+
+        def failed(error):
+            dialog.close()
+            if on_error:
+                on_error(error)
+            else:
+                messagebox.showerror("Lỗi", str(error))
+
+        task = self.runner.submit(func, *args, write=write, name=title, on_done=done, on_error=failed,
+                                  on_progress=progress if describe_progress else None)
+        dialog.attach(task)
+        return task
 
     def create_main_buttons(self):
         self.btn_frame = tk.Frame(self.main_container)
@@ -177,6 +183,8 @@ class StudentApp:
             ("Tìm Kiếm Sinh Viên", self.show_search_student),
             ("Quản lý Danh mục", self.show_manage_options),
             ("Nhập/Xuất Dữ liệu", self.show_import_export),
+            ("Thống kê", self.show_statistics),
+            ("Hiệu năng", self.show_performance),
             ("Cấu hình hệ thống", self.show_config_management)
         ]
         
@@ -198,6 +206,8 @@ class StudentApp:
         
         self.current_frame = None
         self.student_info_frame = None
+        self.student_list = None
+        self.cancel_live_search()
 
     def show_search_student(self):
         self.clear_frame()
@@ -230,12 +240,40 @@ class StudentApp:
         self.name_search = tk.Entry(advanced_frame)
         self.name_search.pack(side=tk.LEFT, padx=5)
         
-        tk.Button(advanced_frame, text="Tìm kiếm nâng cao", 
+        # Add cohort and status filters
+        filter_frame = tk.Frame(self.current_frame)
+        filter_frame.pack(fill=tk.X, padx=5, pady=5)
+        tk.Label(filter_frame, text="Khóa:").pack(side=tk.LEFT, padx=5)
+        self.course_search = tk.Entry(filter_frame, width=10)
+        self.course_search.pack(side=tk.LEFT, padx=5)
+        tk.Label(filter_frame, text="Tình trạng:").pack(side=tk.LEFT, padx=5)
+        self.status_search = ttk.Combobox(filter_frame, values=get_valid_options('status'))
+        self.status_search.pack(side=tk.LEFT, padx=5)
+
+        tk.Button(filter_frame, text="Tìm kiếm nâng cao", 
                  command=self.advanced_search).pack(side=tk.LEFT, padx=5)
+        self.live_status = tk.Label(filter_frame, text="", fg="gray")
+        self.live_status.pack(side=tk.LEFT, padx=5)
+
+        # Search as you type in the MSSV and name fields
+        self.search_entry.bind('<KeyRelease>', lambda event: self.schedule_live_search(('mssv',), self.search_entry))
+        self.name_search.bind('<KeyRelease>', lambda event: self.schedule_live_search(('name',), self.name_search))
+        self.runner.submit(lambda task: get_prefix_index().refresh(), name='build_prefix_index')
         
         # Add treeview to display results
         self.create_results_tree()
-        tk.Button(self.current_frame, text="Xuất Giấy Xác Nhận", command=self.show_export_confirmation).pack(pady=10)
+        self.last_search = None
+
+        actions_frame = tk.Frame(self.current_frame)
+        actions_frame.pack(pady=10)
+        tk.Button(actions_frame, text="Xuất Giấy Xác Nhận", 
+                 command=self.show_export_confirmation).pack(side=tk.LEFT, padx=5)
+        tk.Button(actions_frame, text="Xuất Giấy Xác Nhận hàng loạt", 
+                 command=self.show_batch_certificates).pack(side=tk.LEFT, padx=5)
+        tk.Button(actions_frame, text="Xuất kết quả ra CSV", 
+                 command=lambda: self.export_search_results('csv')).pack(side=tk.LEFT, padx=5)
+        tk.Button(actions_frame, text="Xuất kết quả ra Excel", 
+                 command=lambda: self.export_search_results('excel')).pack(side=tk.LEFT, padx=5)
 
     def create_results_tree(self):
         """Create a TreeView widget to display search results."""
@@ -254,70 +292,130 @@ class StudentApp:
             "status": "Tình trạng"
         }
         
-        # Convert columns.keys() to a list
-        self.tree = create_treeview(tree_frame, list(columns.keys()), columns)
+        self.student_list = VirtualStudentList(tree_frame, columns, get_cursor(), runner=self.runner)
+        self.tree = self.student_list.tree
         self.tree.bind('<Double-1>', self.show_selected_student)
+        self.student_list.reload()
+        self.student_list.watch()
 
     def show_selected_student(self, event):
         selected_item = self.tree.selection()
         if not selected_item:
             return
         
-        # Get MSSV from selected item
-        mssv = self.tree.item(selected_item[0])['values'][0]
+        # Item ids are MSSVs (the values are converted by Tk and lose leading zeros)
+        mssv = selected_item[0]
         
+        def show(result):
+            student, timeline = result
+            if student:
+                self.student_info_frame = display_student_info_frame(self.main_container, student, timeline)
+
         # Fetch and display full student info
-        cursor.execute("SELECT * FROM students WHERE mssv = ?", (mssv,)) 
-        student = cursor.fetchone()
-        if student:
-            self.student_info_frame = display_student_info_frame(self.main_container, student)
+        self.runner.submit(load_student_info, mssv, name='show_selected_student', on_done=show,
+                           on_error=self.show_database_error)
 
     def advanced_search(self):
-        """Perform an advanced search based on faculty and name."""
+        """Perform an advanced search based on faculty, name, cohort and status."""
         # Ensure the tree is initialized
         if not hasattr(self, 'tree') or self.tree is None:
             messagebox.showerror("Lỗi", "Danh sách kết quả chưa được khởi tạo! Vui lòng mở chức năng tìm kiếm trước.")
             return
 
-        faculty = self.faculty_search.get().strip()
-        name = self.name_search.get().strip()
-
-        # Clear existing items
-        for item in self.tree.get_children():
-            self.tree.delete(item)
+        filters = {
+            'faculty': self.faculty_search.get().strip(),
+            'name': self.name_search.get().strip(),
+            'course': self.course_search.get().strip(),
+            'status': self.status_search.get().strip(),
+        }
 
-        results, error_message = perform_advanced_search(faculty, name, cursor)
+        if not any(filters.values()):
+            messagebox.showwarning("Cảnh báo", "Vui lòng nhập ít nhất một điều kiện tìm kiếm!")
+            return
 
-        if error_message:
-            messagebox.showwarning("Cảnh báo", error_message)
+        def loaded(count):
+            if not count:
+                self.last_search = None
+                messagebox.showwarning("Cảnh báo", "Không tìm thấy kết quả nào!")
+
+        # Only the first page is loaded; the rest is fetched as the user scrolls
+        self.cancel_live_search()
+        self.live_status.config(text="")
+        where, params = build_student_filter(**filters)
+        self.last_search = filters
+        self.student_list.set_filter(where, params, on_loaded=loaded)
+
+    def schedule_live_search(self, fields, entry):
+        """Search once typing pauses; every keystroke restarts the delay."""
+        if self.live_search_job is not None:
+            self.root.after_cancel(self.live_search_job)
+        self.live_search_job = self.root.after(LIVE_SEARCH_DELAY_MS, self.live_search, fields, entry.get().strip())
+
+    def cancel_live_search(self):
+        if self.live_search_job is not None:
+            self.root.after_cancel(self.live_search_job)
+            self.live_search_job = None
+        if self.live_search_task is not None:
+            self.live_search_task.cancel()
+            self.live_search_task = None
+        self.live_query = None
+
+    def live_search(self, fields, text):
+        """Show the students matching `text` in the prefix index, in place of the list."""
+        self.live_search_job = None
+        if self.student_list is None or (fields, text) == self.live_query:
+            return
+        # A newer query supersedes one still running
+        if self.live_search_task is not None:
+            self.live_search_task.cancel()
+            self.live_search_task = None
+        self.live_query = (fields, text)
+
+        if not text:
+            self.live_status.config(text="")
+            self.last_search = None
+            self.student_list.set_filter()
             return
 
-        # Display results in treeview
-        for student in results:
-            self.tree.insert('', 'end', values=(
-                student[1],  # mssv
-                student[2],  # name
-                student[3],  # dob
-                student[4],  # gender
-                student[5],  # faculty
-                student[6],  # course
-                student[7],  # program
-                student[11]  # status
-            ))
+        def run(task):
+            return prefix_search(text, fields, cancel_event=task.cancel_event)
+
+        def done(result):
+            if task is not self.live_search_task or result is None or self.student_list is None:
+                return
+            self.live_search_task = None
+            ids, complete = result
+            where, params = build_student_filter(ids=ids)
+            self.student_list.set_filter(where, params)
+            if not ids:
+                self.live_status.config(text="Không tìm thấy kết quả nào")
+            elif complete:
+                self.live_status.config(text=f"{len(ids)} kết quả")
+            else:
+                self.live_status.config(text=f"Hiển thị {len(ids)} kết quả đầu tiên")
+            # Exports and certificates take exactly the students on screen
+            self.last_search = {'ids': ids} if ids else None
+
+        task = self.runner.submit(run, name='live_search', on_done=done)
+        self.live_search_task = task
 
     def search_student(self):
         mssv = self.search_entry.get().strip()
         if not mssv:
             messagebox.showerror("Lỗi", "Vui lòng nhập MSSV!")
             return
-            
-        student = fetch_student_by_mssv(mssv, cursor)
-        if student:
-            self.student_info_frame = display_student_info_frame(self.main_container, student)
-        else:
-            messagebox.showinfo("Thông báo", "Không tìm thấy sinh viên!")
-            if self.student_info_frame:
-                self.student_info_frame.destroy()
+
+        def show(result):
+            student, timeline = result
+            if student:
+                self.student_info_frame = display_student_info_frame(self.main_container, student, timeline)
+            else:
+                messagebox.showinfo("Thông báo", "Không tìm thấy sinh viên!")
+                if self.student_info_frame:
+                    self.student_info_frame.destroy()
+
+        self.runner.submit(load_student_info, mssv, name='search_student', on_done=show,
+                           on_error=self.show_database_error)
     
     def show_add_student(self):
         self.clear_frame()
@@ -405,9 +503,11 @@ class StudentApp:
 
     def fetch_student_for_update(self):
         mssv = self.mssv_update_entry.get()
-        cursor.execute("SELECT * FROM students WHERE mssv = ?", (mssv,))
-        student = cursor.fetchone()
-        
+        self.runner.submit(lambda task: get_student(mssv), name='fetch_student_for_update',
+                           on_done=lambda student: self.show_update_fields(mssv, student),
+                           on_error=self.show_database_error)
+
+    def show_update_fields(self, mssv, student):
         if not student:
             messagebox.showerror("Lỗi", "Không tìm thấy sinh viên!")
             return
@@ -463,62 +563,81 @@ class StudentApp:
             self.update_entries[field].grid(row=i, column=1, sticky="w", padx=5, pady=2)
 
         # Fill in current values
-        field_indices = {
-            "Họ Tên": 2,
-            "Ngày sinh": 3,
-            "Giới tính": 4,
-            "Khoa": 5,
-            "Khóa": 6,
-            "Chương trình": 7,
-            "Địa chỉ": 8,
-            "Email": 9,
-            "Số điện thoại": 10,
-            "Tình trạng": 11
-        }
-
-        for field, idx in field_indices.items():
-            self.update_entries[field].insert(0, student[idx])
+        for column, field in STUDENT_FIELDS[1:]:
+            self.update_entries[field].insert(0, student[column])
 
         tk.Button(self.update_fields_frame, text="Cập Nhật", 
                  command=lambda: self.update_student(mssv)).pack(pady=10)
 
+    def show_database_error(self, error, message="Lỗi cơ sở dữ liệu"):
+        """on_error callback of background lookups and writes."""
+        if isinstance(error, sqlite3.Error):
+            messagebox.showerror("Lỗi", f"{message}: {str(error)}")
+        else:
+            messagebox.showerror("Lỗi", str(error))
+
+    # Adding, updating and deleting a student run on the runner's writer thread,
+    # after validation there (it may reload the categories). The Tk thread only
+    # reads the form and shows the outcome, so it never waits on the write lock.
+
     def update_student(self, mssv):
         data = {key: entry.get().strip() for key, entry in self.update_entries.items()}
-        error = validate_student_data(data)
-        if error:
-            logger.warning(f"Update failed - {error}")
-            messagebox.showerror("Lỗi", error)
-            return
 
-        try:
-            update_student_in_db(mssv, data, cursor, conn)
+        def run_update(task):
+            error = validate_student_data(data)
+            if error:
+                return error
+            with connection() as conn:
+                update_student_in_db(mssv, data, conn.cursor(), conn)
+            return None
+
+        def finished(error):
+            if error:
+                logger.warning(f"Update failed - {error}")
+                messagebox.showerror("Lỗi", error)
+                return
             logger.info(f"Updated student: {mssv} - {data['Họ Tên']}")
             messagebox.showinfo("Thành công", "Cập nhật thông tin sinh viên thành công!")
-            
             for entry in self.update_entries.values():
                 entry.delete(0, tk.END)
-        except sqlite3.Error as e:
-            logger.error(f"Database error while updating student {mssv}: {str(e)}")
-            messagebox.showerror("Lỗi", f"Lỗi khi cập nhật: {str(e)}")
+
+        def failed(error):
+            logger.error(f"Database error while updating student {mssv}: {str(error)}")
+            self.show_database_error(error, "Lỗi khi cập nhật")
+
+        self.run_in_background("Cập nhật sinh viên", run_update, write=True, on_done=finished,
+                               on_error=failed)
 
     def add_student(self):
         data = {key: entry.get().strip() for key, entry in self.entries.items()}
-        error = validate_student_data(data)
-        if error:
-            logger.warning(f"Invalid student data: {error}")
-            messagebox.showerror("Lỗi", error)
-            return
 
-        try:
-            add_student_to_db(data, cursor, conn)
+        def run_add(task):
+            error = validate_student_data(data)
+            if error:
+                return error
+            with connection() as conn:
+                add_student_to_db(data, conn.cursor(), conn)
+            return None
+
+        def finished(error):
+            if error:
+                logger.warning(f"Invalid student data: {error}")
+                messagebox.showerror("Lỗi", error)
+                return
             logger.info(f"Added new student: {data['MSSV']} - {data['Họ Tên']}")
             messagebox.showinfo("Thành công", "Thêm sinh viên thành công!")
-            
             for entry in self.entries.values():
                 entry.delete(0, tk.END)
-        except sqlite3.IntegrityError:
-            logger.error(f"Failed to add student - Duplicate MSSV: {data['MSSV']}")
-            messagebox.showerror("Lỗi", "MSSV đã tồn tại!")
+
+        def failed(error):
+            if isinstance(error, sqlite3.IntegrityError):
+                logger.error(f"Failed to add student - Duplicate MSSV: {data['MSSV']}")
+                messagebox.showerror("Lỗi", "MSSV đã tồn tại!")
+            else:
+                logger.error(f"Database error while adding student {data['MSSV']}: {str(error)}")
+                self.show_database_error(error, "Lỗi khi thêm")
+
+        self.run_in_background("Thêm sinh viên", run_add, write=True, on_done=finished, on_error=failed)
     
     def delete_student(self):
         mssv = self.mssv_delete_entry.get().strip()
@@ -526,22 +645,31 @@ class StudentApp:
             logger.warning("Delete attempted without MSSV")
             messagebox.showerror("Lỗi", "Vui lòng nhập MSSV!")
             return
-            
-        student = fetch_student_by_mssv(mssv, cursor)
-        if not student:
-            logger.warning(f"Delete attempted - Student not found: {mssv}")
-            messagebox.showerror("Lỗi", "Không tìm thấy sinh viên!")
-            return
-            
-        if messagebox.askyesno("Xác nhận", "Bạn có chắc muốn xóa sinh viên này?"):
-            try:
-                delete_student_from_db(mssv, cursor, conn)
-                logger.info(f"Deleted student: {mssv} - {student[2]}")
-                messagebox.showinfo("Thành công", "Xóa sinh viên thành công!")
-                self.mssv_delete_entry.delete(0, tk.END)
-            except sqlite3.Error as e:
-                logger.error(f"Error deleting student {mssv}: {str(e)}")
-                messagebox.showerror("Lỗi", f"Lỗi khi xóa: {str(e)}")
+
+        def run_delete(task):
+            with connection() as conn:
+                delete_student_from_db(mssv, conn.cursor(), conn)
+
+        def deleted(_):
+            logger.info(f"Deleted student: {mssv}")
+            messagebox.showinfo("Thành công", "Xóa sinh viên thành công!")
+            self.mssv_delete_entry.delete(0, tk.END)
+
+        def failed(error):
+            logger.error(f"Error deleting student {mssv}: {str(error)}")
+            self.show_database_error(error, "Lỗi khi xóa")
+
+        def confirm(student):
+            if not student:
+                logger.warning(f"Delete attempted - Student not found: {mssv}")
+                messagebox.showerror("Lỗi", "Không tìm thấy sinh viên!")
+                return
+            if messagebox.askyesno("Xác nhận", f"Bạn có chắc muốn xóa sinh viên {student.name}?"):
+                self.run_in_background("Xóa sinh viên", run_delete, write=True, on_done=deleted,
+                                       on_error=failed)
+
+        self.runner.submit(lambda task: get_student(mssv), name='delete_student', on_done=confirm,
+                           on_error=self.show_database_error)
 
     def show_manage_options(self):
         self.clear_frame()
@@ -586,9 +714,7 @@ class StudentApp:
             return
         
         try:
-            cursor.execute("INSERT INTO settings (category, value) VALUES (?, ?)", 
-                          (category, value))
-            conn.commit()
+            add_category(category, value)
             listbox.insert(tk.END, value)
             entry.delete(0, tk.END)
             
@@ -606,7 +732,11 @@ class StudentApp:
         
         value = listbox.get(selection[0])
         if messagebox.askyesno("Xác nhận", f"Bạn có chắc muốn xóa '{value}'?"):
-            delete_category(category, value)
+            deleted, message = delete_category(category, value)
+            if not deleted:
+                messagebox.showerror("Lỗi", message)
+                return
+            messagebox.showinfo("Thành công", message)
             listbox.delete(selection[0])
             
             # Update the comboboxes in add/update forms
@@ -657,12 +787,16 @@ class StudentApp:
                  command=lambda: self.export_data('excel')).pack(side=tk.LEFT, padx=5, pady=5)
 
     def refresh_tree(self):
-        """Refresh the TreeView with the latest data from the database."""
-        if not hasattr(self, 'tree') or self.tree is None:
+        """Bring the TreeView up to date with the database.
+
+        Only the students changed since the last refresh are re-read; the list
+        also does this by itself shortly after any commit (see VirtualStudentList.watch).
+        """
+        if not hasattr(self, 'student_list') or self.student_list is None:
             logger.warning("TreeView is not initialized. Cannot refresh.")
             return
 
-        refresh_tree(self.tree, cursor)
+        self.student_list.sync()
 
     def import_data(self, format_type):
         """Import student data from a CSV or Excel file."""
@@ -672,72 +806,51 @@ class StudentApp:
         if not filename:
             return
 
-        logger.info(f"Importing data from {filename}")
-        try:
-            if format_type == 'csv':
-                df = pd.read_csv(filename, dtype={'phone': str})  # Ensure phone is read as a string
+        resume = False
+        checkpoint = load_checkpoint(filename) if format_type == 'csv' else None
+        if checkpoint:
+            resume = messagebox.askyesno(
+                "Tiếp tục nhập",
+                f"Lần nhập trước đã dừng sau dòng {checkpoint['row']}. Tiếp tục từ vị trí đó?")
+
+        def run_import(task):
+            with connection() as import_conn:
+                return import_students_file(filename, format_type, import_conn, resume=resume,
+                                            progress=task.report_progress, cancel_event=task.cancel_event)
+
+        def describe_progress(rows_done, done, total):
+            return f"Đã xử lý {rows_done} dòng", (done / total if total else None)
+
+        def finished(result):
+            if result.get('cancelled'):
+                message = f"Đã hủy nhập dữ liệu sau khi nhập {result['inserted']} sinh viên."
+                if format_type == 'csv':
+                    message += "\nLần nhập sau có thể tiếp tục từ vị trí đã dừng."
             else:
-                df = pd.read_excel(filename, dtype={'phone': str})  # Ensure phone is read as a string
-
-            # Validate column names
-            required_columns = [
-                'mssv', 'name', 'dob', 'gender', 'faculty', 'course',
-                'program', 'address', 'email', 'phone', 'status'
-            ]
-
-            if not all(col in df.columns for col in required_columns):
-                messagebox.showerror("Lỗi", "File không đúng định dạng! Thiếu cột bắt buộc.")
-                return
-
-            # Validate and import data
-            success_count = 0
-            error_count = 0
-
-            for _, row in df.iterrows():
-                data = {
-                    "MSSV": str(row['mssv']),
-                    "Họ Tên": str(row['name']),
-                    "Ngày sinh": str(row['dob']),
-                    "Giới tính": str(row['gender']),
-                    "Khoa": str(row['faculty']),
-                    "Khóa": str(row['course']),
-                    "Chương trình": str(row['program']),
-                    "Địa chỉ": str(row['address']),
-                    "Email": str(row['email']),
-                    "Số điện thoại": str(row['phone']),  # Ensure phone is treated as a string
-                    "Tình trạng": str(row['status'])
-                }
-
-                error = validate_student_data(data)
-                if error:
-                    error_count += 1
-                    messagebox.showerror("Lỗi", error)
-                    continue
-
-                try:
-                    cursor.execute('''
-                        INSERT INTO students (mssv, name, dob, gender, faculty, course,
-                                              program, address, email, phone, status)
-                        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-                    ''', (
-                        data["MSSV"], data["Họ Tên"], data["Ngày sinh"], data["Giới tính"],
-                        data["Khoa"], data["Khóa"], data["Chương trình"], data["Địa chỉ"],
-                        data["Email"], data["Số điện thoại"], data["Tình trạng"]
-                    ))
-                    success_count += 1
-                except sqlite3.IntegrityError:
-                    error_count += 1
-
-            conn.commit()
-            logger.info(f"Import completed: {success_count} successful, {error_count} failed")
-            messagebox.showinfo("Thành công",
-                                f"Đã nhập {success_count} sinh viên!\nLỗi: {error_count} sinh viên")
+                message = (f"Đã nhập {result['inserted']} sinh viên!"
+                           f"\nTrùng lặp (bỏ qua): {result['duplicates']} sinh viên"
+                           f"\nLỗi: {result['rejected']} sinh viên"
+                           f"\nTốc độ: {result['rows_per_sec']:.0f} dòng/giây")
+            if result['duplicate_report_path']:
+                message += f"\nDanh sách trùng lặp: {result['duplicate_report_path']}"
+            if result['report_path']:
+                message += f"\nChi tiết lỗi: {result['report_path']}"
+            messagebox.showinfo("Thành công", message)
+            if self.student_list:
+                self.refresh_tree()
+
+        def failed(error):
+            if isinstance(error, ValueError):
+                messagebox.showerror("Lỗi", str(error))
+            else:
+                messagebox.showerror("Lỗi", f"Lỗi khi đọc file: {str(error)}")
 
-        except Exception as e:
-            logger.error(f"Error during import: {str(e)}")
-            messagebox.showerror("Lỗi", f"Lỗi khi đọc file: {str(e)}")
+        logger.info(f"Importing data from {filename}")
+        self.run_in_background("Nhập dữ liệu", run_import, write=True, on_done=finished,
+                               on_error=failed, describe_progress=describe_progress)
 
-    def export_data(self, format_type):
+    def export_data(self, format_type, query=ALL_STUDENTS_QUERY, params=()):
+        """Export students, or the rows of `query`, to a CSV or Excel file."""
         filename = filedialog.asksaveasfilename(
             filetypes=[('CSV files', '*.csv')] if format_type == 'csv' else [('Excel files', '*.xlsx')]
         )
@@ -745,36 +858,169 @@ class StudentApp:
             return
             
         logger.info(f"Exporting data to {filename}")
-        try:
-            cursor.execute('''
-                SELECT mssv, name, dob, gender, faculty, course,
-                       program, address, email, phone, status
-                FROM students
-            ''')
-            rows = cursor.fetchall()
-            
-            if not rows:
+
+        def run_export(task):
+            with connection() as export_conn:
+                count = export_query(filename, format_type, export_conn, query, params,
+                                     progress=task.report_progress, cancel_event=task.cancel_event)
+            return count, task.cancelled
+
+        def finished(result):
+            count, cancelled = result
+            if cancelled:
+                if os.path.exists(filename):
+                    os.remove(filename)
+                messagebox.showinfo("Thông báo", "Đã hủy xuất dữ liệu.")
+            elif not count:
                 messagebox.showinfo("Thông báo", "Không có dữ liệu để xuất!")
-                return
-                
-            # Convert to DataFrame
-            df = pd.DataFrame(rows, columns=[
-                'mssv', 'name', 'dob', 'gender', 'faculty', 'course',
-                'program', 'address', 'email', 'phone', 'status'
-            ])
-            
-            # Export based on format
-            if format_type == 'csv':
-                df.to_csv(filename, index=False, encoding='utf-8-sig')
             else:
-                df.to_excel(filename, index=False)
-                
-            logger.info(f"Export completed successfully to {filename}")
-            messagebox.showinfo("Thành công", "Xuất dữ liệu thành công!")
-            
-        except Exception as e:
-            logger.error(f"Error during export: {str(e)}")
-            messagebox.showerror("Lỗi", f"Lỗi khi xuất file: {str(e)}")
+                logger.info(f"Export completed successfully to {filename}")
+                messagebox.showinfo("Thành công", f"Xuất dữ liệu thành công! ({count} sinh viên)")
+
+        def failed(error):
+            messagebox.showerror("Lỗi", f"Lỗi khi xuất file: {str(error)}")
+
+        self.run_in_background("Xuất dữ liệu", run_export, on_done=finished, on_error=failed,
+                               describe_progress=lambda count: (f"Đã xuất {count} sinh viên", None))
+
+    def export_search_results(self, format_type):
+        """Export the result set of the last advanced search."""
+        if not getattr(self, 'last_search', None):
+            messagebox.showerror("Lỗi", "Vui lòng thực hiện tìm kiếm nâng cao trước!")
+            return
+
+        query, params = build_student_query(self.last_search, columns=STUDENT_COLUMNS)
+        self.export_data(format_type, query, params)
+
+    def show_statistics(self):
+        """Dashboard of student counts per faculty, program and status."""
+        self.clear_frame()
+        self.current_frame = tk.LabelFrame(self.main_container, text="Thống kê sinh viên")
+        self.current_frame.pack(fill=tk.BOTH, expand=True, pady=10)
+
+        filter_frame = tk.Frame(self.current_frame)
+        filter_frame.pack(fill=tk.X, padx=5, pady=5)
+        tk.Label(filter_frame, text="Tình trạng:").pack(side=tk.LEFT, padx=5)
+        all_statuses = "Tất cả"
+        status_filter = ttk.Combobox(filter_frame, values=[all_statuses] + get_valid_options('status'),
+                                     state="readonly")
+        status_filter.set("Đang học")
+        status_filter.pack(side=tk.LEFT, padx=5)
+        total_label = tk.Label(filter_frame, font=("Arial", 10, "bold"))
+        total_label.pack(side=tk.LEFT, padx=20)
+
+        faculty_frame = tk.LabelFrame(self.current_frame, text="Theo khoa")
+        faculty_frame.pack(side=tk.LEFT, fill=tk.BOTH, expand=True, padx=5, pady=5)
+        faculty_tree = create_treeview(faculty_frame, ['faculty', 'count'],
+                                       {'faculty': 'Khoa', 'count': 'Số sinh viên'})
+
+        detail_frame = tk.LabelFrame(self.current_frame, text="Theo khoa và chương trình")
+        detail_frame.pack(side=tk.LEFT, fill=tk.BOTH, expand=True, padx=5, pady=5)
+        detail_tree = create_treeview(detail_frame, ['faculty', 'program', 'status', 'count'],
+                                      {'faculty': 'Khoa', 'program': 'Chương trình',
+                                       'status': 'Tình trạng', 'count': 'Số sinh viên'})
+
+        def refresh(event=None):
+            status = status_filter.get()
+            status = None if status == all_statuses else status
+            conn = get_connection()
+            faculty_tree.delete(*faculty_tree.get_children())
+            detail_tree.delete(*detail_tree.get_children())
+            total = 0
+            for faculty, count in get_enrollment_totals('faculty', conn, status=status):
+                faculty_tree.insert('', 'end', values=(faculty, count))
+                total += count
+            for row in get_enrollment_stats(status=status, db_connection=conn):
+                detail_tree.insert('', 'end', values=row)
+            total_label.config(text=f"Tổng: {total} sinh viên")
+
+        status_filter.bind("<<ComboboxSelected>>", refresh)
+        refresh()
+
+    def show_performance(self):
+        """Latency, query and connection metrics collected since startup."""
+        self.clear_frame()
+        self.current_frame = tk.LabelFrame(self.main_container, text="Hiệu năng")
+        self.current_frame.pack(fill=tk.BOTH, expand=True, pady=10)
+
+        toolbar = tk.Frame(self.current_frame)
+        toolbar.pack(fill=tk.X, padx=5, pady=5)
+        counters_label = tk.Label(toolbar, anchor='w', justify=tk.LEFT)
+        counters_label.pack(side=tk.LEFT, fill=tk.X, expand=True, padx=5)
+
+        summary_columns = ['count', 'avg_ms', 'p50_ms', 'p95_ms', 'p99_ms', 'max_ms']
+        summary_headings = {'count': 'Số lần', 'avg_ms': 'TB (ms)', 'p50_ms': 'p50 (ms)',
+                            'p95_ms': 'p95 (ms)', 'p99_ms': 'p99 (ms)', 'max_ms': 'Max (ms)'}
+
+        timers_frame = tk.LabelFrame(self.current_frame, text="Thời gian xử lý theo chức năng")
+        timers_frame.pack(fill=tk.BOTH, expand=True, padx=5, pady=5)
+        timers_tree = create_treeview(timers_frame, ['name'] + summary_columns,
+                                      {'name': 'Chức năng', **summary_headings})
+
+        queries_frame = tk.LabelFrame(self.current_frame, text="Truy vấn SQL")
+        queries_frame.pack(fill=tk.BOTH, expand=True, padx=5, pady=5)
+        queries_tree = create_treeview(queries_frame, ['sql'] + summary_columns,
+                                       {'sql': 'Câu lệnh', **summary_headings})
+        queries_tree.column('sql', width=400)
+
+        slow_frame = tk.LabelFrame(self.current_frame,
+                                   text=f"Truy vấn chậm (≥ {metrics.SLOW_QUERY_MS} ms)")
+        slow_frame.pack(fill=tk.BOTH, expand=True, padx=5, pady=5)
+        slow_tree = create_treeview(slow_frame, ['time', 'ms', 'sql', 'parameters'],
+                                    {'time': 'Thời điểm', 'ms': 'ms', 'sql': 'Câu lệnh',
+                                     'parameters': 'Tham số'})
+        slow_tree.column('sql', width=400)
+        plan_label = tk.Label(self.current_frame, anchor='w', justify=tk.LEFT, wraplength=900)
+        plan_label.pack(fill=tk.X, padx=10, pady=5)
+        slow_entries = []
+
+        def summary_values(summary):
+            return [summary['count']] + [f"{summary[column]:.2f}" for column in summary_columns[1:]]
+
+        def refresh():
+            snapshot = metrics.snapshot()
+            gauges = [f"{name}: " + ", ".join(f"{key}={value}" for key, value in values.items())
+                      for name, values in snapshot['gauges'].items()]
+            counters_label.config(text="   ".join([f"{name}: {value}"
+                                                   for name, value in snapshot['counters'].items()] + gauges))
+            for tree in (timers_tree, queries_tree, slow_tree):
+                tree.delete(*tree.get_children())
+            for name, summary in snapshot['timers'].items():
+                timers_tree.insert('', 'end', values=[name] + summary_values(summary))
+            for sql, summary in snapshot['queries'].items():
+                queries_tree.insert('', 'end', values=[sql] + summary_values(summary))
+            slow_entries[:] = reversed(snapshot['slow_queries'])
+            for index, entry in enumerate(slow_entries):
+                slow_tree.insert('', 'end', iid=str(index),
+                                 values=(entry['time'], entry['ms'], entry['sql'], entry['parameters']))
+            plan_label.config(text="")
+
+        def show_plan(event=None):
+            selection = slow_tree.selection()
+            if selection:
+                plan = slow_entries[int(selection[0])]['plan']
+                plan_label.config(text="Query plan: " + ("; ".join(plan) if plan else "không có"))
+
+        def export():
+            filename = filedialog.asksaveasfilename(defaultextension=".json",
+                                                    filetypes=[("JSON files", "*.json")])
+            if not filename:
+                return
+            try:
+                metrics.export_metrics(filename)
+                messagebox.showinfo("Thành công", f"Đã xuất số liệu hiệu năng ra {filename}")
+            except OSError as e:
+                messagebox.showerror("Lỗi", f"Không thể xuất file: {str(e)}")
+
+        def reset():
+            metrics.reset()
+            refresh()
+
+        slow_tree.bind("<<TreeviewSelect>>", show_plan)
+        tk.Button(toolbar, text="Làm mới", command=refresh).pack(side=tk.RIGHT, padx=5)
+        tk.Button(toolbar, text="Đặt lại", command=reset).pack(side=tk.RIGHT, padx=5)
+        tk.Button(toolbar, text="Xuất ra file", command=export).pack(side=tk.RIGHT, padx=5)
+        refresh()
 
     def show_version_info(self):
         """Show version information dialog"""
@@ -803,6 +1049,7 @@ Build Date: {BUILD_DATE}
         canvas.configure(yscrollcommand=scrollbar.set)
         
         # Add config entries
+        cursor = get_cursor()
         cursor.execute("SELECT key, value FROM config")
         self.config_entries = {}
         
@@ -825,12 +1072,14 @@ Build Date: {BUILD_DATE}
 
     def save_config(self):
         try:
+            conn = get_connection()
             for key, entry in self.config_entries.items():
-                cursor.execute(
+                conn.execute(
                     "UPDATE config SET value = ? WHERE key = ?",
                     (entry.get(), key)
                 )
             conn.commit()
+            bump_settings_version()
             messagebox.showinfo("Thành công", "Đã lưu cấu hình!")
         except Exception as e:
             messagebox.showerror("Lỗi", f"Lỗi khi lưu cấu hình: {str(e)}")
@@ -847,10 +1096,100 @@ Build Date: {BUILD_DATE}
         export_frame.geometry("300x150")
 
         tk.Label(export_frame, text="Chọn định dạng xuất:").pack(pady=10)
-        tk.Button(export_frame, text="Xuất HTML", command=lambda: export_student_status(mssv, "html")).pack(pady=5)
-        tk.Button(export_frame, text="Xuất PDF", command=lambda: export_student_status(mssv, "pdf")).pack(pady=5)
+        tk.Button(export_frame, text="Xuất HTML", command=lambda: self.export_student_status(mssv, "html")).pack(pady=5)
+        tk.Button(export_frame, text="Xuất PDF", command=lambda: self.export_student_status(mssv, "pdf")).pack(pady=5)
+
+    def export_student_status(self, mssv, format_type):
+        """Export student status confirmation in the specified format."""
+        if format_type == "html":
+            filename = filedialog.asksaveasfilename(defaultextension=".html", filetypes=[("HTML files", "*.html")])
+        else:
+            filename = filedialog.asksaveasfilename(defaultextension=".pdf", filetypes=[("PDF files", "*.pdf")])
+        if not filename:
+            return
+
+        def render(task):
+            with connection() as export_conn:
+                student = get_student(mssv, export_conn)
+                if not student:
+                    return None
+                school_name = get_config('school_name', 'Trường Đại học ABC', export_conn)
+            render_student_status(student, format_type, filename, school_name)
+            return filename
+
+        def finished(result):
+            if result is None:
+                messagebox.showerror("Lỗi", "Không tìm thấy sinh viên!")
+            else:
+                messagebox.showinfo("Thành công", f"Đã xuất giấy xác nhận ra {filename}")
+
+        self.run_in_background("Xuất Giấy Xác Nhận", render, on_done=finished)
+
+    def show_batch_certificates(self):
+        """Dialog for exporting status confirmations for many students at once."""
+        batch_frame = tk.Toplevel(self.root)
+        batch_frame.title("Xuất Giấy Xác Nhận hàng loạt")
+        batch_frame.geometry("420x360")
+
+        tk.Label(batch_frame, text="Danh sách MSSV (mỗi dòng một MSSV).\n"
+                 "Để trống để dùng kết quả tìm kiếm nâng cao.").pack(pady=5)
+        mssv_text = tk.Text(batch_frame, height=10, width=40)
+        mssv_text.pack(padx=10, pady=5)
+
+        format_var = tk.StringVar(value="html")
+        format_frame = tk.Frame(batch_frame)
+        format_frame.pack(pady=5)
+        tk.Radiobutton(format_frame, text="HTML", variable=format_var, value="html").pack(side=tk.LEFT)
+        tk.Radiobutton(format_frame, text="PDF", variable=format_var, value="pdf").pack(side=tk.LEFT)
+        zip_var = tk.BooleanVar(value=True)
+        tk.Checkbutton(batch_frame, text="Nén thành một file ZIP", variable=zip_var).pack(pady=5)
+
+        def start():
+            mssvs = mssv_text.get("1.0", tk.END).split()
+            if not mssvs and not getattr(self, 'last_search', None):
+                messagebox.showerror("Lỗi", "Vui lòng nhập MSSV hoặc thực hiện tìm kiếm nâng cao trước!",
+                                     parent=batch_frame)
+                return
+            if zip_var.get():
+                output = filedialog.asksaveasfilename(defaultextension=".zip", filetypes=[("ZIP files", "*.zip")])
+            else:
+                output = filedialog.askdirectory()
+            if not output:
+                return
+            batch_frame.destroy()
+            self.export_certificates(output, format_var.get(), mssvs or None)
+
+        tk.Button(batch_frame, text="Xuất", command=start, width=10).pack(pady=10)
+
+    def export_certificates(self, output, format_type, mssvs=None):
+        """Render status confirmations for `mssvs`, or the last advanced search, into `output`."""
+        query, params = (None, ()) if mssvs else build_student_query(self.last_search)
+
+        def render(task):
+            with connection() as export_conn:
+                students = select_students(export_conn.cursor(), mssvs=mssvs, query=query, params=params)
+                school_name = get_config('school_name', 'Trường Đại học ABC', export_conn)
+            return generate_certificates(students, format_type, output, school_name,
+                                         progress=task.report_progress, cancel_event=task.cancel_event)
+
+        def finished(result):
+            message = (f"Đã xuất {result['rendered'] + result['cached']}/{result['total']} giấy xác nhận "
+                       f"ra {output}\n(dùng lại từ bộ nhớ đệm: {result['cached']})")
+            if mssvs and result['total'] < len(set(mssvs)):
+                message += f"\nKhông tìm thấy {len(set(mssvs)) - result['total']} MSSV."
+            if result['failed']:
+                message += f"\nLỗi: {len(result['failed'])} giấy ({result['failed'][0][1]})"
+            if result['cancelled']:
+                message = "Đã hủy. " + message
+            messagebox.showinfo("Thông báo", message)
+
+        logger.info(f"Exporting {format_type} certificates to {output}")
+        self.run_in_background("Xuất Giấy Xác Nhận hàng loạt", render, on_done=finished,
+                               describe_progress=lambda done, total: (f"Đã xuất {done}/{total} giấy xác nhận",
+                                                                      done / total if total else None))
 
 def main():
+    app = None
     try:
         root = tk.Tk()
         app = StudentApp(root)
@@ -866,7 +1205,11 @@ def main():
         
         root.mainloop()
     finally:
-        conn.close()
+        if app is not None:
+            app.runner.shutdown()
+            if app.dispatcher is not None:
+                app.dispatcher.stop()
+        close_database()
 
-if __name__:
+if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1,307 @@
+import functools
+import itertools
+import json
+import sqlite3
+import threading
+import time
+from bisect import bisect_left
+from collections import deque
+from contextlib import contextmanager
+from datetime import datetime
+
+from app_logging import logger
+
+# Histogram bucket upper bounds, in milliseconds; a final bucket holds everything slower
+BUCKETS_MS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+SLOW_QUERY_MS = 100
+SLOW_QUERY_KEEP = 100          # slow queries kept for the performance panel
+EXPLAIN_INTERVAL = 300         # seconds before the same slow statement is explained and logged again
+MAX_QUERY_KEYS = 500           # distinct statements tracked; the rest are counted under "other"
+SQL_PREVIEW_CHARS = 500
+
+# Process-wide, always-on instrumentation. Recording a sample is a bisect and a
+# few integer updates under a lock (about a microsecond), so it stays enabled in
+# production; nothing is written anywhere until snapshot() or export_metrics().
+
+class Histogram:
+    """Latency distribution over fixed buckets, with count, sum and max."""
+
+    __slots__ = ('counts', 'count', 'total', 'max')
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS_MS) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def observe(self, ms):
+        self.counts[bisect_left(BUCKETS_MS, ms)] += 1
+        self.count += 1
+        self.total += ms
+        if ms > self.max:
+            self.max = ms
+
+    def percentile(self, fraction):
+        """Upper bound of the bucket containing the given fraction of samples."""
+        if not self.count:
+            return 0.0
+        rank = fraction * self.count
+        seen = 0
+        for index, bucket_count in enumerate(self.counts):
+            seen += bucket_count
+            if seen >= rank:
+                return min(BUCKETS_MS[index], self.max) if index < len(BUCKETS_MS) else self.max
+        return self.max
+
+    def summary(self):
+        return {
+            'count': self.count,
+            'avg_ms': self.total / self.count if self.count else 0.0,
+            'p50_ms': self.percentile(0.50),
+            'p95_ms': self.percentile(0.95),
+            'p99_ms': self.percentile(0.99),
+            'max_ms': self.max,
+            'total_ms': self.total,
+        }
+
+_lock = threading.Lock()
+_timers = {}
+_queries = {}
+_counters = {}
+_slow_queries = deque(maxlen=SLOW_QUERY_KEEP)
+_explained = {}
+_gauges = {}
+_started = time.time()
+
+def observe(name, seconds, table=_timers):
+    """Record one duration sample for `name`."""
+    with _lock:
+        histogram = table.get(name)
+        if histogram is None:
+            histogram = table[name] = Histogram()
+        histogram.observe(seconds * 1000)
+
+def increment(name, amount=1):
+    """Add `amount` to the counter `name`."""
+    with _lock:
+        _counters[name] = _counters.get(name, 0) + amount
+
+@contextmanager
+def timer(name):
+    """Time the enclosed block under `name`."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe(name, time.perf_counter() - started)
+
+def timed(name=None):
+    """Decorator recording the latency of every call of the function."""
+    def decorate(func):
+        label = name or func.__name__
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                observe(label, time.perf_counter() - started)
+        return wrapper
+    return decorate
+
+def register_gauge(name, func):
+    """Include `func()` under `name` in every snapshot, e.g. a cache's hit/miss stats."""
+    with _lock:
+        _gauges[name] = func
+
+# SQL statements
+
+@functools.lru_cache(maxsize=1024)
+def normalize_sql(sql):
+    return ' '.join(sql.split())
+
+def parameters_shape(parameters):
+    """Describe bound parameters without their values, e.g. "3 × str, int"."""
+    if not parameters:
+        return ''
+    if isinstance(parameters, dict):
+        return ', '.join(f"{key}: {type(value).__name__}" for key, value in parameters.items())
+    types = [type(value).__name__ for value in parameters]
+    if len(types) > 4 and len(set(types)) == 1:
+        return f"{len(types)} × {types[0]}"
+    return ', '.join(types)
+
+def record_query(conn, sql, parameters, seconds):
+    """Count and time one statement; log it with its query plan if it was slow."""
+    key = normalize_sql(sql)
+    ms = seconds * 1000
+    with _lock:
+        histogram = _queries.get(key)
+        if histogram is None:
+            if len(_queries) >= MAX_QUERY_KEYS:
+                key = 'other'
+                histogram = _queries.get(key)
+            if histogram is None:
+                histogram = _queries[key] = Histogram()
+        histogram.observe(ms)
+        _counters['db.queries'] = _counters.get('db.queries', 0) + 1
+        if ms < SLOW_QUERY_MS:
+            return
+        _counters['db.slow_queries'] = _counters.get('db.slow_queries', 0) + 1
+        now = time.time()
+        if now - _explained.get(key, 0) < EXPLAIN_INTERVAL:
+            return
+        _explained[key] = now
+
+    plan = explain_query(conn, sql, parameters)
+    entry = {
+        'time': datetime.now().isoformat(timespec='seconds'),
+        'ms': round(ms, 2),
+        'sql': key[:SQL_PREVIEW_CHARS],
+        'parameters': parameters_shape(parameters),
+        'plan': plan,
+    }
+    with _lock:
+        _slow_queries.append(entry)
+    logger.warning(f"Slow query ({ms:.0f} ms): {entry['sql']} [{entry['parameters']}]"
+                   + (f"\n  plan: {'; '.join(plan)}" if plan else ''),
+                   extra={'operation': 'slow_query'})
+
+def explain_query(conn, sql, parameters):
+    """Return the EXPLAIN QUERY PLAN lines for a statement, or None if it cannot be explained."""
+    if not isinstance(parameters, (tuple, list, dict)):
+        parameters = ()
+    try:
+        cursor = sqlite3.Cursor(conn)
+        rows = cursor.execute("EXPLAIN QUERY PLAN " + sql, parameters).fetchall()
+    except sqlite3.Error:
+        return None
+    return [row[-1] for row in rows]
+
+class InstrumentedCursor(sqlite3.Cursor):
+    """Cursor that times each statement from execute until its rows are fetched."""
+
+    _sql = None
+
+    def execute(self, sql, parameters=()):
+        self._finish()
+        started = time.perf_counter()
+        try:
+            return super().execute(sql, parameters)
+        finally:
+            self._sql, self._parameters = sql, parameters
+            self._elapsed = time.perf_counter() - started
+            if self.description is None:
+                self._finish()
+
+    def executemany(self, sql, seq_of_parameters):
+        self._finish()
+        # A slow statement is explained with its first parameter set; iterators
+        # are peeked rather than copied, so bulk inserts still stream
+        if isinstance(seq_of_parameters, (list, tuple)):
+            first = seq_of_parameters[0] if seq_of_parameters else None
+        else:
+            rows = iter(seq_of_parameters)
+            first = next(rows, None)
+            seq_of_parameters = rows if first is None else itertools.chain((first,), rows)
+        started = time.perf_counter()
+        try:
+            return super().executemany(sql, seq_of_parameters)
+        finally:
+            record_query(self.connection, sql, first, time.perf_counter() - started)
+
+    def fetchone(self):
+        started = time.perf_counter()
+        row = super().fetchone()
+        self._add(started)
+        self._finish()
+        return row
+
+    def fetchmany(self, size=None):
+        size = self.arraysize if size is None else size
+        started = time.perf_counter()
+        rows = super().fetchmany(size)
+        self._add(started)
+        if len(rows) < size:
+            self._finish()
+        return rows
+
+    def fetchall(self):
+        started = time.perf_counter()
+        rows = super().fetchall()
+        self._add(started)
+        self._finish()
+        return rows
+
+    def close(self):
+        self._finish()
+        super().close()
+
+    def __del__(self):
+        # Cursors that are only iterated are recorded when they are discarded
+        try:
+            self._finish()
+        except Exception:
+            pass
+
+    def _add(self, started):
+        if self._sql is not None:
+            self._elapsed += time.perf_counter() - started
+
+    def _finish(self):
+        if self._sql is not None:
+            sql, self._sql = self._sql, None
+            record_query(self.connection, sql, self._parameters, self._elapsed)
+
+class InstrumentedConnection(sqlite3.Connection):
+    """Connection whose cursors, and execute shortcuts, are instrumented."""
+
+    def cursor(self, factory=InstrumentedCursor):
+        return super().cursor(factory)
+
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+# Reporting
+
+def snapshot():
+    """Return every metric as a JSON-serializable dict."""
+    with _lock:
+        gauges = list(_gauges.items())
+    gauges = {name: func() for name, func in gauges}
+    with _lock:
+        return {
+            'generated_at': datetime.now().isoformat(timespec='seconds'),
+            'uptime_seconds': round(time.time() - _started, 1),
+            'buckets_ms': list(BUCKETS_MS),
+            'timers': {name: {**h.summary(), 'buckets': list(h.counts)} for name, h in sorted(_timers.items())},
+            'queries': {sql: h.summary() for sql, h in sorted(_queries.items(), key=lambda item: -item[1].total)},
+            'counters': dict(sorted(_counters.items())),
+            'gauges': gauges,
+            'slow_queries': list(_slow_queries),
+        }
+
+def slow_queries():
+    with _lock:
+        return list(_slow_queries)
+
+def export_metrics(filename):
+    """Write a snapshot of all metrics to `filename` as JSON."""
+    with open(filename, 'w', encoding='utf-8') as f:
+        json.dump(snapshot(), f, ensure_ascii=False, indent=2)
+    logger.info(f"Metrics exported to {filename}")
+
+def reset():
+    """Discard all recorded metrics."""
+    global _started
+    with _lock:
+        _timers.clear()
+        _queries.clear()
+        _counters.clear()
+        _slow_queries.clear()
+        _explained.clear()
+        _started = time.time()
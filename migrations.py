@@ -0,0 +1,167 @@
+import sqlite3
+import time
+
+from app_logging import logger
+from change_tracking import install_change_tracking, upgrade_change_tracking
+from fulltext_search import install_fulltext_index
+from import_dedup import install_dedup_indexes
+from enrollment_stats import install_enrollment_stats
+from notifications import install_notifications
+from status_history import install_status_history
+from student_query import install_query_indexes
+
+# Schema migrations, applied in order. The version of a database is stored in
+# PRAGMA user_version; a migration runs only if its number is above that version.
+
+def _migration_base_schema(cursor):
+    """Base tables: students, settings and config."""
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS students (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            mssv TEXT UNIQUE NOT NULL,
+            name TEXT NOT NULL,
+            dob TEXT,
+            gender TEXT,
+            faculty TEXT,
+            course TEXT,
+            program TEXT,
+            address TEXT,
+            email TEXT,
+            phone TEXT,
+            status TEXT
+        )
+    ''')
+
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS settings (
+            category TEXT,
+            value TEXT,
+            UNIQUE(category, value)
+        )
+    ''')
+
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS config (
+            key TEXT PRIMARY KEY,
+            value TEXT,
+            description TEXT
+        )
+    ''')
+
+def _migration_created_at(cursor):
+    """Add students.created_at, used by can_delete_student."""
+    # ALTER TABLE cannot add a column with a non-constant default, so new rows get
+    # their timestamp from INSERT_STUDENT_SQL. Existing rows keep NULL: their
+    # creation time is unknown and they are outside any deletion window anyway.
+    if not _has_column(cursor, 'students', 'created_at'):
+        cursor.execute("ALTER TABLE students ADD COLUMN created_at TEXT")
+
+def _migration_category_indexes(cursor):
+    """Secondary indexes for the category filters used by search and delete_category."""
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_students_faculty_program_status "
+                   "ON students (faculty, program, status)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_students_status ON students (status)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_students_program ON students (program)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_students_course ON students (course)")
+
+def _migration_fulltext_index(cursor):
+    """FTS5 index over name, address and email."""
+    try:
+        install_fulltext_index(cursor)
+    except sqlite3.OperationalError as e:
+        logger.warning(f"Skipping full-text index, FTS5 unavailable (retried at startup): {str(e)}")
+
+def _migration_enrollment_stats(cursor):
+    """Enrollment counters per faculty, program and status, maintained by triggers."""
+    install_enrollment_stats(cursor)
+
+def _migration_notifications(cursor):
+    """Notification preferences column, outbox table and status-change trigger."""
+    if not _has_column(cursor, 'students', 'notification_preferences'):
+        cursor.execute("ALTER TABLE students ADD COLUMN notification_preferences TEXT")
+    install_notifications(cursor)
+
+def _migration_status_history(cursor):
+    """Status history table, indexed by student and by new status, recorded by trigger."""
+    install_status_history(cursor)
+
+def _migration_change_tracking(cursor):
+    """Change log of inserted, updated and deleted students, written by triggers."""
+    install_change_tracking(cursor)
+
+def _migration_query_indexes(cursor):
+    """Indexes for cohort and status filters, birth date ranges and email domains."""
+    install_query_indexes(cursor)
+
+def _migration_dedup_indexes(cursor):
+    """Indexes on email and phone for the duplicate check of imports."""
+    install_dedup_indexes(cursor)
+
+def _migration_change_log_old_values(cursor):
+    """MSSV and name before each update and delete in the change log."""
+    upgrade_change_tracking(cursor)
+
+MIGRATIONS = [
+    (1, _migration_base_schema),
+    (2, _migration_created_at),
+    (3, _migration_category_indexes),
+    (4, _migration_fulltext_index),
+    (5, _migration_enrollment_stats),
+    (6, _migration_notifications),
+    (7, _migration_status_history),
+    (8, _migration_change_tracking),
+    (9, _migration_query_indexes),
+    (10, _migration_dedup_indexes),
+    (11, _migration_change_log_old_values),
+]
+
+SCHEMA_VERSION = MIGRATIONS[-1][0]
+
+def _has_column(cursor, table, column):
+    return any(row[1] == column for row in cursor.execute(f"PRAGMA table_info({table})"))
+
+def get_schema_version(conn):
+    """Return the schema version recorded in the database."""
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+def migrate(conn, progress=None):
+    """Upgrade the database in place to SCHEMA_VERSION.
+
+    All pending migrations run in a single transaction, so an interrupted upgrade
+    leaves the database at its previous version. `progress(done, total, description)`
+    is called before each migration and once more when all are applied.
+    Returns the resulting schema version.
+    """
+    current = get_schema_version(conn)
+    pending = [(version, step) for version, step in MIGRATIONS if version > current]
+    if not pending:
+        return current
+
+    logger.info(f"Migrating database from schema version {current} to {SCHEMA_VERSION}")
+    conn.commit()
+    cursor = conn.cursor()
+    cursor.execute("BEGIN IMMEDIATE")
+    try:
+        for done, (version, step) in enumerate(pending):
+            description = step.__doc__.strip()
+            if progress:
+                progress(done, len(pending), description)
+            started = time.perf_counter()
+            step(cursor)
+            logger.info(f"Applied migration {version}: {description} "
+                        f"({time.perf_counter() - started:.2f}s)")
+        cursor.execute(f"PRAGMA user_version = {pending[-1][0]}")
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        logger.error(f"Migration failed, database left at schema version {current}")
+        raise
+
+    if progress:
+        progress(len(pending), len(pending), "Hoàn tất")
+    return pending[-1][0]
+
+if __name__ == "__main__":
+    with sqlite3.connect("students.db") as db:
+        version = migrate(db, lambda done, total, description: print(f"[{done}/{total}] {description}"))
+    print(f"Schema version: {version}")
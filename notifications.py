@@ -0,0 +1,354 @@
+import json
+import os
+import random
+import threading
+import time
+from datetime import datetime
+
+from app_logging import logger
+from db_connection import borrow_connection, get_pool
+
+OUTBOX_TABLE = 'notification_outbox'
+
+# Channel -> students column holding the recipient address for that channel
+CHANNELS = {'email': 'email', 'sms': 'phone', 'zalo': 'mssv'}
+
+BATCH_SIZE = 50
+POLL_INTERVAL = 2.0          # seconds between outbox polls when idle
+MAX_ATTEMPTS = 5
+BACKOFF_BASE = 30.0          # seconds before the first retry, doubled after each failure
+BACKOFF_MAX = 3600.0
+STALE_CLAIM_SECONDS = 600    # 'sending' rows older than this are assumed orphaned by a crash
+RATE_LIMITS = {'email': 10.0, 'sms': 5.0, 'zalo': 5.0}   # messages per second
+
+STATUS_CHANGE_SUBJECT = 'Thay đổi tình trạng sinh viên'
+STATUS_CHANGE_MESSAGE = "Tình trạng sinh viên của bạn (%s) đã thay đổi: %s → %s"
+
+# Notifications are written to an outbox table in the same transaction as the
+# change that causes them, and delivered later by NotificationDispatcher, so a
+# status update for a whole cohort costs one INSERT per recipient and no I/O.
+
+def _wants(prefix, channel):
+    # notification_preferences is a comma-separated list such as "email,sms"
+    return (f"instr(',' || replace({prefix}.notification_preferences, ' ', '') || ',', ',{channel},') > 0 "
+            f"AND coalesce({prefix}.{CHANNELS[channel]}, '') != ''")
+
+def _recipients_select(prefix, where=None):
+    """SELECT of (mssv, channel, recipient) for every channel a student opted into."""
+    return ' UNION ALL '.join(
+        f"SELECT {prefix}.mssv, '{channel}', {prefix}.{column}"
+        + (f" FROM students AS {prefix}" if where else '')
+        + f" WHERE {_wants(prefix, channel)}"
+        + (f" AND {where}" if where else '')
+        for channel, column in CHANNELS.items()
+    )
+
+NOTIFICATION_SCHEMA = [
+    f'''
+    CREATE TABLE IF NOT EXISTS {OUTBOX_TABLE} (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        mssv TEXT NOT NULL,
+        channel TEXT NOT NULL,
+        recipient TEXT NOT NULL,
+        subject TEXT,
+        message TEXT NOT NULL,
+        status TEXT NOT NULL DEFAULT 'pending',
+        attempts INTEGER NOT NULL DEFAULT 0,
+        next_attempt_at REAL NOT NULL,
+        last_error TEXT,
+        created_at TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP,
+        sent_at TEXT
+    )
+    ''',
+    f'''
+    CREATE INDEX IF NOT EXISTS idx_notification_outbox_due
+    ON {OUTBOX_TABLE} (channel, status, next_attempt_at)
+    ''',
+    f'''
+    CREATE TRIGGER IF NOT EXISTS notify_status_change AFTER UPDATE OF status ON students
+    WHEN old.status IS NOT new.status AND new.notification_preferences IS NOT NULL BEGIN
+        INSERT INTO {OUTBOX_TABLE} (mssv, channel, recipient, subject, message, next_attempt_at)
+        SELECT recipients.*, '{STATUS_CHANGE_SUBJECT}',
+               printf('{STATUS_CHANGE_MESSAGE}', new.mssv, coalesce(old.status, ''), new.status),
+               CAST(strftime('%s', 'now') AS REAL)
+        FROM ({_recipients_select('new')}) AS recipients;
+    END
+    '''
+]
+
+# Config keys read by default_transports, added to existing databases by the migration
+NOTIFICATION_CONFIG = {
+    'notification_email_transport': 'file',
+    'smtp_host': 'localhost',
+    'smtp_port': '1025',
+}
+
+def install_notifications(cursor):
+    """Create the outbox table, its index and the status-change trigger."""
+    for statement in NOTIFICATION_SCHEMA:
+        cursor.execute(statement)
+    cursor.executemany("INSERT OR IGNORE INTO config (key, value) VALUES (?, ?)", NOTIFICATION_CONFIG.items())
+
+# Enqueueing
+
+def enqueue_notifications(mssvs, message, conn, subject=None):
+    """Queue `message` for every channel each student in `mssvs` opted into.
+
+    Runs in the caller's transaction and returns the number of messages queued;
+    delivery happens later on the dispatcher's threads.
+    """
+    from database_operations import SQL_VARIABLE_BATCH
+
+    mssvs = list(mssvs)
+    now = time.time()
+    queued = 0
+    for start in range(0, len(mssvs), SQL_VARIABLE_BATCH):
+        batch = mssvs[start:start + SQL_VARIABLE_BATCH]
+        placeholders = ", ".join("?" * len(batch))
+        selects = _recipients_select('s', f"s.mssv IN ({placeholders})")
+        cursor = conn.execute(f'''
+            INSERT INTO {OUTBOX_TABLE} (mssv, channel, recipient, subject, message, next_attempt_at)
+            SELECT recipients.*, ?, ?, ? FROM ({selects}) AS recipients
+        ''', [subject, message, now] + batch * len(CHANNELS))
+        queued += cursor.rowcount
+    return queued
+
+def set_notification_preferences(mssv, channels, conn):
+    """Set the channels a student receives notifications on (an empty list opts out).
+
+    Returns False if the student does not exist.
+    """
+    unknown = set(channels) - set(CHANNELS)
+    if unknown:
+        raise ValueError(f"Kênh thông báo không hợp lệ: {', '.join(sorted(unknown))}")
+    cursor = conn.execute("UPDATE students SET notification_preferences = ? WHERE mssv = ?",
+                          (','.join(channels) or None, mssv))
+    return cursor.rowcount > 0
+
+def outbox_summary(db_connection=None):
+    """Return {(channel, status): count} for the outbox."""
+    with borrow_connection(db_connection) as conn:
+        rows = conn.execute(f"SELECT channel, status, COUNT(*) FROM {OUTBOX_TABLE} GROUP BY channel, status")
+        return {(channel, status): count for channel, status, count in rows}
+
+# Transports
+
+class FileTransport:
+    """Stand-in transport that appends messages as JSON lines to <directory>/<channel>.jsonl."""
+
+    def __init__(self, channel, directory='outbox'):
+        self.channel = channel
+        self.path = os.path.join(directory, f"{channel}.jsonl")
+        os.makedirs(directory, exist_ok=True)
+
+    def send_batch(self, messages):
+        with open(self.path, 'a', encoding='utf-8') as f:
+            for message in messages:
+                f.write(json.dumps({**message, 'sent_at': datetime.now().isoformat()}, ensure_ascii=False) + "\n")
+        return [None] * len(messages)
+
+class SmtpTransport:
+    """Email transport delivering a batch over one SMTP session.
+
+    Point it at a local debugging server (e.g. `python -m aiosmtpd -n -l localhost:1025`)
+    to see messages without sending real mail.
+    """
+
+    channel = 'email'
+
+    def __init__(self, host='localhost', port=1025, sender='no-reply@university.edu.vn', timeout=10):
+        self.host = host
+        self.port = port
+        self.sender = sender
+        self.timeout = timeout
+
+    def send_batch(self, messages):
+        import smtplib
+        from email.message import EmailMessage
+
+        errors = []
+        with smtplib.SMTP(self.host, self.port, timeout=self.timeout) as smtp:
+            for message in messages:
+                email = EmailMessage()
+                email['From'] = self.sender
+                email['To'] = message['recipient']
+                email['Subject'] = message['subject'] or STATUS_CHANGE_SUBJECT
+                email.set_content(message['message'])
+                try:
+                    smtp.send_message(email)
+                    errors.append(None)
+                except smtplib.SMTPException as e:
+                    errors.append(str(e))
+        return errors
+
+def default_transports():
+    """Transports configured by the `notification_email_transport`, `smtp_host` and `smtp_port` config keys.
+
+    SMS and Zalo have no gateway integration yet and are written to files.
+    """
+    from database_operations import get_config
+
+    transports = {channel: FileTransport(channel) for channel in CHANNELS}
+    if get_config('notification_email_transport', NOTIFICATION_CONFIG['notification_email_transport']) == 'smtp':
+        transports['email'] = SmtpTransport(get_config('smtp_host', NOTIFICATION_CONFIG['smtp_host']),
+                                            int(get_config('smtp_port', NOTIFICATION_CONFIG['smtp_port'])))
+    return transports
+
+# Dispatching
+
+class RateLimiter:
+    """Token bucket allowing `rate` messages per second with bursts of up to `burst`."""
+
+    def __init__(self, rate, burst=None):
+        self.rate = rate
+        self.capacity = burst or max(rate, 1.0)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+
+    def acquire(self, count, stop_event):
+        """Wait until `count` tokens are available. Returns False if stopped while waiting."""
+        while True:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            needed = min(count, self.capacity)
+            if self.tokens >= needed:
+                self.tokens -= count
+                return True
+            if stop_event.wait((needed - self.tokens) / self.rate):
+                return False
+
+def backoff_delay(attempts):
+    """Seconds to wait before retry number `attempts`, with jitter."""
+    delay = min(BACKOFF_BASE * 2 ** (attempts - 1), BACKOFF_MAX)
+    return delay * random.uniform(0.8, 1.2)
+
+class NotificationDispatcher:
+    """Delivers queued notifications with one background worker per channel.
+
+    Each worker claims due messages for its channel in batches, waits for its
+    rate limiter, hands the batch to the channel's transport and records the
+    outcome: sent, rescheduled with exponential backoff, or failed for good after
+    MAX_ATTEMPTS. Database connections are only held while claiming and recording.
+    """
+
+    def __init__(self, transports, rate_limits=RATE_LIMITS, batch_size=BATCH_SIZE,
+                 poll_interval=POLL_INTERVAL, max_attempts=MAX_ATTEMPTS, pool=None):
+        self.transports = transports
+        self.pool = pool or get_pool()
+        self.limiters = {channel: RateLimiter(rate_limits.get(channel, 5.0)) for channel in transports}
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        self.max_attempts = max_attempts
+        self._stop = threading.Event()
+        self._wake = threading.Event()
+        self._threads = []
+
+    def start(self):
+        self.release_stale_claims()
+        for channel in self.transports:
+            thread = threading.Thread(target=self._run, args=(channel,), daemon=True,
+                                      name=f'notify-{channel}')
+            thread.start()
+            self._threads.append(thread)
+        logger.info(f"Notification dispatcher started for {', '.join(self.transports)}")
+
+    def wake(self):
+        """Check the outbox now instead of at the next poll."""
+        self._wake.set()
+
+    def stop(self, timeout=5.0):
+        self._stop.set()
+        self._wake.set()
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads = []
+
+    def release_stale_claims(self):
+        """Return messages claimed by a worker that never finished them to the queue."""
+        with self.pool.connection() as conn, conn:
+            conn.execute(f"UPDATE {OUTBOX_TABLE} SET status = 'pending' "
+                         f"WHERE status = 'sending' AND next_attempt_at < ?",
+                         (time.time() - STALE_CLAIM_SECONDS,))
+
+    def _run(self, channel):
+        while not self._stop.is_set():
+            try:
+                sent = self.dispatch_once(channel)
+            except Exception as e:
+                logger.error(f"Notification worker {channel} failed: {str(e)}")
+                sent = 0
+            if not sent:
+                self._wake.wait(self.poll_interval)
+                self._wake.clear()
+
+    def dispatch_once(self, channel):
+        """Claim, send and record one batch for `channel`. Returns the batch size."""
+        messages = self._claim(channel)
+        if not messages:
+            return 0
+        if not self.limiters[channel].acquire(len(messages), self._stop):
+            self._release(messages)
+            return 0
+        try:
+            errors = self.transports[channel].send_batch(messages)
+        except Exception as e:
+            errors = [str(e)] * len(messages)
+        self._record(messages, errors)
+        return len(messages)
+
+    def drain(self, channels=None):
+        """Deliver every message that is currently due, on the calling thread."""
+        total = 0
+        for channel in channels or self.transports:
+            while True:
+                sent = self.dispatch_once(channel)
+                if not sent:
+                    break
+                total += sent
+        return total
+
+    def _claim(self, channel):
+        # BEGIN IMMEDIATE takes the write lock before the SELECT, so another
+        # dispatcher (the GUI's, or a `cli.py notifications send` run) cannot
+        # read the same pending rows until these are marked as sending
+        now = time.time()
+        with self.pool.transaction() as conn:
+            rows = conn.execute(f'''
+                SELECT id, mssv, recipient, subject, message, attempts FROM {OUTBOX_TABLE}
+                WHERE channel = ? AND status = 'pending' AND next_attempt_at <= ?
+                ORDER BY next_attempt_at, id LIMIT ?
+            ''', (channel, now, self.batch_size)).fetchall()
+            conn.executemany(f"UPDATE {OUTBOX_TABLE} SET status = 'sending', next_attempt_at = ? "
+                             f"WHERE id = ? AND status = 'pending'",
+                             [(now, row[0]) for row in rows])
+        return [dict(zip(('id', 'mssv', 'recipient', 'subject', 'message', 'attempts'), row),
+                     channel=channel) for row in rows]
+
+    def _release(self, messages):
+        with self.pool.connection() as conn, conn:
+            conn.executemany(f"UPDATE {OUTBOX_TABLE} SET status = 'pending' WHERE id = ?",
+                             [(message['id'],) for message in messages])
+
+    def _record(self, messages, errors):
+        sent, retry, failed = [], [], []
+        for message, error in zip(messages, errors):
+            attempts = message['attempts'] + 1
+            if error is None:
+                sent.append((attempts, message['id']))
+            elif attempts >= self.max_attempts:
+                failed.append((attempts, error, message['id']))
+            else:
+                retry.append((attempts, time.time() + backoff_delay(attempts), error, message['id']))
+
+        with self.pool.connection() as conn, conn:
+            conn.executemany(f"UPDATE {OUTBOX_TABLE} SET status = 'sent', attempts = ?, "
+                             f"sent_at = CURRENT_TIMESTAMP, last_error = NULL WHERE id = ?", sent)
+            conn.executemany(f"UPDATE {OUTBOX_TABLE} SET status = 'pending', attempts = ?, "
+                             f"next_attempt_at = ?, last_error = ? WHERE id = ?", retry)
+            conn.executemany(f"UPDATE {OUTBOX_TABLE} SET status = 'failed', attempts = ?, "
+                             f"last_error = ? WHERE id = ?", failed)
+        for attempts, error, message_id in failed:
+            logger.error(f"Notification {message_id} failed after {attempts} attempts: {error}")
+        if retry:
+            logger.warning(f"{len(retry)} notifications will be retried: {retry[0][2]}")
@@ -0,0 +1,423 @@
+import re
+import threading
+import time
+from array import array
+from bisect import bisect_left, insort
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from itertools import islice
+from operator import le
+
+from app_logging import logger
+from change_tracking import latest_change, read_changes
+from database_operations import add_student_listener
+from db_connection import get_pool
+from fulltext_search import fold_vietnamese
+from metrics import register_gauge, timed
+
+SEARCH_LIMIT = 1000            # students returned per search
+MAX_SYNC_CHANGES = 2000        # beyond this many pending changes, rebuilding is cheaper
+BUILD_BATCH = 50000
+DENSE_RATIO = 64               # words held by more than 1 in 64 students are stored as bitmaps
+TOKEN_CACHE_SIZE = 8           # bitmaps of recently typed words kept between keystrokes
+
+# In-memory prefix index for search-as-you-type over student names and MSSVs.
+#
+# Names are split into words folded like the full-text index ("Nguyễn Đức"
+# -> "nguyen", "duc"). The distinct words are kept sorted, so the words
+# starting with a typed prefix are one bisect away, each with the ids of the
+# students whose name contains it: a sorted array for rare words, or a bitmap
+# over student ids for common ones (at 1 in 64 students the two are the same
+# size). A query matches students whose name has, for every typed word, a word
+# starting with it, the same rule as the FTS5 search: the bitmaps of each
+# typed word's expansions are OR-ed, then the typed words AND-ed, as Python
+# integers, so the work is done in C whatever the number of matches.
+#
+# MSSVs are kept upper-cased in one sorted list, beside an array of ids.
+#
+# Writes are picked up from the student change log (see change_tracking),
+# which records the MSSV and name a student had before each update or delete,
+# so a sync only touches the postings of the students that changed. The
+# index and the log position it reflects are always read in one transaction.
+# database_operations' student listeners queue a sync on the index's own
+# worker thread after each commit, and searches first check PRAGMA
+# data_version for commits made by other processes.
+
+_WORD = re.compile(r'\w+')
+_NONZERO = re.compile(rb'[^\x00]')
+_BITS = [tuple(bit for bit in range(8) if value >> bit & 1) for value in range(256)]
+
+def normalize_mssv(mssv):
+    return mssv.strip().upper()
+
+def _prefix_end(prefix):
+    """Smallest string greater than every string starting with `prefix`."""
+    return prefix[:-1] + chr(ord(prefix[-1]) + 1)
+
+def _set_bit(bitmap, student_id):
+    byte = student_id >> 3
+    if byte >= len(bitmap):
+        bitmap.extend(bytes(byte + 1 - len(bitmap)))
+    bitmap[byte] |= 1 << (student_id & 7)
+
+def _clear_bit(bitmap, student_id):
+    byte = student_id >> 3
+    if byte < len(bitmap):
+        bitmap[byte] &= ~(1 << (student_id & 7))
+
+def _to_bitmap(ids):
+    """Bitmap of a sorted id array, as a bytearray."""
+    bitmap = bytearray((ids[-1] >> 3) + 1 if ids else 0)
+    for student_id in ids:
+        bitmap[student_id >> 3] |= 1 << (student_id & 7)
+    return bitmap
+
+@contextmanager
+def _snapshot(conn):
+    """Make the block's reads see one state of the database."""
+    if conn.in_transaction:
+        yield
+        return
+    conn.execute("BEGIN")
+    try:
+        yield
+    finally:
+        conn.rollback()
+
+def _first_ids(bits, count):
+    """The `count` lowest set bit positions of the integer `bits`."""
+    data = bits.to_bytes((bits.bit_length() + 7) // 8, 'little')
+    ids = []
+    for match in _NONZERO.finditer(data):
+        position = match.start()
+        base = position * 8
+        ids.extend(base + bit for bit in _BITS[data[position]])
+        if len(ids) >= count:
+            break
+    return ids[:count]
+
+class PrefixIndex:
+    """Prefix index over folded name words and MSSVs, in memory."""
+
+    def __init__(self, pool=None):
+        self.pool = pool or get_pool()
+        self._lock = threading.Lock()
+        self._build_lock = threading.Lock()
+        self._folded = {}              # name piece -> its folded words, shared by every name using it
+        self._words = []               # sorted distinct folded words
+        self._postings = {}            # word -> sorted array of student ids, or bytearray bitmap
+        self._mssvs = []               # sorted normalized MSSVs
+        self._mssv_ids = array('q')    # student id of each entry in _mssvs
+        self._max_id = 0               # largest id ever indexed; ids are never reused
+        self._token_cache = {}         # typed word -> bitmap integer, least recently used first
+        self._data_version = None
+        self._sync_worker = ThreadPoolExecutor(1, thread_name_prefix='prefix-index')
+        self._sync_queued = False
+        self.seq = None                # last change log entry reflected in the index
+        self.builds = 0
+        self.syncs = 0
+        self.build_seconds = None
+
+    @contextmanager
+    def _borrow(self, db_connection):
+        if db_connection is not None:
+            yield db_connection
+        else:
+            with self.pool.connection() as conn:
+                yield conn
+
+    @property
+    def ready(self):
+        return self.seq is not None
+
+    def _name_words(self, name):
+        words = []
+        for piece in (name or '').split():
+            folded = self._folded.get(piece)
+            if folded is None:
+                folded = self._folded[piece] = tuple(_WORD.findall(fold_vietnamese(piece)))
+            words.extend(folded)
+        return words
+
+    # Building and syncing
+
+    def build(self, db_connection=None):
+        """Index every student, replacing the current contents."""
+        with self._build_lock:
+            started = time.perf_counter()
+            postings = {}
+            max_id = 0
+            with self._borrow(db_connection) as conn, _snapshot(conn):
+                seq = latest_change(conn.cursor())
+                cursor = conn.execute("SELECT id, name FROM students ORDER BY id")
+                while True:
+                    rows = cursor.fetchmany(BUILD_BATCH)
+                    if not rows:
+                        break
+                    for student_id, name in rows:
+                        for word in self._name_words(name):
+                            ids = postings.get(word)
+                            if ids is None:
+                                ids = postings[word] = array('q')
+                            if not ids or ids[-1] != student_id:
+                                ids.append(student_id)
+                    max_id = rows[-1][0]
+
+                # The UNIQUE index on mssv returns them sorted already, unless
+                # some are not upper case
+                mssvs, mssv_ids = [], array('q')
+                cursor = conn.execute("SELECT mssv, id FROM students ORDER BY mssv")
+                while True:
+                    rows = cursor.fetchmany(BUILD_BATCH)
+                    if not rows:
+                        break
+                    for mssv, student_id in rows:
+                        mssvs.append(normalize_mssv(mssv))
+                        mssv_ids.append(student_id)
+            if not all(map(le, mssvs, islice(mssvs, 1, None))):
+                order = sorted(range(len(mssvs)), key=mssvs.__getitem__)
+                mssvs = [mssvs[i] for i in order]
+                mssv_ids = array('q', (mssv_ids[i] for i in order))
+            for word, ids in postings.items():
+                if len(ids) * DENSE_RATIO > max_id:
+                    postings[word] = _to_bitmap(ids)
+
+            with self._lock:
+                self._words = sorted(postings)
+                self._postings = postings
+                self._mssvs = mssvs
+                self._mssv_ids = mssv_ids
+                self._max_id = max_id
+                self._token_cache = {}
+                self.seq = seq
+                self.builds += 1
+                self.build_seconds = round(time.perf_counter() - started, 3)
+            logger.info(f"Prefix index built: {len(mssvs)} students, {len(postings)} words "
+                        f"in {self.build_seconds:.2f}s")
+
+    def sync(self, db_connection=None, rebuild=True):
+        """Apply the changes logged since the last build or sync.
+
+        When the log no longer reaches back that far or holds more than
+        MAX_SYNC_CHANGES changes, rebuilds instead, or with `rebuild=False`
+        leaves that to a later call. Does nothing before the first build.
+        """
+        if not self.ready:
+            return
+        with self._borrow(db_connection) as conn, _snapshot(conn):
+            with self._lock:
+                seq = self.seq
+            changes = read_changes(conn.cursor(), seq, limit=MAX_SYNC_CHANGES)
+            # The first change of each student tells what the index holds for
+            # it: nothing if it was inserted, else its MSSV and name before the
+            # change. Changes logged before migration 11 do not say.
+            indexed = {}
+            for _, student_id, _, op, old_mssv, old_name in changes or ():
+                if student_id not in indexed:
+                    if op != 'I' and old_mssv is None:
+                        changes = None
+                        break
+                    indexed[student_id] = None if op == 'I' else (old_mssv, old_name)
+            if changes is None:
+                if rebuild:
+                    self.build(conn)
+                else:
+                    self._data_version = None   # makes the next refresh() sync
+                return
+            if not changes:
+                return
+            student_ids = list(indexed)
+            rows = []
+            for start in range(0, len(student_ids), 500):
+                batch = student_ids[start:start + 500]
+                rows += conn.execute(f"SELECT id, mssv, name FROM students WHERE id IN "
+                                     f"({', '.join('?' * len(batch))})", batch).fetchall()
+
+        with self._lock:
+            if self.seq != seq:
+                return   # a concurrent sync or build got there first
+            for student_id, old in indexed.items():
+                if old is not None:
+                    self._remove_student(student_id, *old)
+            for student_id, mssv, name in rows:
+                self._add_student(student_id, mssv, name)
+            self._token_cache.clear()
+            self.seq = changes[-1][0]
+            self.syncs += 1
+
+    def _remove_student(self, student_id, mssv, name):
+        for word in set(self._name_words(name)):
+            ids = self._postings.get(word)
+            if ids is None:
+                continue
+            if isinstance(ids, bytearray):
+                _clear_bit(ids, student_id)
+                continue
+            index = bisect_left(ids, student_id)
+            if index < len(ids) and ids[index] == student_id:
+                del ids[index]
+                if not ids:
+                    del self._postings[word]
+                    del self._words[bisect_left(self._words, word)]
+        mssv = normalize_mssv(mssv)
+        index = bisect_left(self._mssvs, mssv)
+        while index < len(self._mssvs) and self._mssvs[index] == mssv:
+            if self._mssv_ids[index] == student_id:
+                del self._mssvs[index], self._mssv_ids[index]
+                return
+            index += 1
+
+    def _add_student(self, student_id, mssv, name):
+        for word in set(self._name_words(name)):
+            ids = self._postings.get(word)
+            if ids is None:
+                ids = self._postings[word] = array('q')
+                insort(self._words, word)
+            if isinstance(ids, bytearray):
+                _set_bit(ids, student_id)
+            elif not ids or ids[-1] < student_id:
+                ids.append(student_id)
+            else:
+                index = bisect_left(ids, student_id)
+                if index == len(ids) or ids[index] != student_id:
+                    ids.insert(index, student_id)
+        mssv = normalize_mssv(mssv)
+        index = bisect_left(self._mssvs, mssv)
+        self._mssvs.insert(index, mssv)
+        self._mssv_ids.insert(index, student_id)
+        self._max_id = max(self._max_id, student_id)
+
+    def students_changed(self, mssvs):
+        """Student listener: queue a sync for the write that was just committed.
+
+        Listeners run on the writing thread, so the sync is left to the index's
+        worker; one sync already queued covers any number of writes. A large
+        write, such as an import chunk, is left for the next search to rebuild from.
+        """
+        if not self.ready:
+            return
+        with self._lock:
+            if self._sync_queued:
+                return
+            self._sync_queued = True
+        self._sync_worker.submit(self._queued_sync)
+
+    def _queued_sync(self):
+        with self._lock:
+            self._sync_queued = False
+        try:
+            self.sync(rebuild=False)
+        except Exception as e:
+            # The next search catches up
+            logger.error(f"Error syncing prefix index: {str(e)}")
+
+    def refresh(self, db_connection=None):
+        """Build the index on first use, then apply changes made since, by anyone."""
+        version = self.pool.data_version()
+        if not self.ready:
+            self.build(db_connection)
+        elif version != self._data_version:
+            self.sync(db_connection)
+        self._data_version = version
+
+    # Searching
+
+    @timed('prefix_search')
+    def search(self, text, fields=('mssv', 'name'), limit=SEARCH_LIMIT, cancel_event=None):
+        """Return (ids, complete) for the students matching `text`, ids ascending.
+
+        With 'mssv' in `fields`, students whose MSSV starts with `text` match;
+        with 'name', students whose name has a word starting with each word of
+        `text`. At most `limit` ids are returned; `complete` is False if more
+        students matched. Returns None if `cancel_event` was set meanwhile.
+        """
+        self.refresh()
+        found = []
+        complete = True
+        with self._lock:
+            if 'mssv' in fields:
+                matched = self._match_mssv(normalize_mssv(text), limit)
+                complete = len(matched) <= limit
+                found += matched[:limit]
+            if 'name' in fields:
+                matched = self._match_name(_WORD.findall(fold_vietnamese(text)), limit, cancel_event)
+                if matched is None:
+                    return None
+                complete = complete and len(matched) <= limit
+                found += matched[:limit]
+        ids = sorted(set(found))
+        return ids[:limit], complete and len(ids) <= limit
+
+    def _match_mssv(self, prefix, limit):
+        """Ids of up to limit + 1 students whose MSSV starts with `prefix`, in MSSV order."""
+        if not prefix:
+            return []
+        start = bisect_left(self._mssvs, prefix)
+        end = bisect_left(self._mssvs, _prefix_end(prefix), start, min(start + limit + 1, len(self._mssvs)))
+        return list(self._mssv_ids[start:end])
+
+    def _match_name(self, tokens, limit, cancel_event):
+        """Ids of up to limit + 1 students matching every token, ascending."""
+        if not tokens:
+            return []
+        bits = -1
+        for token in sorted(set(tokens), key=len, reverse=True):   # longest, likely rarest, first
+            if cancel_event is not None and cancel_event.is_set():
+                return None
+            bits &= self._token_bits(token)
+            if not bits:
+                return []
+        return _first_ids(bits, limit + 1)
+
+    def _token_bits(self, token):
+        """Bitmap, as an integer, of the students with a name word starting with `token`."""
+        bits = self._token_cache.pop(token, None)
+        if bits is None:
+            start = bisect_left(self._words, token)
+            end = bisect_left(self._words, _prefix_end(token), start)
+            bits = 0
+            sparse = bytearray()
+            for word in self._words[start:end]:
+                ids = self._postings[word]
+                if isinstance(ids, bytearray):
+                    bits |= int.from_bytes(ids, 'little')
+                else:
+                    for student_id in ids:
+                        _set_bit(sparse, student_id)
+            if sparse:
+                bits |= int.from_bytes(sparse, 'little')
+            if len(self._token_cache) >= TOKEN_CACHE_SIZE:
+                del self._token_cache[next(iter(self._token_cache))]
+        self._token_cache[token] = bits
+        return bits
+
+    def stats(self):
+        with self._lock:
+            return {
+                'ready': self.ready,
+                'students': len(self._mssvs),
+                'words': len(self._words),
+                'bitmap_words': sum(isinstance(ids, bytearray) for ids in self._postings.values()),
+                'builds': self.builds,
+                'build_seconds': self.build_seconds,
+                'syncs': self.syncs,
+            }
+
+_index = None
+_index_lock = threading.Lock()
+
+def get_prefix_index():
+    """Return the process-wide prefix index, creating it (unbuilt) on first use."""
+    global _index
+    if _index is None:
+        with _index_lock:
+            if _index is None:
+                index = PrefixIndex()
+                add_student_listener(index.students_changed)
+                register_gauge('prefix_index', index.stats)
+                _index = index
+    return _index
+
+def prefix_search(text, fields=('mssv', 'name'), limit=SEARCH_LIMIT, cancel_event=None):
+    """Search the shared prefix index; see PrefixIndex.search."""
+    return get_prefix_index().search(text, fields, limit, cancel_event)
@@ -0,0 +1,75 @@
+from datetime import date, datetime, timedelta
+
+from db_connection import borrow_connection
+from metrics import timed
+
+HISTORY_TABLE = 'status_history'
+
+# Every change of students.status is recorded by a trigger, so the history row is
+# written in the same transaction as the update that caused it, whichever code
+# path ran the UPDATE. Timestamps are local time, 'YYYY-MM-DD HH:MM:SS.SSS'.
+
+HISTORY_SCHEMA = [
+    f'''
+    CREATE TABLE IF NOT EXISTS {HISTORY_TABLE} (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        mssv TEXT NOT NULL,
+        old_status TEXT,
+        new_status TEXT,
+        changed_at TEXT NOT NULL
+    )
+    ''',
+    f"CREATE INDEX IF NOT EXISTS idx_status_history_mssv ON {HISTORY_TABLE} (mssv, changed_at)",
+    f"CREATE INDEX IF NOT EXISTS idx_status_history_new_status ON {HISTORY_TABLE} (new_status, changed_at)",
+    f'''
+    CREATE TRIGGER IF NOT EXISTS status_history_update AFTER UPDATE OF status ON students
+    WHEN old.status IS NOT new.status BEGIN
+        INSERT INTO {HISTORY_TABLE} (mssv, old_status, new_status, changed_at)
+        VALUES (new.mssv, old.status, new.status, strftime('%Y-%m-%d %H:%M:%f', 'now', 'localtime'));
+    END
+    '''
+]
+
+def install_status_history(cursor):
+    """Create the status history table, its indexes and the recording trigger."""
+    for statement in HISTORY_SCHEMA:
+        cursor.execute(statement)
+
+def _timestamp(value, end=False):
+    """Format a datetime, date or ISO string as a changed_at bound.
+
+    A date used as an end bound includes the whole day.
+    """
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value) if 'T' in value or ' ' in value else date.fromisoformat(value)
+    if not isinstance(value, datetime):
+        value = datetime.combine(value + timedelta(days=1) if end else value, datetime.min.time())
+    return value.strftime('%Y-%m-%d %H:%M:%S')
+
+@timed()
+def get_status_timeline(mssv, db_connection=None):
+    """Return a student's status changes as (changed_at, old_status, new_status), oldest first."""
+    with borrow_connection(db_connection) as conn:
+        return conn.execute(f'''
+            SELECT changed_at, old_status, new_status FROM {HISTORY_TABLE}
+            WHERE mssv = ? ORDER BY changed_at, id
+        ''', (mssv,)).fetchall()
+
+@timed()
+def find_status_changes(new_status, start, end, db_connection=None, limit=None):
+    """Return changes to `new_status` between `start` and `end` as (mssv, old_status, changed_at).
+
+    `start` and `end` may be dates, datetimes or ISO strings; date bounds are
+    inclusive of the whole day.
+    """
+    query = f'''
+        SELECT mssv, old_status, changed_at FROM {HISTORY_TABLE}
+        WHERE new_status = ? AND changed_at >= ? AND changed_at < ?
+        ORDER BY changed_at, id
+    '''
+    params = [new_status, _timestamp(start), _timestamp(end, end=True)]
+    if limit is not None:
+        query += " LIMIT ?"
+        params.append(limit)
+    with borrow_connection(db_connection) as conn:
+        return conn.execute(query, params).fetchall()
@@ -0,0 +1,313 @@
+import functools
+import json
+import re
+import threading
+from datetime import date, datetime
+
+import fulltext_search
+from app_logging import logger
+from db_connection import borrow_connection
+from fulltext_search import FTS_TABLE, build_match_query
+from metrics import explain_query, register_gauge, timed
+from student_record import student_cursor, fetch_students
+
+# Filters over a single column, matched with "= ?" for one value or IN for several
+VALUE_FILTERS = ('faculty', 'status', 'program', 'course', 'gender')
+FILTERS = VALUE_FILTERS + ('name', 'dob_from', 'dob_to', 'email_domain', 'ids')
+SHAPE_CACHE_SIZE = 256
+
+# Dates of birth are stored as dd/mm/yyyy, which does not sort; ranges and
+# ordering use this YYYY-MM-DD rewrite instead. Both it and the email domain
+# have expression indexes, which SQLite only uses when a query spells the
+# expression exactly the same way, so these strings are the only spelling.
+DOB_ISO_SQL = "(substr(dob, 7, 4) || '-' || substr(dob, 4, 2) || '-' || substr(dob, 1, 2))"
+EMAIL_DOMAIN_SQL = "lower(substr(email, instr(email, '@') + 1))"
+
+# Sort keys: SQL expression, and how to read the same value off a Student record
+SORT_KEYS = {
+    'id': ('id', lambda student: student.id),
+    'mssv': ('mssv', lambda student: student.mssv),
+    'name': ('name', lambda student: student.name),
+    'dob': (DOB_ISO_SQL, lambda student: _dob_iso(student.dob)),
+    'faculty': ('faculty', lambda student: student.faculty),
+    'course': ('course', lambda student: student.course),
+    'status': ('status', lambda student: student.status),
+    'created_at': ('created_at', lambda student: student.created_at),
+}
+RANK = 'rank'   # best full-text matches first; the default when a name is searched
+
+QUERY_INDEX_SCHEMA = [
+    # Cohort and status, the most common pair of filters, with name for the list order
+    "CREATE INDEX IF NOT EXISTS idx_students_course_status_name ON students (course, status, name)",
+    f"CREATE INDEX IF NOT EXISTS idx_students_dob ON students ({DOB_ISO_SQL})",
+    f"CREATE INDEX IF NOT EXISTS idx_students_email_domain ON students ({EMAIL_DOMAIN_SQL})",
+]
+
+# A query is compiled once per shape: which filters are set (and how many values
+# each IN list has), the order, whether it continues from a cursor, and whether
+# it has a limit and offset. The values themselves are only ever parameters, so
+# every query of one shape is the same SQL string and reuses the connection's
+# prepared statement. The first time a shape runs its plan is checked, and a
+# filtered query that reads the whole table is logged.
+
+def install_query_indexes(cursor):
+    """Create the indexes behind the filters and sort orders of query_students."""
+    for statement in QUERY_INDEX_SCHEMA:
+        cursor.execute(statement)
+
+def _dob_iso(dob):
+    return dob[6:10] + '-' + dob[3:5] + '-' + dob[0:2] if dob is not None else None
+
+def _date_bound(value):
+    """Format a date, ISO string or dd/mm/yyyy string as a YYYY-MM-DD bound."""
+    if isinstance(value, datetime):
+        value = value.date()
+    if isinstance(value, date):
+        return value.isoformat()
+    if '/' in value:
+        return datetime.strptime(value, '%d/%m/%Y').date().isoformat()
+    return date.fromisoformat(value).isoformat()
+
+def _conditions(filters):
+    """Return the shape of the WHERE clause for `filters`, and its parameters in order.
+
+    Empty values ('' or None) are ignored, as the search form leaves them.
+    """
+    unknown = set(filters) - set(FILTERS)
+    if unknown:
+        raise ValueError(f"Điều kiện lọc không hợp lệ: {', '.join(sorted(unknown))}")
+    shape, params = [], []
+    for key in VALUE_FILTERS:
+        value = filters.get(key)
+        if value is None or value == '':
+            continue
+        if isinstance(value, str):
+            shape.append((key, 1))
+            params.append(value)
+        else:
+            values = list(dict.fromkeys(value))
+            shape.append((key, len(values)))
+            params.extend(values)
+
+    name = (filters.get('name') or '').strip()
+    if name:
+        match = build_match_query(name) if fulltext_search.fts_enabled else None
+        if match:
+            shape.append(('name', 'match'))
+            params.append(match)
+        else:
+            shape.append(('name', 'like'))
+            params.append(f"%{name}%")
+
+    for key in ('dob_from', 'dob_to'):
+        if filters.get(key):
+            shape.append((key, 1))
+            params.append(_date_bound(filters[key]))
+
+    domain = (filters.get('email_domain') or '').strip().lstrip('@').lower()
+    if domain:
+        shape.append(('email_domain', 1))
+        params.append(domain)
+
+    # A list of row ids is bound as one JSON array: it can be longer than the
+    # 999 host parameters older SQLite builds allow, and keeps one shape
+    ids = filters.get('ids')
+    if ids is not None:
+        shape.append(('ids', 'json' if ids else 0))
+        if ids:
+            params.append(json.dumps(list(ids)))
+    return tuple(shape), params
+
+def _condition_sql(key, kind):
+    if key == 'name':
+        if kind == 'match':
+            return f"id IN (SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH ?)"
+        return "name LIKE ?"
+    if key == 'dob_from':
+        return f"{DOB_ISO_SQL} >= ?"
+    if key == 'dob_to':
+        return f"{DOB_ISO_SQL} <= ?"
+    if key == 'email_domain':
+        return f"{EMAIL_DOMAIN_SQL} = ?"
+    if key == 'ids' and kind == 'json':
+        return "id IN (SELECT value FROM json_each(?))"
+    if kind == 1:
+        return f"{key} = ?"
+    if kind == 0:
+        return "0"
+    return f"{key} IN ({', '.join('?' * kind)})"
+
+def _where_sql(conditions):
+    return " AND ".join(_condition_sql(key, kind) for key, kind in conditions) or "1=1"
+
+def build_student_filter(**filters):
+    """Return a WHERE clause and parameters selecting the students that match `filters`.
+
+    Filters: faculty, status, program, course and gender take a value or a list
+    of values; name is matched as word prefixes through the full-text index (or
+    LIKE without it); dob_from and dob_to are inclusive dates; email_domain is
+    the part after the "@"; ids is a list of students.id values.
+    """
+    conditions, params = _conditions(filters)
+    return _where_sql(conditions), params
+
+@functools.lru_cache(maxsize=SHAPE_CACHE_SIZE)
+def _compile(conditions, order_by, descending, keyset, limit, offset, columns):
+    """Build the SQL for one query shape; see build_student_query."""
+    select_list = ("students.*" if columns is None
+                   else ", ".join(f"students.{column}" for column in columns))
+    direction = " DESC" if descending else ""
+
+    if order_by == RANK:
+        # The match moves from the WHERE clause into a join that exposes its rank
+        conditions = tuple(condition for condition in conditions if condition[0] != 'name')
+        query = (f"SELECT {select_list} FROM students "
+                 f"JOIN (SELECT rowid, rank FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH ?) AS hits "
+                 f"ON hits.rowid = students.id WHERE {_where_sql(conditions)} "
+                 f"ORDER BY hits.rank{direction}")
+    else:
+        query = f"SELECT {select_list} FROM students WHERE {_where_sql(conditions)}"
+        expr = SORT_KEYS[order_by][0]
+        if order_by == 'id':
+            if keyset:
+                query += f" AND id {'<' if descending else '>'} ?"
+            query += f" ORDER BY id{direction}"
+        else:
+            # NULLs sort first ascending and last descending
+            if keyset == 'value':
+                query += (f" AND (({expr}, id) < (?, ?) OR {expr} IS NULL)" if descending
+                          else f" AND ({expr}, id) > (?, ?)")
+            elif keyset == 'null':
+                query += (f" AND {expr} IS NULL AND id < ?" if descending
+                          else f" AND ({expr} IS NULL AND id > ? OR {expr} IS NOT NULL)")
+            query += f" ORDER BY {expr}{direction}, id{direction}"
+
+    if limit:
+        query += " LIMIT ?"
+        if offset:
+            query += " OFFSET ?"
+    return query
+
+def _resolve_order(order_by, conditions, after):
+    matched = ('name', 'match') in conditions
+    if order_by is None:
+        order_by = RANK if matched else 'id'
+    if order_by == RANK:
+        if after is not None:
+            raise ValueError("Không thể phân trang bằng con trỏ khi sắp xếp theo mức độ phù hợp")
+        return RANK if matched else 'id'
+    if order_by not in SORT_KEYS:
+        raise ValueError(f"Không thể sắp xếp theo: {order_by}")
+    return order_by
+
+def _prepare(filters, order_by, descending, limit, offset, after, columns):
+    conditions, params = _conditions(filters)
+    order_by = _resolve_order(order_by, conditions, after)
+    if order_by == RANK:
+        # The join's MATCH comes before the WHERE clause parameters
+        index = [key for key, _ in conditions].index('name')
+        params.insert(0, params.pop(sum(_parameter_count(kind) for _, kind in conditions[:index])))
+
+    keyset = None
+    if after is not None:
+        value, last_id = after
+        if order_by == 'id':
+            keyset = 'value'
+            params.append(last_id)
+        elif value is None:
+            keyset = 'null'
+            params.append(last_id)
+        else:
+            keyset = 'value'
+            params += [value, last_id]
+    if limit:
+        params.append(limit)
+        if offset:
+            params.append(offset)
+
+    shape = (conditions, order_by, bool(descending), keyset, bool(limit), bool(limit and offset),
+             None if columns is None else tuple(columns))
+    return shape, _compile(*shape), params
+
+def _parameter_count(kind):
+    return kind if isinstance(kind, int) else 1
+
+def build_student_query(filters=None, order_by=None, descending=False, limit=None, offset=None,
+                        after=None, columns=None):
+    """Build the SQL and parameters selecting students that match `filters`.
+
+    `order_by` is one of SORT_KEYS or 'rank'; by default a full-text name search
+    is ranked best first and anything else is in id order. Ties are broken by
+    id. `after` continues from a cursor returned by query_students instead of
+    counting rows with `offset`. Columns default to the whole row.
+    """
+    _, query, params = _prepare(filters or {}, order_by, descending, limit, offset, after, columns)
+    return query, params
+
+_plans_lock = threading.Lock()
+_plans = {}      # shape -> EXPLAIN QUERY PLAN lines, or None if it could not be explained
+_scanning = set()   # (filters, order) that scan the table, logged once whatever the paging
+
+_FULL_SCAN = re.compile(r'^SCAN (TABLE )?students$')
+
+def _check_plan(conn, shape, query, params):
+    """Explain the first query of each shape, logging filtered queries that scan the table."""
+    with _plans_lock:
+        if shape in _plans:
+            return
+        _plans[shape] = None
+    plan = explain_query(conn, query, params)
+    conditions, order_by = shape[0], shape[1]
+    with _plans_lock:
+        _plans[shape] = plan
+        if not conditions or uses_index(plan) or (conditions, order_by) in _scanning:
+            return
+        _scanning.add((conditions, order_by))
+    logger.warning(f"Student query scans the table, no index for filters "
+                   f"{', '.join(key for key, _ in conditions)} ordered by {order_by}: {'; '.join(plan)}",
+                   extra={'operation': 'query_plan'})
+
+def uses_index(plan):
+    """Return True unless an EXPLAIN QUERY PLAN result reads the students table in full.
+
+    A plan that could not be obtained (None) is given the benefit of the doubt.
+    """
+    return not plan or not any(_FULL_SCAN.match(line) for line in plan)
+
+@timed()
+def query_students(filters=None, order_by=None, descending=False, limit=None, offset=None,
+                   after=None, db_connection=None):
+    """Return (students, next cursor) for one page of students matching `filters`.
+
+    Filters, order and paging are as for build_student_query. The cursor is
+    None after the last page; otherwise pass it as `after` to get the next one.
+    Results in rank order have no cursor and page with `offset`.
+    """
+    shape, query, params = _prepare(filters or {}, order_by, descending,
+                                    limit + 1 if limit else None, offset, after, None)
+    with borrow_connection(db_connection) as conn:
+        _check_plan(conn, shape, query, params)
+        cursor = student_cursor(conn)
+        cursor.execute(query, params)
+        students = fetch_students(cursor)
+
+    if not limit or len(students) <= limit:
+        return students, None
+    del students[limit:]
+    if shape[1] == RANK:
+        return students, None
+    last = students[-1]
+    return students, (SORT_KEYS[shape[1]][1](last), last.id)
+
+def query_plans():
+    """Return (shape, plan, index used) for every query shape explained so far."""
+    with _plans_lock:
+        return [(shape, plan, uses_index(plan)) for shape, plan in _plans.items()]
+
+def _stats():
+    info = _compile.cache_info()
+    with _plans_lock:
+        return {'shapes': info.currsize, 'hits': info.hits, 'misses': info.misses,
+                'explained': len(_plans), 'full_scans': len(_scanning)}
+
+register_gauge('student_query', _stats)
@@ -0,0 +1,160 @@
+import gc
+import sys
+import threading
+from contextlib import contextmanager
+
+# Columns of the students table, in SELECT * order
+STUDENT_RECORD_FIELDS = ('id', 'mssv', 'name', 'dob', 'gender', 'faculty', 'course', 'program',
+                         'address', 'email', 'phone', 'status', 'created_at', 'notification_preferences')
+
+# Columns with few distinct values. Their strings are interned as rows are read,
+# so a million students share a handful of "Đang học" objects instead of
+# holding a million copies.
+SHARED_FIELDS = frozenset(('dob', 'gender', 'faculty', 'course', 'program', 'status',
+                           'created_at', 'notification_preferences'))
+
+class Student:
+    """One students row with named fields.
+
+    Produced by student_row_factory. Records are shared, e.g. by the student
+    cache, so treat them as read-only. Integer indexing (student[2]) follows
+    the column order of the table, as with the plain tuples used before.
+    """
+
+    __slots__ = STUDENT_RECORD_FIELDS
+
+    def __init__(self, id=None, mssv=None, name=None, dob=None, gender=None, faculty=None,
+                 course=None, program=None, address=None, email=None, phone=None, status=None,
+                 created_at=None, notification_preferences=None):
+        self.id = id
+        self.mssv = mssv
+        self.name = name
+        self.dob = dob
+        self.gender = gender
+        self.faculty = faculty
+        self.course = course
+        self.program = program
+        self.address = address
+        self.email = email
+        self.phone = phone
+        self.status = status
+        self.created_at = created_at
+        self.notification_preferences = notification_preferences
+
+    def __getitem__(self, key):
+        if isinstance(key, str):
+            return getattr(self, key)
+        return getattr(self, STUDENT_RECORD_FIELDS[key])
+
+    def __iter__(self):
+        return (getattr(self, field) for field in STUDENT_RECORD_FIELDS)
+
+    def __len__(self):
+        return len(STUDENT_RECORD_FIELDS)
+
+    def __eq__(self, other):
+        if not isinstance(other, Student):
+            return NotImplemented
+        return tuple(self) == tuple(other)
+
+    __hash__ = None
+
+    def __reduce__(self):
+        # Compact pickles for the certificate worker processes
+        return (Student, tuple(self))
+
+    def __repr__(self):
+        return f"Student(mssv={self.mssv!r}, name={self.name!r}, status={self.status!r})"
+
+    def as_dict(self):
+        return {field: getattr(self, field) for field in STUDENT_RECORD_FIELDS}
+
+def _shared(value, intern=sys.intern):
+    return intern(value) if value.__class__ is str else value
+
+MAX_LAYOUTS = 64
+
+# Column names per cursor.description, None for the full row. Descriptions
+# compare by value, so connections with different students layouts each get
+# their entry; the last one seen is checked by identity first, which is what
+# every row after the first of a result set hits.
+_layouts = {}
+_last_layout = (None, None)
+
+def student_row_factory(cursor, row, intern=sys.intern, str=str):
+    """sqlite3 row factory building Student records.
+
+    Rows of SELECT * / SELECT students.* take a fast path; any other selection
+    of students columns fills the named fields and leaves the rest None.
+    """
+    global _last_layout
+    description, columns = _last_layout
+    if description is not cursor.description:
+        description = cursor.description
+        try:
+            columns = _layouts[description]
+        except KeyError:
+            names = tuple(column[0] for column in description)
+            columns = None if names == STUDENT_RECORD_FIELDS else names
+            if len(_layouts) >= MAX_LAYOUTS:
+                _layouts.clear()
+            _layouts[description] = columns
+        _last_layout = (description, columns)
+    if columns is not None:
+        return Student(**{column: _shared(value) if column in SHARED_FIELDS else value
+                          for column, value in zip(columns, row)})
+
+    # Unrolled: this runs once per row of every bulk student load
+    (id, mssv, name, dob, gender, faculty, course, program,
+     address, email, phone, status, created_at, notification_preferences) = row
+    return Student(
+        id, mssv, name,
+        intern(dob) if dob.__class__ is str else dob,
+        intern(gender) if gender.__class__ is str else gender,
+        intern(faculty) if faculty.__class__ is str else faculty,
+        intern(course) if course.__class__ is str else course,
+        intern(program) if program.__class__ is str else program,
+        address, email, phone,
+        intern(status) if status.__class__ is str else status,
+        intern(created_at) if created_at.__class__ is str else created_at,
+        intern(notification_preferences) if notification_preferences.__class__ is str
+        else notification_preferences)
+
+def student_cursor(conn):
+    """Return a new cursor on `conn` whose rows are Student records."""
+    cursor = conn.cursor()
+    cursor.row_factory = student_row_factory
+    return cursor
+
+_gc_lock = threading.Lock()
+_gc_pauses = 0
+_gc_was_enabled = False
+
+@contextmanager
+def gc_paused():
+    """Suspend the cyclic garbage collector for the duration of the block.
+
+    Loading a million records triggers thousands of collections that each walk
+    the growing result list; records hold only strings and numbers, so there is
+    nothing for them to find. The collector is process-wide and loads run on
+    worker threads, so pauses are counted: it is enabled again when the last
+    one ends, and only if it was enabled before the first.
+    """
+    global _gc_pauses, _gc_was_enabled
+    with _gc_lock:
+        if not _gc_pauses:
+            _gc_was_enabled = gc.isenabled()
+            gc.disable()
+        _gc_pauses += 1
+    try:
+        yield
+    finally:
+        with _gc_lock:
+            _gc_pauses -= 1
+            if not _gc_pauses and _gc_was_enabled:
+                gc.enable()
+
+def fetch_students(cursor):
+    """fetchall() for a student cursor, with the garbage collector paused."""
+    with gc_paused():
+        return cursor.fetchall()
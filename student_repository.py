@@ -0,0 +1,118 @@
+import threading
+from collections import OrderedDict
+
+from db_connection import borrow_connection, get_pool
+from database_operations import add_student_listener, fetch_student_by_mssv
+from metrics import register_gauge
+
+DEFAULT_CAPACITY = 1024
+
+# Students are cached by MSSV, least recently used first out. Writes through
+# database_operations drop exactly the students they touched (via the student
+# listeners); any other commit to the database, from another process or a
+# connection that bypasses database_operations, is noticed through the pool's
+# PRAGMA data_version and empties the cache. Students that do not exist are
+# not cached, so inserts never leave a stale "not found" behind.
+
+class StudentRepository:
+    """Bounded LRU cache of students rows keyed by MSSV, in front of the students table."""
+
+    def __init__(self, capacity=DEFAULT_CAPACITY, pool=None):
+        self.capacity = capacity
+        self.pool = pool or get_pool()
+        self._rows = OrderedDict()
+        self._lock = threading.Lock()
+        self._generation = 0          # bumped by every invalidation, so a read that raced a write is not cached
+        self._data_version = None
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self.external_invalidations = 0
+
+    def get(self, mssv, db_connection=None):
+        """Return the students row for `mssv`, or None if there is no such student."""
+        self._check_external_writes()
+        with self._lock:
+            row = self._rows.get(mssv)
+            if row is not None:
+                self._rows.move_to_end(mssv)
+                self.hits += 1
+                return row
+            self.misses += 1
+            generation = self._generation
+
+        with borrow_connection(db_connection) as conn:
+            row = fetch_student_by_mssv(mssv, conn.cursor())
+
+        if row is not None:
+            with self._lock:
+                if generation == self._generation:
+                    self._rows[mssv] = row
+                    if len(self._rows) > self.capacity:
+                        self._rows.popitem(last=False)
+        return row
+
+    def invalidate(self, mssvs=None):
+        """Drop the given students from the cache, or every student if `mssvs` is None."""
+        with self._lock:
+            self._generation += 1
+            if mssvs is None:
+                self._rows.clear()
+            else:
+                for mssv in mssvs:
+                    self._rows.pop(mssv, None)
+            self.invalidations += 1
+
+    def students_changed(self, mssvs):
+        """Student listener: drop the written students.
+
+        The write also changed the data version; it is taken as seen so that our
+        own writes don't empty the whole cache. A commit by another writer landing
+        between the write and this call would go unnoticed until the next one.
+        """
+        self.invalidate(mssvs)
+        version = self.pool.data_version()
+        with self._lock:
+            self._data_version = version
+
+    def _check_external_writes(self):
+        version = self.pool.data_version()
+        with self._lock:
+            changed = self._data_version is not None and version != self._data_version
+            self._data_version = version
+            if changed:
+                self._generation += 1
+                self._rows.clear()
+                self.external_invalidations += 1
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'size': len(self._rows),
+                'capacity': self.capacity,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / lookups, 3) if lookups else None,
+                'invalidations': self.invalidations,
+                'external_invalidations': self.external_invalidations,
+            }
+
+_repository = None
+_repository_lock = threading.Lock()
+
+def get_repository():
+    """Return the process-wide student repository, creating it on first use."""
+    global _repository
+    if _repository is None:
+        with _repository_lock:
+            if _repository is None:
+                repository = StudentRepository()
+                add_student_listener(repository.students_changed)
+                register_gauge('student_cache', repository.stats)
+                _repository = repository
+    return _repository
+
+def get_student(mssv, db_connection=None):
+    """Return the students row for `mssv` through the shared cache, or None."""
+    return get_repository().get(mssv, db_connection)
@@ -0,0 +1,103 @@
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from app_logging import logger
+
+class Task:
+    """Handle for an operation submitted to a TaskRunner.
+
+    The operation receives the task as its first argument and should check
+    `cancel_event` between units of work and call `report_progress` as it goes.
+    """
+
+    def __init__(self, runner, name, on_progress=None):
+        self.name = name
+        self.cancel_event = threading.Event()
+        self.future = None
+        self._runner = runner
+        self._on_progress = on_progress
+
+    def cancel(self):
+        """Ask the operation to stop at its next checkpoint."""
+        self.cancel_event.set()
+
+    @property
+    def cancelled(self):
+        return self.cancel_event.is_set()
+
+    def report_progress(self, *values):
+        """Forward progress values to the task's on_progress callback on the UI thread."""
+        if self._on_progress:
+            self._runner.post(self._on_progress, *values)
+
+class TaskRunner:
+    """Runs long database and file operations off the Tk main loop.
+
+    Read-only work runs on a small thread pool; writes are serialized on a single
+    DB writer thread so they never contend with each other for the SQLite write
+    lock. Results, errors and progress are handed back to the UI thread through a
+    queue polled with `root.after`, so callbacks may safely touch widgets.
+    """
+
+    POLL_INTERVAL_MS = 50
+
+    def __init__(self, root, readers=4):
+        self.root = root
+        self._readers = ThreadPoolExecutor(readers, thread_name_prefix='db-reader')
+        self._writer = ThreadPoolExecutor(1, thread_name_prefix='db-writer')
+        self._events = queue.Queue()
+        self._tasks = set()
+        self._poll_id = self.root.after(self.POLL_INTERVAL_MS, self._poll)
+
+    def submit(self, func, *args, write=False, name=None, on_done=None, on_error=None,
+               on_progress=None, **kwargs):
+        """Run `func(task, *args, **kwargs)` in the background and return its Task.
+
+        `on_done(result)`, `on_error(exception)` and `on_progress(*values)` are
+        called on the UI thread. Set `write=True` for operations that modify the
+        database so they run on the writer thread.
+        """
+        task = Task(self, name or func.__name__, on_progress)
+
+        def run():
+            try:
+                result = func(task, *args, **kwargs)
+            except Exception as e:
+                logger.error(f"Background task {task.name} failed: {str(e)}")
+                if on_error:
+                    self.post(on_error, e)
+            else:
+                if on_done:
+                    self.post(on_done, result)
+            finally:
+                self._tasks.discard(task)
+
+        self._tasks.add(task)
+        executor = self._writer if write else self._readers
+        task.future = executor.submit(run)
+        return task
+
+    def post(self, callback, *args):
+        """Schedule `callback(*args)` on the UI thread."""
+        self._events.put((callback, args))
+
+    def _poll(self):
+        while True:
+            try:
+                callback, args = self._events.get_nowait()
+            except queue.Empty:
+                break
+            try:
+                callback(*args)
+            except Exception as e:
+                logger.error(f"Error in background task callback: {str(e)}")
+        self._poll_id = self.root.after(self.POLL_INTERVAL_MS, self._poll)
+
+    def shutdown(self):
+        """Cancel outstanding operations, wait for running ones to stop and stop polling."""
+        for task in list(self._tasks):
+            task.cancel()
+        self.root.after_cancel(self._poll_id)
+        self._readers.shutdown(wait=True, cancel_futures=True)
+        self._writer.shutdown(wait=True, cancel_futures=True)
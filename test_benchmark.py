@@ -0,0 +1,67 @@
+import os
+import sqlite3
+import tempfile
+import unittest
+from unittest import mock
+
+import benchmark
+from benchmark import generate_students, compare
+from database_initialization import init_default_settings, init_default_config
+from migrations import migrate
+from validation import validate_student_data, build_validation_context
+
+class TestBenchmarkData(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.conn = sqlite3.connect(":memory:")
+        migrate(cls.conn)
+        init_default_settings(cls.conn)
+        init_default_config(cls.conn)
+        cls.context = build_validation_context(cls.conn)
+        cls.categories = (sorted(cls.context.faculties), sorted(cls.context.programs),
+                          sorted(cls.context.statuses))
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.conn.close()
+
+    def test_generated_students_are_valid_and_unique(self):
+        students = list(generate_students(2000, *self.categories))
+        for data in students:
+            self.assertIsNone(validate_student_data(data, self.context), data)
+        for label in ('MSSV', 'Email', 'Số điện thoại'):
+            self.assertEqual(len({data[label] for data in students}), len(students))
+        self.assertTrue(any(data['Họ Tên'].startswith('Nguyễn') for data in students))
+
+    def test_generation_is_deterministic(self):
+        first = list(generate_students(50, *self.categories, seed=7))
+        self.assertEqual(first, list(generate_students(50, *self.categories, seed=7)))
+        self.assertEqual(first[10:], list(generate_students(40, *self.categories, seed=7, start=10)))
+        self.assertNotEqual(first, list(generate_students(50, *self.categories, seed=8)))
+
+    def test_compare_flags_regressions_over_threshold(self):
+        baseline = {'sizes': {'10000': {'import_csv': {'seconds': 1.0},
+                                        'search.faculty': {'seconds': 0.001}}}}
+        results = {'sizes': {'10000': {'import_csv': {'seconds': 1.3},
+                                       'search.faculty': {'seconds': 0.003},
+                                       'export_csv': {'seconds': 5.0}}}}
+        regressions = compare(results, baseline, threshold=0.25)
+        # search.faculty tripled but by less than MIN_REGRESSION_SECONDS; export_csv has no baseline
+        self.assertEqual([(size, name) for size, name, *_ in regressions], [('10000', 'import_csv')])
+        self.assertEqual(compare(results, baseline, threshold=0.5), [])
+
+    def test_missing_baseline_fails(self):
+        def run_benchmarks(sizes, *args):
+            return {'sizes': {str(size): {'import_csv': {'seconds': 1.0}} for size in sizes}}
+
+        with tempfile.TemporaryDirectory() as directory, \
+                mock.patch.object(benchmark, 'run_benchmarks', run_benchmarks), \
+                mock.patch.object(benchmark, 'print_results'), mock.patch('sys.stderr'):
+            path = os.path.join(directory, 'baseline.json')
+            self.assertEqual(benchmark.main(['--baseline', path]), 2)
+            self.assertEqual(benchmark.main(['--baseline', path, '--update-baseline']), 0)
+            self.assertEqual(benchmark.main(['--baseline', path]), 0)
+            self.assertEqual(benchmark.main(['--baseline', path, '--sizes', '100000']), 2)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,190 @@
+import csv
+import os
+import sqlite3
+import tempfile
+import unittest
+from unittest import mock
+
+import bulk_import
+import import_dedup
+from benchmark import generate_students, write_students_csv
+from bulk_import import (BULK_LOAD_PRAGMAS, DUPLICATE_REPORT_COLUMNS, RejectionReport, bulk_load_pragmas,
+                         import_chunk, load_checkpoint, stream_import_csv)
+from database_initialization import init_default_settings, init_default_config
+from database_operations import STUDENT_FIELDS
+from import_dedup import DuplicateFilter, KeySet
+from migrations import migrate
+from validation import build_validation_context
+
+def import_rows(students):
+    return [{column: data[label] for column, label in STUDENT_FIELDS} for data in students]
+
+class ImportTestCase(unittest.TestCase):
+    def setUp(self):
+        self.conn = sqlite3.connect(":memory:")
+        migrate(self.conn)
+        init_default_settings(self.conn)
+        init_default_config(self.conn)
+        self.context = build_validation_context(self.conn)
+        self.categories = (sorted(self.context.faculties), sorted(self.context.programs),
+                           sorted(self.context.statuses))
+        self.rows = import_rows(generate_students(8, *self.categories))
+        self.tmp = tempfile.TemporaryDirectory()
+        self.report = RejectionReport(os.path.join(self.tmp.name, 'rejected.csv'))
+
+    def tearDown(self):
+        self.report.close()
+        self.conn.close()
+        self.tmp.cleanup()
+
+    def students(self):
+        return [row[0] for row in self.conn.execute("SELECT mssv FROM students ORDER BY mssv")]
+
+    def rejections(self):
+        self.report.close()
+        with open(self.report.path, encoding='utf-8-sig') as f:
+            return list(csv.reader(f))[1:]
+
+class TestBulkInsert(ImportTestCase):
+    def test_conflicting_rows_fall_back_to_single_inserts(self):
+        self.assertEqual(import_chunk(self.conn, self.rows[:2], self.report, self.context, 1), 2)
+        chunk = [self.rows[2], self.rows[1], dict(self.rows[3], dob='31/02/2004'), self.rows[4]]
+        self.assertEqual(import_chunk(self.conn, chunk, self.report, self.context, 3), 2)
+        self.assertEqual(self.students(), sorted(row['mssv'] for row in self.rows[:3] + [self.rows[4]]))
+        self.assertEqual(self.rejections(), [
+            ['5', self.rows[3]['mssv'], 'Ngày sinh không hợp lệ! Định dạng: dd/mm/yyyy'],
+            ['4', self.rows[1]['mssv'], 'MSSV đã tồn tại!'],
+        ])
+
+    def test_pragmas_are_restored_after_an_error(self):
+        saved = [self.conn.execute(f"PRAGMA {name}").fetchone()[0] for name in BULK_LOAD_PRAGMAS]
+        with self.assertRaises(RuntimeError):
+            with bulk_load_pragmas(self.conn):
+                self.assertEqual(self.conn.execute("PRAGMA synchronous").fetchone()[0], 0)
+                raise RuntimeError("interrupted")
+        self.assertEqual([self.conn.execute(f"PRAGMA {name}").fetchone()[0] for name in BULK_LOAD_PRAGMAS],
+                         saved)
+
+class TestStreamingImport(ImportTestCase):
+    def setUp(self):
+        super().setUp()
+        self.csv = os.path.join(self.tmp.name, 'students.csv')
+        self.write_file(10)
+
+    def write_file(self, count):
+        students = list(generate_students(count, *self.categories))
+        write_students_csv(self.csv, students)
+        return sorted(data['MSSV'] for data in students)
+
+    def import_file(self, **options):
+        with mock.patch.object(bulk_import, 'get_validation_context', return_value=self.context):
+            return stream_import_csv(self.csv, self.conn, self.report, chunk_size=3, **options)
+
+    def interrupt_after(self, rows):
+        def progress(rows_done, bytes_done, total_bytes):
+            if rows_done >= rows:
+                raise KeyboardInterrupt
+        with self.assertRaises(KeyboardInterrupt):
+            self.import_file(progress=progress)
+
+    def test_interrupted_import_resumes_after_the_last_chunk(self):
+        self.interrupt_after(6)
+        self.assertEqual(len(self.students()), 6)
+        self.assertEqual(load_checkpoint(self.csv)['row'], 6)
+
+        result = self.import_file()
+        self.assertEqual((result['resumed_from'], result['total'], result['inserted']), (6, 4, 4))
+        self.assertEqual(self.students(), self.write_file(10))
+        self.assertEqual(self.report.count, 0)
+        self.assertIsNone(load_checkpoint(self.csv))
+
+    def test_changed_file_starts_over(self):
+        self.interrupt_after(6)
+        mssvs = self.write_file(11)
+        self.assertIsNone(load_checkpoint(self.csv))
+
+        result = self.import_file()
+        self.assertEqual((result['resumed_from'], result['total'], result['inserted']), (0, 11, 5))
+        self.assertEqual(self.students(), mssvs)
+        self.assertEqual([reason for _, _, reason in self.rejections()], ['MSSV đã tồn tại!'] * 6)
+
+    def test_checkpoint_counts_duplicates_apart_from_rejections(self):
+        students = list(generate_students(6, *self.categories))
+        invalid = dict(students[5], **{'Ngày sinh': '31/02/2004'})
+        write_students_csv(self.csv, [students[0], students[1], students[0], students[2], invalid,
+                                      students[3], students[4]])
+        duplicates = DuplicateFilter(self.conn, RejectionReport(os.path.join(self.tmp.name, 'duplicates.csv'),
+                                                                DUPLICATE_REPORT_COLUMNS))
+
+        def progress(rows_done, bytes_done, total_bytes):
+            if rows_done >= 6:
+                raise KeyboardInterrupt
+        with self.assertRaises(KeyboardInterrupt):
+            self.import_file(progress=progress, duplicates=duplicates)
+        duplicates.report.close()
+        checkpoint = load_checkpoint(self.csv)
+        self.assertEqual((checkpoint['inserted'], checkpoint['duplicates'], checkpoint['rejected']), (4, 1, 1))
+
+class TestDuplicateDetection(ImportTestCase):
+    def test_rows_are_classified_before_insert(self):
+        self.assertEqual(import_chunk(self.conn, self.rows[:3], self.report, self.context, 1), 3)
+
+        local, domain = self.rows[1]['email'].split('@')
+        repeated_email = dict(self.rows[5], mssv='99000001', phone='0399999999',
+                              email=f"{local.upper()}@{domain}")
+        repeated_phone = dict(self.rows[4], mssv='99000002', email='other99000002@student.university.edu.vn')
+        invalid = dict(self.rows[6], dob='31/02/2004')
+        chunk = [self.rows[0], self.rows[3], repeated_email, self.rows[4], repeated_phone, invalid, self.rows[7]]
+
+        duplicates = DuplicateFilter(self.conn, RejectionReport(os.path.join(self.tmp.name, 'duplicates.csv'),
+                                                                DUPLICATE_REPORT_COLUMNS))
+        self.assertEqual(import_chunk(self.conn, chunk, self.report, self.context, 10, duplicates), 3)
+        duplicates.report.close()
+        self.report.close()
+
+        self.assertEqual((duplicates.in_database, duplicates.in_file), (2, 1))
+        with open(duplicates.report.path, encoding='utf-8-sig') as f:
+            rows = list(csv.reader(f))
+        self.assertEqual(rows, [
+            list(DUPLICATE_REPORT_COLUMNS),
+            ['10', self.rows[0]['mssv'], 'mssv', self.rows[0]['mssv'], 'database'],
+            ['12', '99000001', 'email', repeated_email['email'], 'database'],
+            ['14', '99000002', 'phone', self.rows[4]['phone'], '13'],
+        ])
+        self.assertEqual(self.report.count, 1)
+        self.assertEqual(self.conn.execute("SELECT COUNT(*) FROM students").fetchone()[0], 6)
+
+    def duplicate_filter(self):
+        return DuplicateFilter(self.conn, RejectionReport(os.path.join(self.tmp.name, 'duplicates.csv'),
+                                                          DUPLICATE_REPORT_COLUMNS))
+
+    def test_rows_written_during_the_import_are_duplicates(self):
+        duplicates = self.duplicate_filter()
+        self.assertEqual(import_chunk(self.conn, self.rows[:2], self.report, self.context, 1, duplicates), 2)
+        with self.conn:
+            self.conn.execute("INSERT INTO students (mssv, name, email) VALUES ('99000003', 'Khác', ?)",
+                              (self.rows[3]['email'],))
+        self.assertEqual(import_chunk(self.conn, self.rows[2:4] + [self.rows[0]], self.report, self.context, 3,
+                                      duplicates), 1)
+        duplicates.report.close()
+        self.assertEqual((duplicates.in_database, duplicates.in_file), (1, 1))
+
+    def test_hash_collisions_do_not_reject_rows(self):
+        duplicates = self.duplicate_filter()
+        with mock.patch.object(import_dedup, 'hash', lambda key: 1, create=True):
+            self.assertEqual(import_chunk(self.conn, self.rows[:4], self.report, self.context, 1, duplicates), 4)
+            self.assertEqual(import_chunk(self.conn, self.rows[4:], self.report, self.context, 5, duplicates), 4)
+        duplicates.report.close()
+        self.assertEqual(duplicates.count, 0)
+
+    def test_key_set_merges_new_keys(self):
+        with mock.patch.object(import_dedup, 'MERGE_SIZE', 3):
+            keys = KeySet()
+            for row, value in enumerate('abcdefghij', 1):
+                keys.add(hash(value), row)
+            self.assertEqual(len(keys), 10)
+            self.assertEqual([keys.get(hash(value)) for value in 'abcdefghij'], list(range(1, 11)))
+            self.assertIsNone(keys.get(hash('z')))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,77 @@
+import sqlite3
+import unittest
+
+from database_initialization import init_default_settings, init_default_config
+from database_operations import (add_student_listener, remove_student_listener, add_students_bulk,
+                                 update_students_bulk, upsert_students, delete_students_bulk)
+from migrations import migrate
+
+def student(mssv, name="Nguyễn Văn An", **changes):
+    data = {"MSSV": mssv, "Họ Tên": name, "Ngày sinh": "01/01/2003", "Giới tính": "Nam",
+            "Khoa": "Khoa Luật", "Khóa": "K21", "Chương trình": "Cử nhân", "Địa chỉ": "Hà Nội",
+            "Email": f"{mssv}@student.university.edu.vn", "Số điện thoại": "0912345678",
+            "Tình trạng": "Đang học"}
+    data.update(changes)
+    return data
+
+class TestBulkOperations(unittest.TestCase):
+    def setUp(self):
+        self.conn = sqlite3.connect(":memory:")
+        migrate(self.conn)
+        init_default_settings(self.conn)
+        init_default_config(self.conn)
+        with self.conn:
+            self.conn.executemany("INSERT INTO students (mssv, name, status, created_at) "
+                                  "VALUES (?, 'Trần Thị Cúc', 'Đang học', '2024-09-01 08:00:00')",
+                                  [("SV100",), ("SV101",)])
+        self.changed = []
+        add_student_listener(self.changed.extend)
+
+    def tearDown(self):
+        remove_student_listener(self.changed.extend)
+        self.conn.close()
+
+    def names(self):
+        return dict(self.conn.execute("SELECT mssv, name FROM students"))
+
+    def test_add(self):
+        outcomes = add_students_bulk([student("SV001"), student("SV100"), student("SV002", Email="sv002@gmail.com"),
+                                      student("SV001", "Lê Văn Bình"), student("", "Không MSSV")], self.conn)
+        self.assertEqual(outcomes, [("SV001", 'inserted'), ("SV100", 'duplicate'), ("SV002", 'invalid'),
+                                    ("SV001", 'duplicate'), ("", 'invalid')])
+        self.assertEqual(self.names(), {"SV100": "Trần Thị Cúc", "SV101": "Trần Thị Cúc", "SV001": "Nguyễn Văn An"})
+        self.assertEqual(self.changed, ["SV001"])
+
+    def test_update(self):
+        outcomes = update_students_bulk([student("SV100", "Lê Văn Bình"), student("SV404"),
+                                         student("SV101", "Lê Văn Bình", **{"Ngày sinh": "2003-01-01"})],
+                                        self.conn)
+        self.assertEqual(outcomes, [("SV100", 'updated'), ("SV404", 'not_found'), ("SV101", 'invalid')])
+        self.assertEqual(self.names(), {"SV100": "Lê Văn Bình", "SV101": "Trần Thị Cúc"})
+        self.assertEqual(self.changed, ["SV100"])
+
+    def test_upsert_inserts_new_and_updates_existing(self):
+        outcomes = upsert_students([student("SV100", "Lê Văn Bình", Khoa="Khoa Tiếng Nhật"), student("SV001"),
+                                    student("SV002", Khoa="Khoa Toán"), student("SV101", **{"Tình trạng": "Nghỉ"}),
+                                    student("SV001", "Phạm Thị Dung")], self.conn)
+        self.assertEqual(outcomes, [("SV100", 'updated'), ("SV001", 'inserted'), ("SV002", 'invalid'),
+                                    ("SV101", 'invalid'), ("SV001", 'updated')])
+        rows = {mssv: row for mssv, *row in self.conn.execute(
+            "SELECT mssv, name, faculty, email, created_at FROM students")}
+        self.assertEqual(rows["SV100"][:3], ["Lê Văn Bình", "Khoa Tiếng Nhật", "SV100@student.university.edu.vn"])
+        self.assertEqual(rows["SV100"][3], '2024-09-01 08:00:00')     # an update keeps the creation time
+        self.assertEqual(rows["SV001"][0], "Phạm Thị Dung")
+        self.assertIsNotNone(rows["SV001"][3])
+        self.assertEqual(rows["SV101"][:2], ["Trần Thị Cúc", None])
+        self.assertNotIn("SV002", rows)
+        self.assertEqual(self.changed, ["SV100", "SV001", "SV001"])
+
+    def test_delete(self):
+        self.assertEqual(delete_students_bulk(["SV100", "SV404", "SV100", "SV404"], self.conn),
+                         [("SV100", 'deleted'), ("SV404", 'not_found'), ("SV100", 'duplicate'),
+                          ("SV404", 'duplicate')])
+        self.assertEqual(self.names(), {"SV101": "Trần Thị Cúc"})
+        self.assertEqual(self.changed, ["SV100"])
+
+if __name__ == '__main__':
+    unittest.main()
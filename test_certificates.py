@@ -0,0 +1,83 @@
+import os
+import tempfile
+import unittest
+import zipfile
+from datetime import datetime
+from unittest import mock
+
+import certificates
+from certificates import compile_template, generate_certificates, render_certificate, stamp_issued, ISSUED_MARK
+from student_record import Student
+
+def student(mssv, name="Nguyễn Văn An"):
+    return Student(mssv=mssv, name=name, dob="01/01/2003", gender="Nam", faculty="Khoa Luật",
+                   course="K21", program="Cử nhân", status="Đang học")
+
+def issued_on(day):
+    """Patch the clock generate_certificates reads the issue date from."""
+    clock = mock.Mock(wraps=datetime)
+    clock.now.return_value = day
+    return mock.patch.object(certificates, 'datetime', clock)
+
+class TestCertificates(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.cache_dir = os.path.join(self.directory.name, 'cache')
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def path(self, name):
+        return os.path.join(self.directory.name, name)
+
+    def generate(self, students, output, **options):
+        options.setdefault('cache_dir', self.cache_dir)
+        return generate_certificates(students, 'html', self.path(output), "ABC", workers=1, **options)
+
+    def read(self, output, name):
+        with open(os.path.join(self.path(output), name), encoding='utf-8') as f:
+            return f.read()
+
+    def test_cached_render_is_reused_on_a_later_day(self):
+        students = [student("SV001"), student("SV002")]
+        with issued_on(datetime(2026, 10, 17)):
+            first = self.generate(students, 'first')
+        with issued_on(datetime(2026, 10, 18)):
+            second = self.generate(students + [student("SV003")], 'second')
+        self.assertEqual((first['rendered'], first['cached']), (2, 0))
+        self.assertEqual((second['rendered'], second['cached']), (1, 2))
+
+        html = self.read('second', 'SV001.html')
+        self.assertIn("18/10/2026", html)
+        self.assertNotIn("17/10/2026", html)
+        self.assertNotIn(ISSUED_MARK, html)
+        self.assertEqual(html.replace("18/10/2026", "17/10/2026"), self.read('first', 'SV001.html'))
+
+    def test_changed_student_is_rendered_again(self):
+        self.generate([student("SV001")], 'first')
+        result = self.generate([student("SV001", name="Nguyễn Văn Bình")], 'second')
+        self.assertEqual((result['rendered'], result['cached']), (1, 0))
+        self.assertIn("Nguyễn Văn Bình", self.read('second', 'SV001.html'))
+
+    def test_html_fields_are_escaped(self):
+        self.generate([student("SV001", name='<script>alert("x")</script> & Co')], 'out', cache_dir=None)
+        html = self.read('out', 'SV001.html')
+        self.assertIn('&lt;script&gt;alert("x")&lt;/script&gt; &amp; Co', html)
+        self.assertNotIn("<script>", html)
+
+    def test_zip_output(self):
+        result = self.generate([student("SV001"), student("SV002")], 'out.zip')
+        self.assertEqual(result['output'], self.path('out.zip'))
+        with zipfile.ZipFile(self.path('out.zip')) as archive:
+            self.assertEqual(sorted(archive.namelist()), ['SV001.html', 'SV002.html'])
+            self.assertIn("SV002", archive.read('SV002.html').decode('utf-8'))
+
+    def test_pdf_is_stamped_with_the_issue_date(self):
+        compiled = compile_template('pdf', "Ho ten: {name}\nNgay cap: {issued}")
+        data = render_certificate(compiled, 'pdf', {'name': "An", 'issued': ISSUED_MARK})
+        stamped = stamp_issued(data, "18/10/2026")
+        self.assertIn(b"(Ngay cap: 18/10/2026)", stamped)
+        self.assertEqual(len(stamped), len(data))
+
+if __name__ == '__main__':
+    unittest.main()
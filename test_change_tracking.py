@@ -0,0 +1,51 @@
+import sqlite3
+import unittest
+
+from change_tracking import changes_since, latest_change, prune_changes
+from database_operations import fetch_students_by_id
+from migrations import migrate
+
+class TestChangeTracking(unittest.TestCase):
+    def setUp(self):
+        self.conn = sqlite3.connect(":memory:")
+        migrate(self.conn)
+        with self.conn:
+            self.conn.executemany('''
+                INSERT INTO students (mssv, name, faculty, status) VALUES (?, ?, ?, 'Đang học')
+            ''', [(f"SV{i:03d}", f"Phạm Minh {i}", "Khoa Luật" if i % 2 else "Khoa Tiếng Pháp")
+                  for i in range(1, 6)])
+        self.seq = latest_change(self.conn.cursor())
+
+    def tearDown(self):
+        self.conn.close()
+
+    def test_writes_are_logged_once_per_student(self):
+        self.assertEqual(self.seq, 5)
+        with self.conn:
+            self.conn.execute("UPDATE students SET name = 'Đỗ Thu Hà' WHERE mssv = 'SV002'")
+            self.conn.execute("UPDATE students SET status = 'Tạm dừng học' WHERE mssv = 'SV002'")
+            self.conn.execute("DELETE FROM students WHERE mssv = 'SV004'")
+        seq, ids = changes_since(self.conn.cursor(), self.seq)
+        self.assertEqual((seq, ids), (8, [2, 4]))
+        self.assertEqual(changes_since(self.conn.cursor(), seq), (seq, []))
+
+    def test_changed_rows_are_filtered(self):
+        with self.conn:
+            self.conn.execute("UPDATE students SET faculty = 'Khoa Tiếng Pháp' WHERE mssv = 'SV001'")
+            self.conn.execute("DELETE FROM students WHERE mssv = 'SV003'")
+            self.conn.execute("UPDATE students SET name = 'Vũ Đức Long' WHERE mssv = 'SV005'")
+        _, ids = changes_since(self.conn.cursor(), self.seq)
+        rows = fetch_students_by_id(self.conn.cursor(), ids, "faculty = ?", ["Khoa Luật"], columns=['mssv', 'name'])
+        self.assertEqual(rows, [(5, "SV005", "Vũ Đức Long")])
+
+    def test_unreplayable_changes_ask_for_a_reload(self):
+        with self.conn:
+            for i in range(3):
+                self.conn.execute("UPDATE students SET name = ? WHERE mssv = 'SV001'", (f"Lần {i}",))
+        self.assertIsNone(changes_since(self.conn.cursor(), self.seq, limit=2))
+        self.assertEqual(prune_changes(self.conn, keep=2), 6)
+        self.assertIsNone(changes_since(self.conn.cursor(), self.seq))
+        self.assertEqual(changes_since(self.conn.cursor(), 6), (8, [1]))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,82 @@
+import csv
+import json
+import os
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import unittest
+
+from benchmark import generate_students
+from database_initialization import init_default_settings, init_default_config
+from database_operations import STUDENT_FIELDS
+from migrations import migrate
+from validation import build_validation_context
+
+CLI = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'cli.py')
+
+class TestCli(unittest.TestCase):
+    """Runs cli.py in a scratch directory, where it creates its own students.db."""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.directory = tempfile.TemporaryDirectory()
+        conn = sqlite3.connect(":memory:")
+        migrate(conn)
+        init_default_settings(conn)
+        init_default_config(conn)
+        context = build_validation_context(conn)
+        conn.close()
+        students = list(generate_students(5, sorted(context.faculties), sorted(context.programs),
+                                          sorted(context.statuses), seed=11))
+        students.append({**students[0], 'MSSV': "99999999", 'Email': "99999999@student.university.edu.vn",
+                         'Số điện thoại': "0999999999", 'Ngày sinh': "31/02/2003"})
+        cls.students = students
+        with open(os.path.join(cls.directory.name, 'students.csv'), 'w', newline='', encoding='utf-8') as f:
+            writer = csv.writer(f)
+            writer.writerow([column for column, _ in STUDENT_FIELDS])
+            writer.writerows([data[label] for _, label in STUDENT_FIELDS] for data in students)
+        cls.imported = cls.run_cli('--json', 'import', 'students.csv')
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.directory.cleanup()
+
+    @classmethod
+    def run_cli(cls, *args):
+        return subprocess.run([sys.executable, CLI, *args], cwd=cls.directory.name,
+                              capture_output=True, text=True, encoding='utf-8', timeout=60)
+
+    def test_import_with_rejected_rows(self):
+        self.assertEqual(self.imported.returncode, 4, self.imported.stderr)
+        summary = json.loads(self.imported.stdout)
+        self.assertEqual((summary['inserted'], summary['rejected'], summary['duplicates']), (5, 1, 0))
+        self.assertTrue(os.path.exists(os.path.join(self.directory.name, summary['report_path'])))
+
+    def test_search_json(self):
+        first = self.students[0]
+        result = self.run_cli('--json', 'search', '--mssv', first['MSSV'])
+        self.assertEqual(result.returncode, 0, result.stderr)
+        (student,) = json.loads(result.stdout)
+        self.assertEqual((student['mssv'], student['name'], student['faculty']),
+                         (first['MSSV'], first['Họ Tên'], first['Khoa']))
+
+        result = self.run_cli('--json', 'search', '--faculty', first['Khoa'], '--sort', 'mssv')
+        expected = sorted(data['MSSV'] for data in self.students[:5] if data['Khoa'] == first['Khoa'])
+        self.assertEqual([student['mssv'] for student in json.loads(result.stdout)], expected)
+
+        result = self.run_cli('--json', 'search', '--mssv', "00000000")
+        self.assertEqual((result.returncode, json.loads(result.stdout)), (3, []))
+
+    def test_certificate_for_missing_student(self):
+        result = self.run_cli('--json', 'certificate', "00000000", '--output', 'cert.html')
+        self.assertEqual(result.returncode, 3)
+        self.assertEqual(json.loads(result.stdout), {'mssv': "00000000", 'error': 'not_found'})
+        self.assertFalse(os.path.exists(os.path.join(self.directory.name, 'cert.html')))
+
+    def test_usage_error(self):
+        result = self.run_cli('search')
+        self.assertEqual(result.returncode, 2)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,78 @@
+import csv
+import os
+import sqlite3
+import tempfile
+import threading
+import unittest
+
+from data_export import export_query
+from database_operations import STUDENT_COLUMNS
+from migrations import migrate
+
+class TestDataExport(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.conn = sqlite3.connect(":memory:")
+        migrate(cls.conn)
+        with cls.conn:
+            cls.conn.executemany('''
+                INSERT INTO students (mssv, name, faculty, status) VALUES (?, ?, ?, 'Đang học')
+            ''', [(f"SV{i:03d}", f"Nguyễn Văn {i}", "Khoa Luật" if i % 3 else "Khoa Tiếng Anh thương mại")
+                  for i in range(23)])
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.conn.close()
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.filename = os.path.join(self.directory.name, 'students.csv')
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def read_csv(self):
+        with open(self.filename, newline='', encoding='utf-8-sig') as f:
+            return list(csv.reader(f))
+
+    def test_batches_arrive_complete_and_in_order(self):
+        progress = []
+        count = export_query(self.filename, 'csv', self.conn, batch_size=5, progress=progress.append)
+        self.assertEqual(count, 23)
+        self.assertEqual(progress, [5, 10, 15, 20, 23])
+        header, *rows = self.read_csv()
+        self.assertEqual(header, list(STUDENT_COLUMNS))
+        self.assertEqual([row[0] for row in rows], [f"SV{i:03d}" for i in range(23)])
+
+    def test_query_filter(self):
+        query = f"SELECT {', '.join(STUDENT_COLUMNS)} FROM students WHERE faculty = ? ORDER BY mssv DESC"
+        count = export_query(self.filename, 'csv', self.conn, query, ("Khoa Tiếng Anh thương mại",), batch_size=3)
+        self.assertEqual(count, 8)
+        self.assertEqual([row[0] for row in self.read_csv()[1:]], [f"SV{i:03d}" for i in range(21, -1, -3)])
+
+    def test_cancel_stops_before_the_next_batch(self):
+        cancel = threading.Event()
+        with self.assertLogs('app_logging', 'INFO') as logs:
+            count = export_query(self.filename, 'csv', self.conn, batch_size=5,
+                                 progress=lambda done: cancel.set(), cancel_event=cancel)
+        self.assertEqual(count, 5)
+        self.assertEqual(len(self.read_csv()), 1 + 5)
+        self.assertIn(f"Export to {self.filename} cancelled after 5 rows", logs.output[-1])
+
+    def test_empty_result_creates_no_file(self):
+        count = export_query(self.filename, 'csv', self.conn, "SELECT * FROM students WHERE 0")
+        self.assertEqual(count, 0)
+        self.assertFalse(os.path.exists(self.filename))
+
+    def test_xlsx(self):
+        import openpyxl
+        filename = os.path.join(self.directory.name, 'students.xlsx')
+        self.assertEqual(export_query(filename, 'xlsx', self.conn, batch_size=4), 23)
+        workbook = openpyxl.load_workbook(filename, read_only=True)
+        rows = list(workbook.active.values)
+        workbook.close()
+        self.assertEqual(rows[0], tuple(STUDENT_COLUMNS))
+        self.assertEqual([row[0] for row in rows[1:]], [f"SV{i:03d}" for i in range(23)])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,80 @@
+import os
+import queue
+import sqlite3
+import tempfile
+import unittest
+
+from db_connection import ConnectionPool
+
+class TestConnectionPool(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, "students.db")
+        self.pool = ConnectionPool(self.path, size=2)
+        with self.pool.connection() as conn:
+            conn.execute("CREATE TABLE students (mssv TEXT PRIMARY KEY, name TEXT)")
+            conn.commit()
+
+    def tearDown(self):
+        self.pool.close_all()
+        self.directory.cleanup()
+
+    def names(self):
+        with self.pool.connection() as conn:
+            return [row[0] for row in conn.execute("SELECT name FROM students ORDER BY mssv")]
+
+    def test_size_limit(self):
+        first, second = self.pool.acquire(), self.pool.acquire()
+        self.assertIsNot(first, second)
+        self.assertEqual(self.pool.opened, 2)
+        with self.assertRaises(queue.Empty):
+            self.pool.acquire(timeout=0.05)
+        self.pool.release(first)
+        self.assertIs(self.pool.acquire(timeout=0.05), first)
+        self.pool.release(first)
+        self.pool.release(second)
+        self.assertEqual(self.pool.opened, 2)
+
+    def test_transaction_rolls_back_on_error(self):
+        with self.pool.transaction() as conn:
+            conn.execute("INSERT INTO students VALUES ('SV001', 'Nguyễn Văn An')")
+        with self.assertRaises(sqlite3.IntegrityError):
+            with self.pool.transaction() as conn:
+                conn.execute("INSERT INTO students VALUES ('SV002', 'Trần Thị Bình')")
+                conn.execute("INSERT INTO students VALUES ('SV001', 'Lê Văn Cường')")
+        self.assertEqual(self.names(), ['Nguyễn Văn An'])
+
+    def test_data_version_moves_on_commit(self):
+        version = self.pool.data_version()
+        self.assertEqual(self.pool.data_version(), version)
+        with self.pool.transaction() as conn:
+            conn.execute("INSERT INTO students VALUES ('SV001', 'Nguyễn Văn An')")
+        after_pool_commit = self.pool.data_version()
+        self.assertNotEqual(after_pool_commit, version)
+
+        other = sqlite3.connect(self.path)
+        with other:
+            other.execute("INSERT INTO students VALUES ('SV002', 'Trần Thị Bình')")
+        other.close()
+        self.assertNotEqual(self.pool.data_version(), after_pool_commit)
+
+    def test_close_all_keeps_checked_out_connections_counted(self):
+        idle, busy = self.pool.acquire(), self.pool.acquire()
+        self.pool.release(idle)
+        self.pool.close_all()
+        self.assertEqual(self.pool.opened, 1)
+        self.assertEqual(busy.execute("SELECT count(*) FROM students").fetchone(), (0,))
+
+        fresh = self.pool.acquire(timeout=0.05)
+        with self.assertRaises(queue.Empty):
+            self.pool.acquire(timeout=0.05)
+        self.pool.release(busy)
+        self.assertEqual(self.pool.opened, 1)
+        with self.assertRaises(sqlite3.ProgrammingError):
+            busy.execute("SELECT 1")
+        self.pool.release(fresh)
+        self.assertIs(self.pool.acquire(timeout=0.05), fresh)
+        self.pool.release(fresh)
+
+if __name__ == '__main__':
+    unittest.main()
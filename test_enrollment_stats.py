@@ -0,0 +1,59 @@
+import sqlite3
+import unittest
+
+from enrollment_stats import (STATS_TABLE, count_students, get_enrollment_stats, get_enrollment_totals,
+                              rebuild_enrollment_stats)
+from migrations import migrate
+
+class TestEnrollmentStats(unittest.TestCase):
+    def setUp(self):
+        self.conn = sqlite3.connect(":memory:")
+        migrate(self.conn)
+        with self.conn:
+            self.conn.executemany('''
+                INSERT INTO students (mssv, name, faculty, course, program, status) VALUES (?, ?, ?, ?, ?, ?)
+            ''', [(f"SV{i:03d}", "Nguyễn Văn An", ["Khoa Luật", "Khoa Tiếng Nhật", None][i % 3], f"K{20 + i % 4}",
+                   ["Cử nhân", "Thạc sĩ"][i % 2], ["Đang học", "Tạm dừng học", "Đã tốt nghiệp"][i % 5 % 3])
+                  for i in range(60)])
+
+    def tearDown(self):
+        self.conn.close()
+
+    def assert_counters_match(self):
+        expected = self.conn.execute('''
+            SELECT coalesce(faculty, ''), coalesce(program, ''), coalesce(status, ''), COUNT(*) FROM students
+            GROUP BY 1, 2, 3 ORDER BY 1, 2, 3
+        ''').fetchall()
+        self.assertEqual(get_enrollment_stats(db_connection=self.conn), expected)
+        for faculty, program, status, count in expected:
+            self.assertEqual(count_students(self.conn, faculty=faculty, program=program, status=status), count)
+        total = self.conn.execute("SELECT COUNT(*) FROM students").fetchone()[0]
+        self.assertEqual(count_students(self.conn), total)
+        self.assertEqual(count_students(self.conn, status='Đang học'),
+                         self.conn.execute("SELECT COUNT(*) FROM students WHERE status = 'Đang học'").fetchone()[0])
+        self.assertEqual(sum(count for _, count in get_enrollment_totals('faculty', self.conn)), total)
+
+    def test_triggers_keep_counters_in_step(self):
+        self.assert_counters_match()
+        with self.conn:
+            self.conn.execute("UPDATE students SET course = 'K30', status = 'Bảo lưu' WHERE id % 4 = 0")
+            self.conn.execute("UPDATE students SET course = 'K31' WHERE id % 7 = 0")
+            self.conn.execute("UPDATE students SET faculty = 'Khoa Luật', status = NULL WHERE id % 9 = 0")
+            self.conn.execute("UPDATE students SET status = status WHERE id % 2 = 0")
+        self.assert_counters_match()
+        with self.conn:
+            self.conn.execute("DELETE FROM students WHERE id % 3 = 0")
+            self.conn.execute("INSERT INTO students (mssv, name, status) VALUES ('SV999', 'Lê Thị Hoa', 'Đang học')")
+        self.assert_counters_match()
+        with self.conn:
+            self.conn.execute("DELETE FROM students")
+        self.assertEqual(self.conn.execute(f"SELECT COUNT(*) FROM {STATS_TABLE}").fetchone()[0], 0)
+
+    def test_rebuild_backfills_counters(self):
+        with self.conn:
+            self.conn.execute(f"DELETE FROM {STATS_TABLE}")
+            rebuild_enrollment_stats(self.conn.cursor())
+        self.assert_counters_match()
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,59 @@
+import sqlite3
+import unittest
+from unittest import mock
+
+import fulltext_search
+from fulltext_search import (FTS_TABLE, build_match_query, detect_fulltext_index, fulltext_index_exists,
+                             search_students_fulltext)
+from migrations import migrate
+
+NAMES = ["Nguyễn Văn An", "Đặng Thị Bình", "Trần Nguyên Hạnh", "Lê Đăng Khoa"]
+
+class TestFulltextSearch(unittest.TestCase):
+    def setUp(self):
+        self.conn = sqlite3.connect(":memory:")
+        migrate(self.conn)
+        with self.conn:
+            self.conn.executemany("INSERT INTO students (mssv, name) VALUES (?, ?)",
+                                  [(f"SV{i:03d}", name) for i, name in enumerate(NAMES)])
+
+    def tearDown(self):
+        self.conn.close()
+
+    def search(self, text):
+        return [student.name for student in search_students_fulltext(text, self.conn.cursor())]
+
+    def test_diacritics_are_folded(self):
+        self.assertEqual(self.search("Nguyen"), ["Nguyễn Văn An", "Trần Nguyên Hạnh"])
+        self.assertEqual(self.search("nguyễn van"), ["Nguyễn Văn An"])
+        self.assertEqual(self.search("Dang"), ["Đặng Thị Bình", "Lê Đăng Khoa"])
+        self.assertEqual(self.search("đặng bi"), ["Đặng Thị Bình"])
+        with self.conn:
+            self.conn.execute("UPDATE students SET name = 'Đỗ Văn An' WHERE mssv = 'SV000'")
+        self.assertEqual(self.search("do an"), ["Đỗ Văn An"])
+
+    def test_user_input_is_escaped(self):
+        self.assertEqual(build_match_query('An" OR name:*'), '{name} : ("an"* AND "or"* AND "name"*)')
+        self.assertIsNone(build_match_query('" * ( ) ^ -'))
+        for text in ('An" OR "Bình', 'NEAR(An Bình)', 'Bình NOT An', 'address:Huế', '-An', '^An*'):
+            self.search(text)      # must not raise an FTS5 syntax error
+        self.assertEqual(self.search('Bình" OR "Khoa'), [])
+        self.assertEqual(self.search('Bình NOT'), [])
+
+    def test_missing_index_is_installed_at_startup(self):
+        with mock.patch.object(fulltext_search, 'fts_enabled', False):
+            self.conn.execute(f"DROP TABLE {FTS_TABLE}")
+            for trigger in ('insert', 'delete', 'update'):
+                self.conn.execute(f"DROP TRIGGER students_fts_{trigger}")
+
+            with mock.patch.object(fulltext_search, 'install_fulltext_index',
+                                   side_effect=sqlite3.OperationalError("no such module: fts5")):
+                self.assertFalse(detect_fulltext_index(self.conn))
+            self.assertFalse(fulltext_index_exists(self.conn.cursor()))
+
+            self.assertTrue(detect_fulltext_index(self.conn))
+            self.assertTrue(fulltext_search.fts_enabled)
+            self.assertEqual(self.search("binh"), ["Đặng Thị Bình"])
+
+if __name__ == '__main__':
+    unittest.main()
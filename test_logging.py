@@ -0,0 +1,72 @@
+import json
+import logging
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+import app_logging
+from app_logging import LOG_FILE, RateLimitFilter, RotatingLogFileHandler, initialize_logging, shutdown_logging
+
+def record(level=logging.INFO, line=10, msg="Row imported", **extra):
+    return logging.makeLogRecord(dict(levelno=level, levelname=logging.getLevelName(level), msg=msg,
+                                      pathname="bulk_import.py", lineno=line, **extra))
+
+class TestLogging(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        shutdown_logging()
+        self.directory.cleanup()
+        initialize_logging()    # back to the application's own setup
+
+    def test_rate_limit_per_call_site_and_operation(self):
+        clock = [100.0]
+        with mock.patch.object(app_logging.time, 'monotonic', lambda: clock[0]):
+            limiter = RateLimitFilter(rate=20, period=1.0)
+            self.assertEqual(sum(limiter.filter(record()) for _ in range(30)), 20)
+            self.assertTrue(limiter.filter(record(line=11)))                    # another call site
+            self.assertEqual(sum(limiter.filter(record(line=12, operation='import')) for _ in range(25)), 20)
+            self.assertEqual(sum(limiter.filter(record(line=13, operation='import')) for _ in range(5)), 0)
+            self.assertTrue(all(limiter.filter(record(logging.WARNING)) for _ in range(50)))
+
+            clock[0] += 1.0
+            passed = record()
+            self.assertTrue(limiter.filter(passed))
+            self.assertEqual(passed.msg, "Row imported (10 similar messages suppressed)")
+
+    def test_rolls_over_past_max_bytes(self):
+        path = os.path.join(self.directory.name, LOG_FILE)
+        handler = RotatingLogFileHandler(path, max_bytes=200)
+        handler.setFormatter(logging.Formatter('%(message)s'))
+        try:
+            for i in range(20):
+                handler.emit(record(msg=f"line {i:02d} " + "x" * 40))
+        finally:
+            handler.close()
+        rotated = [name for name in os.listdir(self.directory.name) if name.startswith(LOG_FILE + '.')]
+        self.assertGreaterEqual(len(rotated), 3)
+        self.assertTrue(all(handler.extMatch.match(name[len(LOG_FILE) + 1:]) for name in rotated))
+        self.assertLessEqual(os.path.getsize(path), 200 + 50)
+        lines = []
+        for name in rotated + [LOG_FILE]:
+            with open(os.path.join(self.directory.name, name), encoding='utf-8') as f:
+                lines += f.read().splitlines()
+        self.assertEqual(sorted(lines), [f"line {i:02d} " + "x" * 40 for i in range(20)])
+
+    def test_json_lines_format(self):
+        with mock.patch.dict(os.environ, {'STUDENT_MANAGER_LOG_FORMAT': 'json'}):
+            logger = initialize_logging(self.directory.name)
+        logger.info("Nhập dữ liệu xong", extra={'operation': 'import', 'rows': 3})
+        logger.warning("Slow query\nplan: SCAN students")
+        shutdown_logging()
+
+        with open(os.path.join(self.directory.name, LOG_FILE), encoding='utf-8') as f:
+            entries = [json.loads(line) for line in f]
+        self.assertEqual([(entry['level'], entry['message']) for entry in entries],
+                         [('INFO', "Nhập dữ liệu xong"), ('WARNING', "Slow query\nplan: SCAN students")])
+        self.assertEqual((entries[0]['operation'], entries[0]['rows']), ('import', 3))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,90 @@
+import json
+import os
+import sqlite3
+import tempfile
+import unittest
+
+import metrics
+
+class TestMetrics(unittest.TestCase):
+    def setUp(self):
+        metrics.reset()
+        self.conn = sqlite3.connect(':memory:', factory=metrics.InstrumentedConnection)
+        self.conn.execute("CREATE TABLE students (id INTEGER PRIMARY KEY, mssv TEXT)")
+        self.conn.executemany("INSERT INTO students (mssv) VALUES (?)", [(str(i),) for i in range(100)])
+
+    def tearDown(self):
+        self.conn.close()
+        metrics.reset()
+
+    def test_histogram_percentiles(self):
+        histogram = metrics.Histogram()
+        for ms in [0.3] * 90 + [40] * 9 + [3000]:
+            histogram.observe(ms)
+        self.assertEqual(histogram.percentile(0.5), 0.5)
+        self.assertEqual(histogram.percentile(0.95), 50)
+        self.assertEqual(histogram.percentile(1.0), 3000)
+        self.assertEqual(histogram.summary()['count'], 100)
+
+    def test_timed_records_calls_and_exceptions(self):
+        @metrics.timed('lookup')
+        def lookup(fail=False):
+            if fail:
+                raise ValueError
+            return 1
+
+        lookup()
+        with self.assertRaises(ValueError):
+            lookup(fail=True)
+        self.assertEqual(metrics.snapshot()['timers']['lookup']['count'], 2)
+
+    def test_queries_counted_once_per_statement(self):
+        self.conn.execute("SELECT * FROM students WHERE mssv = ?", ('5',)).fetchone()
+        cursor = self.conn.cursor()
+        cursor.execute("SELECT   mssv FROM students")
+        while cursor.fetchmany(30):
+            pass
+        queries = metrics.snapshot()['queries']
+        self.assertEqual(queries['SELECT * FROM students WHERE mssv = ?']['count'], 1)
+        self.assertEqual(queries['SELECT mssv FROM students']['count'], 1)
+        self.assertEqual(queries['INSERT INTO students (mssv) VALUES (?)']['count'], 1)
+
+    def test_slow_query_logged_with_plan_and_without_values(self):
+        threshold = metrics.SLOW_QUERY_MS
+        metrics.SLOW_QUERY_MS = 0
+        try:
+            with self.assertLogs(level='WARNING'):
+                self.conn.execute("SELECT * FROM students WHERE mssv = ?", ('secret',)).fetchall()
+        finally:
+            metrics.SLOW_QUERY_MS = threshold
+        entry = metrics.slow_queries()[-1]
+        self.assertEqual(entry['parameters'], 'str')
+        self.assertIn('SCAN students', entry['plan'])
+        self.assertNotIn('secret', json.dumps(entry))
+
+    def test_slow_executemany_explained_with_first_parameters(self):
+        threshold = metrics.SLOW_QUERY_MS
+        metrics.SLOW_QUERY_MS = 0
+        try:
+            with self.assertLogs(level='WARNING'):
+                self.conn.executemany("UPDATE students SET mssv = ? WHERE id = ?",
+                                      ((f"new{i}", i) for i in range(1, 11)))
+        finally:
+            metrics.SLOW_QUERY_MS = threshold
+        entry = metrics.slow_queries()[-1]
+        self.assertEqual(entry['parameters'], 'str, int')
+        self.assertIn('SEARCH students USING INTEGER PRIMARY KEY (rowid=?)', entry['plan'])
+        self.assertEqual(self.conn.execute("SELECT COUNT(*) FROM students WHERE mssv LIKE 'new%'").fetchone(),
+                         (10,))
+
+    def test_export(self):
+        self.conn.execute("SELECT COUNT(*) FROM students").fetchone()
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'metrics.json')
+            metrics.export_metrics(path)
+            with open(path, encoding='utf-8') as f:
+                exported = json.load(f)
+        self.assertEqual(exported['counters']['db.queries'], 3)
+
+if __name__ == '__main__':
+    unittest.main()
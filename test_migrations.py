@@ -0,0 +1,75 @@
+import sqlite3
+import unittest
+from unittest import mock
+
+import migrations
+from enrollment_stats import count_students
+from fulltext_search import fulltext_index_exists, search_students_fulltext
+from migrations import SCHEMA_VERSION, get_schema_version, migrate
+
+def legacy_database():
+    """A database as created before migrations existed: the base tables, version 0, with data."""
+    conn = sqlite3.connect(":memory:")
+    migrations._migration_base_schema(conn.cursor())
+    conn.executemany("INSERT INTO students (mssv, name, faculty, program, status, email) VALUES (?, ?, ?, ?, ?, ?)",
+                     [("SV001", "Nguyễn Văn An", "Khoa Luật", "Cử nhân", "Đang học", "sv001@student.university.edu.vn"),
+                      ("SV002", "Đặng Thị Bình", "Khoa Luật", "Cử nhân", "Đang học", None),
+                      ("SV003", "Trần Văn Cường", "Khoa Tiếng Nhật", "Thạc sĩ", "Tạm dừng học", None)])
+    conn.execute("INSERT INTO config (key, value) VALUES ('school_name', 'Trường Đại học XYZ')")
+    conn.commit()
+    return conn
+
+def tables(conn):
+    return {name for name, in conn.execute("SELECT name FROM sqlite_master WHERE type IN ('table', 'index')")}
+
+def columns(conn, table):
+    return [row[1] for row in conn.execute(f"PRAGMA table_info({table})")]
+
+class TestMigrations(unittest.TestCase):
+    def test_legacy_database_is_upgraded_with_its_rows(self):
+        conn = legacy_database()
+        steps = []
+        self.assertEqual(migrate(conn, lambda done, total, description: steps.append(done)), SCHEMA_VERSION)
+        self.assertEqual(get_schema_version(conn), SCHEMA_VERSION)
+        self.assertEqual(steps, list(range(len(migrations.MIGRATIONS) + 1)))
+
+        self.assertEqual(conn.execute("SELECT mssv, name, created_at FROM students ORDER BY id").fetchall(),
+                         [("SV001", "Nguyễn Văn An", None), ("SV002", "Đặng Thị Bình", None),
+                          ("SV003", "Trần Văn Cường", None)])
+        self.assertIn('notification_preferences', columns(conn, 'students'))
+        self.assertEqual(conn.execute("SELECT value FROM config WHERE key = 'school_name'").fetchone()[0],
+                         'Trường Đại học XYZ')
+        # Existing rows are backfilled into the trigger-maintained tables
+        self.assertEqual(count_students(conn, faculty="Khoa Luật", status="Đang học"), 2)
+        self.assertEqual([s.mssv for s in search_students_fulltext("dang binh", conn.cursor())], ["SV002"])
+        self.assertTrue({'idx_students_status', 'idx_students_course_status_name',
+                         'idx_students_email_lower'} <= tables(conn))
+
+        self.assertEqual(migrate(conn), SCHEMA_VERSION)     # nothing left to apply
+        conn.close()
+
+    def test_failed_migration_rolls_back_every_step(self):
+        conn = legacy_database()
+        before = tables(conn)
+
+        def failing_step(cursor):
+            """Step that fails halfway."""
+            cursor.execute("CREATE TABLE half_done (id INTEGER)")
+            raise sqlite3.OperationalError("disk I/O error")
+
+        with mock.patch.object(migrations, 'MIGRATIONS', migrations.MIGRATIONS[:6] + [(7, failing_step)]):
+            with self.assertRaises(sqlite3.OperationalError):
+                migrate(conn)
+
+        self.assertEqual(get_schema_version(conn), 0)
+        self.assertFalse(conn.in_transaction)
+        self.assertEqual(tables(conn), before)
+        self.assertFalse(fulltext_index_exists(conn.cursor()))
+        self.assertNotIn('created_at', columns(conn, 'students'))
+        self.assertEqual(conn.execute("SELECT COUNT(*) FROM students").fetchone()[0], 3)
+
+        self.assertEqual(migrate(conn), SCHEMA_VERSION)     # and can be retried from scratch
+        conn.close()
+
+if __name__ == '__main__':
+    unittest.main()
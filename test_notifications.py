@@ -0,0 +1,142 @@
+import os
+import tempfile
+import threading
+import time
+import unittest
+from unittest import mock
+
+import notifications
+from database_operations import add_student_to_db
+from db_connection import ConnectionPool
+from migrations import migrate
+from notifications import (BACKOFF_BASE, OUTBOX_TABLE, STALE_CLAIM_SECONDS, NotificationDispatcher,
+                           RateLimiter, enqueue_notifications, set_notification_preferences)
+
+def student(mssv):
+    return {"MSSV": mssv, "Họ Tên": "Nguyễn Văn An", "Ngày sinh": "01/01/2003", "Giới tính": "Nam",
+            "Khoa": "Khoa Luật", "Khóa": "K21", "Chương trình": "Cử nhân", "Địa chỉ": "Hà Nội",
+            "Email": f"{mssv}@student.university.edu.vn", "Số điện thoại": "0912345678",
+            "Tình trạng": "Đang học"}
+
+class RecordingTransport:
+    def __init__(self, error=None):
+        self.error = error
+        self.sent = []
+        self.lock = threading.Lock()
+
+    def send_batch(self, messages):
+        with self.lock:
+            self.sent.extend(message['id'] for message in messages)
+        return [self.error] * len(messages)
+
+class TestNotifications(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.pool = ConnectionPool(os.path.join(self.directory.name, 'students.db'))
+        self.conn = self.pool.acquire()
+        migrate(self.conn)
+        for mssv in ("SV001", "SV002"):
+            add_student_to_db(student(mssv), self.conn.cursor(), self.conn)
+        with self.conn:
+            set_notification_preferences("SV001", ['email', 'sms'], self.conn)
+
+    def tearDown(self):
+        self.pool.release(self.conn)
+        self.pool.close_all()
+        self.directory.cleanup()
+
+    def outbox(self, channel='email'):
+        return self.conn.execute(f"SELECT id, status, attempts, next_attempt_at, last_error FROM {OUTBOX_TABLE} "
+                                 f"WHERE channel = ? ORDER BY id", (channel,)).fetchall()
+
+    def dispatcher(self, transport, **options):
+        return NotificationDispatcher({'email': transport}, rate_limits={'email': 1e6}, pool=self.pool,
+                                      **options)
+
+    def test_status_change_is_queued_by_trigger(self):
+        with self.conn:
+            self.conn.execute("UPDATE students SET status = 'Tạm dừng học' WHERE mssv IN ('SV001', 'SV002')")
+            self.conn.execute("UPDATE students SET name = 'Nguyễn Văn Bình' WHERE mssv = 'SV001'")
+        rows = self.conn.execute(f"SELECT channel, recipient, message FROM {OUTBOX_TABLE} ORDER BY channel")
+        self.assertEqual(rows.fetchall(), [
+            ('email', 'SV001@student.university.edu.vn', 'Tình trạng sinh viên của bạn (SV001) đã thay đổi: '
+                                                         'Đang học → Tạm dừng học'),
+            ('sms', '0912345678', 'Tình trạng sinh viên của bạn (SV001) đã thay đổi: Đang học → Tạm dừng học'),
+        ])
+
+    def test_failed_send_is_retried_with_backoff_then_failed(self):
+        with self.conn:
+            enqueue_notifications(["SV001"], "Xin chào", self.conn)
+        dispatcher = self.dispatcher(RecordingTransport("550 mailbox unavailable"), max_attempts=2)
+
+        started = time.time()
+        self.assertEqual(dispatcher.drain(), 1)
+        (_, status, attempts, next_attempt_at, error), = self.outbox()
+        self.assertEqual((status, attempts, error), ('pending', 1, "550 mailbox unavailable"))
+        self.assertGreaterEqual(next_attempt_at, started + BACKOFF_BASE * 0.8)
+        self.assertEqual(dispatcher.drain(), 0)     # not due yet
+
+        with self.conn:
+            self.conn.execute(f"UPDATE {OUTBOX_TABLE} SET next_attempt_at = 0")
+        self.assertEqual(dispatcher.drain(), 1)
+        self.assertEqual(self.outbox()[0][1:3], ('failed', 2))
+
+    def test_stale_claims_are_released(self):
+        with self.conn:
+            enqueue_notifications(["SV001"], "Xin chào", self.conn)
+            enqueue_notifications(["SV001"], "Tạm biệt", self.conn)
+            self.conn.execute(f"UPDATE {OUTBOX_TABLE} SET status = 'sending', next_attempt_at = ? "
+                              f"WHERE channel = 'email'", (time.time() - STALE_CLAIM_SECONDS - 1,))
+            self.conn.execute(f"UPDATE {OUTBOX_TABLE} SET status = 'sending', next_attempt_at = ? "
+                              f"WHERE channel = 'sms'", (time.time(),))
+        self.dispatcher(RecordingTransport()).release_stale_claims()
+        self.assertEqual([row[1] for row in self.outbox('email')], ['pending', 'pending'])
+        self.assertEqual([row[1] for row in self.outbox('sms')], ['sending', 'sending'])
+
+    def test_concurrent_dispatchers_send_each_message_once(self):
+        with self.conn:
+            for i in range(300):
+                enqueue_notifications(["SV001"], f"Tin {i}", self.conn)
+        transport = RecordingTransport()
+        other_pool = ConnectionPool(self.pool.path)
+        dispatchers = [self.dispatcher(transport, batch_size=3),
+                       NotificationDispatcher({'email': transport}, rate_limits={'email': 1e6}, batch_size=3,
+                                              pool=other_pool)]
+        threads = [threading.Thread(target=dispatcher.drain) for dispatcher in dispatchers]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        other_pool.close_all()
+
+        emails = self.outbox()
+        self.assertEqual(sorted(transport.sent), [row[0] for row in emails])
+        self.assertEqual({row[1] for row in emails}, {'sent'})
+
+class TestRateLimiter(unittest.TestCase):
+    def test_token_bucket(self):
+        clock = [100.0]
+        waits = []
+
+        class Stop:
+            def __init__(self, stopped=False):
+                self.stopped = stopped
+
+            def wait(self, timeout):
+                waits.append(round(timeout, 6))
+                clock[0] += timeout
+                return self.stopped
+
+        with mock.patch.object(notifications.time, 'monotonic', lambda: clock[0]):
+            limiter = RateLimiter(10.0, burst=5)
+            self.assertTrue(limiter.acquire(5, Stop()))     # the full burst is available at once
+            self.assertEqual(waits, [])
+            self.assertTrue(limiter.acquire(2, Stop()))     # then 10 per second
+            self.assertEqual(waits, [0.2])
+            clock[0] += 10
+            self.assertTrue(limiter.acquire(1, Stop()))     # refilled, but never above the burst
+            self.assertEqual(limiter.tokens, 4)
+            self.assertFalse(limiter.acquire(20, Stop(stopped=True)))
+
+if __name__ == '__main__':
+    unittest.main()
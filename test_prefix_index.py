@@ -0,0 +1,97 @@
+import os
+import tempfile
+import threading
+import unittest
+
+from db_connection import ConnectionPool
+from migrations import migrate
+from change_tracking import CHANGES_TABLE
+from prefix_index import PrefixIndex
+
+NAMES = ["Nguyễn Văn An", "Nguyễn Thị Anh", "Trần Đức Bình", "Lê Thị Hà", "Đặng Văn Anh"]
+
+class TestPrefixIndex(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.pool = ConnectionPool(os.path.join(self.directory.name, 'students.db'))
+        self.conn = self.pool.acquire()
+        migrate(self.conn)
+        with self.conn:
+            self.conn.executemany("INSERT INTO students (mssv, name) VALUES (?, ?)",
+                                  [(f"22{i:06d}", name) for i, name in enumerate(NAMES, 1)])
+        self.index = PrefixIndex(pool=self.pool)
+
+    def tearDown(self):
+        self.pool.release(self.conn)
+        self.pool.close_all()
+        self.directory.cleanup()
+
+    def test_name_words_match_as_folded_prefixes(self):
+        self.assertEqual(self.index.search("nguyen", ('name',)), ([1, 2], True))
+        self.assertEqual(self.index.search("an", ('name',)), ([1, 2, 5], True))
+        self.assertEqual(self.index.search("Văn a", ('name',)), ([1, 5], True))
+        self.assertEqual(self.index.search("dang", ('name',)), ([5], True))
+        self.assertEqual(self.index.search("thi x", ('name',)), ([], True))
+
+    def test_mssv_prefix_and_limit(self):
+        self.assertEqual(self.index.search("2200000", ('mssv',)), ([1, 2, 3, 4, 5], True))
+        self.assertEqual(self.index.search("22000003", ('mssv',)), ([3], True))
+        self.assertEqual(self.index.search("22", ('mssv',), limit=2), ([1, 2], False))
+
+    def test_writes_from_any_connection_are_picked_up(self):
+        self.index.search("a")
+        with self.conn:
+            self.conn.execute("UPDATE students SET name = 'Phạm Văn Cường' WHERE id = 1")
+            self.conn.execute("DELETE FROM students WHERE id = 2")
+            self.conn.execute("INSERT INTO students (mssv, name) VALUES ('SV9', 'Ngô Thị An')")
+        self.assertEqual(self.index.search("an", ('name',)), ([5, 6], True))
+        self.assertEqual(self.index.search("cuong", ('name',)), ([1], True))
+        self.assertEqual(self.index.search("sv", ('mssv',)), ([6], True))
+        self.assertEqual(self.index.stats()['builds'], 1)
+
+    def test_sync_removes_the_old_name_and_mssv(self):
+        self.index.search("a")
+        with self.conn:
+            self.conn.execute("UPDATE students SET mssv = 'SV7', name = 'Lê Văn Cường' WHERE id = 3")
+            self.conn.execute("UPDATE students SET status = 'Đang học' WHERE id = 3")
+            self.conn.execute("INSERT INTO students (mssv, name) VALUES ('SV8', 'Trần Văn Bình')")
+            self.conn.execute("UPDATE students SET name = 'Trần Văn Bảo' WHERE mssv = 'SV8'")
+        self.assertEqual(self.index.search("binh", ('name',)), ([], True))
+        self.assertEqual(self.index.search("tran", ('name',)), ([6], True))
+        self.assertEqual(self.index.search("cuong", ('name',)), ([3], True))
+        self.assertEqual(self.index.search("22000003", ('mssv',)), ([], True))
+        self.assertEqual(self.index.search("sv", ('mssv',)), ([3, 6], True))
+        self.assertEqual(self.index.stats()['builds'], 1)
+
+    def test_changes_logged_without_old_values_rebuild(self):
+        self.index.search("a")
+        with self.conn:
+            self.conn.execute("UPDATE students SET name = 'Phạm Văn Cường' WHERE id = 1")
+            self.conn.execute(f"UPDATE {CHANGES_TABLE} SET old_mssv = NULL, old_name = NULL")
+        self.assertEqual(self.index.search("nguyen", ('name',)), ([2], True))
+        self.assertEqual(self.index.stats()['builds'], 2)
+
+    def test_listener_syncs_on_the_index_worker(self):
+        self.index.search("a")
+        threads = []
+        sync = self.index.sync
+        self.index.sync = lambda **options: (threads.append(threading.current_thread()), sync(**options))
+        with self.conn:
+            self.conn.execute("UPDATE students SET name = 'Phạm Văn Cường' WHERE id = 1")
+        busy = threading.Event()
+        self.index._sync_worker.submit(busy.wait)
+        self.index.students_changed(["22000001"])
+        self.index.students_changed(["22000001"])     # covered by the sync already queued
+        busy.set()
+        self.index._sync_worker.submit(lambda: None).result()
+        self.assertEqual(len(threads), 1)
+        self.assertIsNot(threads[0], threading.current_thread())
+        self.assertEqual(self.index.stats()['syncs'], 1)
+
+    def test_cancelled_search_returns_none(self):
+        cancel = threading.Event()
+        cancel.set()
+        self.assertIsNone(self.index.search("an", ('name',), cancel_event=cancel))
+
+if __name__ == '__main__':
+    unittest.main()
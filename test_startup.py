@@ -0,0 +1,89 @@
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import unittest
+
+REPO_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Startup budgets, in seconds, measured from interpreter start-up to the event.
+IMPORT_BUDGET_SECONDS = 0.5
+FIRST_WINDOW_BUDGET_SECONDS = 1.5
+
+# Modules that must only be loaded when the screen that uses them is opened
+HEAVY_MODULES = ('pandas', 'numpy', 'openpyxl', 'fpdf', 'markdown')
+
+STARTUP_SCRIPT = '''
+import json, os, sys, time
+started = time.perf_counter()
+import main
+result = {
+    'import_seconds': time.perf_counter() - started,
+    'heavy_modules': [name for name in %r if name in sys.modules],
+    'database_opened': os.path.exists('students.db'),
+    'window_seconds': None,
+}
+try:
+    root = main.tk.Tk()
+except main.tk.TclError:
+    pass
+else:
+    app = main.StudentApp(root)
+    root.update()
+    result['window_seconds'] = time.perf_counter() - started
+    app.runner.shutdown()
+    root.destroy()
+    main.close_database()
+print(json.dumps(result))
+''' % (HEAVY_MODULES,)
+
+class TestStartup(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        """Start the application once in a fresh interpreter and an empty directory."""
+        with tempfile.TemporaryDirectory() as workdir:
+            env = dict(os.environ, PYTHONPATH=REPO_DIR)
+            completed = subprocess.run([sys.executable, '-c', STARTUP_SCRIPT], cwd=workdir, env=env,
+                                       capture_output=True, text=True, timeout=60)
+        if completed.returncode != 0:
+            raise AssertionError(f"Startup script failed:\n{completed.stderr}")
+        cls.result = json.loads(completed.stdout.strip().splitlines()[-1])
+
+    def test_heavy_modules_deferred(self):
+        self.assertEqual(self.result['heavy_modules'], [])
+
+    def test_database_not_opened_on_import(self):
+        self.assertFalse(self.result['database_opened'])
+
+    def test_import_within_budget(self):
+        self.assertLess(self.result['import_seconds'], IMPORT_BUDGET_SECONDS)
+
+    def test_first_window_within_budget(self):
+        if self.result['window_seconds'] is None:
+            self.skipTest("no display available")
+        self.assertLess(self.result['window_seconds'], FIRST_WINDOW_BUDGET_SECONDS)
+
+class TestLazyDatabaseInitialization(unittest.TestCase):
+    def test_initialize_is_idempotent(self):
+        script = '''
+import database_initialization as db
+assert not db.is_initialized()
+first = db.initialize_database()
+assert db.initialize_database() is first
+from database_initialization import conn
+assert conn is first
+db.close_database()
+assert not db.is_initialized()
+db.initialize_database()
+db.close_database()
+print("ok")
+'''
+        with tempfile.TemporaryDirectory() as workdir:
+            env = dict(os.environ, PYTHONPATH=REPO_DIR)
+            completed = subprocess.run([sys.executable, '-c', script], cwd=workdir, env=env,
+                                       capture_output=True, text=True, timeout=60)
+        self.assertEqual(completed.stdout.strip(), "ok", completed.stderr)
+
+if __name__ == '__main__':
+    unittest.main()
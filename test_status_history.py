@@ -0,0 +1,68 @@
+import sqlite3
+import unittest
+from datetime import date, datetime
+
+from migrations import migrate
+from status_history import HISTORY_TABLE, find_status_changes, get_status_timeline
+
+class TestStatusHistory(unittest.TestCase):
+    def setUp(self):
+        self.conn = sqlite3.connect(":memory:")
+        migrate(self.conn)
+        with self.conn:
+            self.conn.executemany("INSERT INTO students (mssv, name, status) VALUES (?, 'Nguyễn Văn An', 'Đang học')",
+                                  [("SV001",), ("SV002",)])
+
+    def tearDown(self):
+        self.conn.close()
+
+    def set_status(self, mssv, status):
+        with self.conn:
+            self.conn.execute("UPDATE students SET status = ? WHERE mssv = ?", (status, mssv))
+
+    def test_timeline_records_each_change(self):
+        today = date.today().isoformat()
+        self.set_status("SV001", "Tạm dừng học")
+        self.set_status("SV001", "Tạm dừng học")      # unchanged, not recorded
+        with self.conn:
+            self.conn.execute("UPDATE students SET name = 'Nguyễn Văn Bình' WHERE mssv = 'SV001'")
+        self.set_status("SV001", "Đang học")
+
+        timeline = get_status_timeline("SV001", self.conn)
+        self.assertEqual([(old, new) for _, old, new in timeline],
+                         [("Đang học", "Tạm dừng học"), ("Tạm dừng học", "Đang học")])
+        self.assertTrue(all(changed_at.startswith(today) for changed_at, _, _ in timeline))
+        self.assertLessEqual(timeline[0][0], timeline[1][0])
+        self.assertEqual(get_status_timeline("SV002", self.conn), [])
+
+        self.assertEqual([mssv for mssv, _, _ in find_status_changes("Tạm dừng học", today, today, self.conn)],
+                         ["SV001"])
+        self.assertEqual(find_status_changes("Tạm dừng học", "2000-01-01", "2000-12-31", self.conn), [])
+
+    def test_range_bounds(self):
+        self.set_status("SV001", "Tạm dừng học")
+        self.set_status("SV002", "Tạm dừng học")
+        self.set_status("SV001", "Đang học")
+        self.set_status("SV001", "Tạm dừng học")
+        with self.conn:
+            self.conn.executemany(f"UPDATE {HISTORY_TABLE} SET changed_at = ? WHERE id = ?",
+                                  [("2025-02-28 23:59:59.999", 1), ("2025-03-01 00:00:00.000", 2),
+                                   ("2025-03-15 12:30:00.000", 3), ("2025-03-31 23:59:59.999", 4)])
+
+        def changes(start, end, limit=None):
+            return [(mssv, changed_at) for mssv, _, changed_at in
+                    find_status_changes("Tạm dừng học", start, end, self.conn, limit)]
+
+        march = [("SV002", "2025-03-01 00:00:00.000"), ("SV001", "2025-03-31 23:59:59.999")]
+        self.assertEqual(changes("2025-03-01", "2025-03-31"), march)     # date bounds take whole days
+        self.assertEqual(changes(date(2025, 3, 1), date(2025, 3, 31)), march)
+        self.assertEqual(changes(datetime(2025, 2, 28, 12), "2025-03-01 00:00:00"),
+                         [("SV001", "2025-02-28 23:59:59.999")])     # datetime end bounds are exclusive
+        self.assertEqual(changes("2025-02-01", "2025-03-31", limit=2),
+                         [("SV001", "2025-02-28 23:59:59.999"), ("SV002", "2025-03-01 00:00:00.000")])
+        self.assertEqual([(old, new) for _, old, new in get_status_timeline("SV001", self.conn)],
+                         [("Đang học", "Tạm dừng học"), ("Tạm dừng học", "Đang học"),
+                          ("Đang học", "Tạm dừng học")])
+
+if __name__ == '__main__':
+    unittest.main()
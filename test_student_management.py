@@ -3,7 +3,15 @@ import sqlite3
 import os
 from datetime import datetime, timedelta
 import json
-from ex1 import is_valid_email, is_valid_phone, is_valid_date, is_valid_status_transition, can_delete_student, get_config
+from unittest import mock
+import tempfile
+import db_connection
+import database_operations
+from validation import (is_valid_email, is_valid_phone, is_valid_date, is_valid_status_transition,
+                        build_validation_context, invalidate_validation_context, validate_student_data)
+from database_operations import can_delete_student, get_config, add_category
+from database_initialization import init_default_settings, init_default_config
+from migrations import migrate
 
 class TestStudentManagement(unittest.TestCase):
     @classmethod
@@ -50,8 +58,19 @@ class TestStudentManagement(unittest.TestCase):
                 "INSERT INTO config (key, value) VALUES (?, ?)", 
                 (key, value)
             )
+        cls.cursor.execute('''
+            CREATE TABLE IF NOT EXISTS settings (
+                category TEXT NOT NULL,
+                value TEXT NOT NULL
+            )
+        ''')
         cls.conn.commit()
 
+        # Validate against the test config rather than the application database
+        cls.context_patcher = mock.patch('validation.get_validation_context',
+                                         return_value=build_validation_context(cls.conn))
+        cls.context_patcher.start()
+
     def test_email_validation(self):
         """Test email validation rules"""
         # Valid email tests
@@ -179,7 +198,40 @@ class TestStudentManagement(unittest.TestCase):
     @classmethod
     def tearDownClass(cls):
         """Clean up test database"""
+        cls.context_patcher.stop()
         cls.conn.close()
 
+class TestValidationContext(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        path = os.path.join(self.directory.name, "students.db")
+        self.pool = db_connection.ConnectionPool(path)
+        self.conn = self.pool.acquire()
+        migrate(self.conn)
+        init_default_settings(self.conn)
+        init_default_config(self.conn)
+        # add_category writes through the UI connection, validation reads through the pool
+        patchers = [mock.patch.object(db_connection, '_pool', self.pool),
+                    mock.patch.object(database_operations, 'get_connection', return_value=self.conn)]
+        for patcher in patchers:
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        invalidate_validation_context()
+
+    def tearDown(self):
+        invalidate_validation_context()
+        self.pool.release(self.conn)
+        self.pool.close_all()
+        self.directory.cleanup()
+
+    def test_new_category_is_accepted_without_restart(self):
+        data = {"MSSV": "SV001", "Họ Tên": "Nguyễn Văn An", "Ngày sinh": "01/01/2003", "Giới tính": "Nam",
+                "Khoa": "Khoa Toán", "Khóa": "K21", "Chương trình": "Cử nhân", "Địa chỉ": "Hà Nội",
+                "Email": "sv001@student.university.edu.vn", "Số điện thoại": "0912345678",
+                "Tình trạng": "Đang học"}
+        self.assertIsNotNone(validate_student_data(data))
+        add_category('faculty', "Khoa Toán")
+        self.assertIsNone(validate_student_data(data))
+
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file
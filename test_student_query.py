@@ -0,0 +1,91 @@
+import sqlite3
+import unittest
+
+from database_operations import perform_advanced_search
+from migrations import migrate
+from student_query import build_student_query, query_students, query_plans, uses_index
+
+class TestStudentQuery(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.conn = sqlite3.connect(":memory:")
+        migrate(cls.conn)
+        with cls.conn:
+            cls.conn.executemany('''
+                INSERT INTO students (mssv, name, dob, gender, course, status, email)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+            ''', [(f"SV{i:03d}", ["Lê Văn An", "Đỗ Thị Bình", "Trần Hữu Cường"][i % 3],
+                   None if i % 7 == 0 else f"{i % 28 + 1:02d}/{i % 12 + 1:02d}/{2000 + i % 5}",
+                   "Nữ" if i % 2 else "Nam", f"K{20 + i % 4}",
+                   "Đang học" if i % 5 else "Tạm dừng học",
+                   f"sv{i}@{'hcmus.edu.vn' if i % 10 == 0 else 'student.university.edu.vn'}")
+                  for i in range(120)])
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.conn.close()
+
+    def test_filters_combine(self):
+        students, cursor = query_students({'course': ['K21', 'K23'], 'status': 'Đang học', 'gender': 'Nữ',
+                                           'dob_from': '2001-01-01', 'dob_to': '31/12/2003'},
+                                          db_connection=self.conn)
+        expected = [row[0] for row in self.conn.execute('''
+            SELECT mssv FROM students
+            WHERE course IN ('K21', 'K23') AND status = 'Đang học' AND gender = 'Nữ'
+              AND substr(dob, 7, 4) BETWEEN '2001' AND '2003' ORDER BY id
+        ''')]
+        self.assertEqual([student.mssv for student in students], expected)
+        self.assertIsNone(cursor)
+        students, _ = query_students({'email_domain': '@HCMUS.edu.vn'}, db_connection=self.conn)
+        self.assertEqual(len(students), 12)
+
+    def test_keyset_pages_follow_the_sort_order(self):
+        for order_by, descending in (('name', False), ('dob', False), ('dob', True), ('mssv', True)):
+            everyone, _ = query_students({'status': 'Đang học'}, order_by, descending, db_connection=self.conn)
+            pages, cursor = [], None
+            while True:
+                page, cursor = query_students({'status': 'Đang học'}, order_by, descending, limit=7,
+                                              after=cursor, db_connection=self.conn)
+                pages.extend(page)
+                if cursor is None:
+                    break
+            self.assertEqual(pages, everyone, (order_by, descending))
+        offset_page, _ = query_students({'status': 'Đang học'}, 'mssv', True, limit=5, offset=10,
+                                        db_connection=self.conn)
+        self.assertEqual(offset_page, everyone[10:15])
+
+    def test_one_sql_string_per_shape_and_indexed_plans(self):
+        first = build_student_query({'course': 'K21', 'status': 'Đang học'}, 'name', limit=50)
+        second = build_student_query({'course': 'K22', 'status': 'Tạm dừng học'}, 'name', limit=20)
+        self.assertIs(first[0], second[0])
+        self.assertEqual(second[1], ['Tạm dừng học', 'K22', 20])
+
+        query_students({'course': 'K21', 'status': 'Đang học'}, 'name', limit=10, db_connection=self.conn)
+        query_students({'dob_from': '2002-01-01'}, 'dob', limit=10, db_connection=self.conn)
+        plans = {(shape[0], shape[1]): used for shape, plan, used in query_plans()}
+        self.assertTrue(plans[((('status', 1), ('course', 1)), 'name')])
+        self.assertTrue(plans[((('dob_from', 1),), 'dob')])
+        self.assertFalse(uses_index(["SCAN students"]))
+
+    def test_id_list_is_one_parameter(self):
+        ids = list(range(2000, 500, -1)) + [5, 3, 6]
+        query, params = build_student_query({'ids': ids, 'status': 'Đang học'})
+        self.assertEqual(len(params), 2)
+        students, _ = query_students({'ids': ids, 'status': 'Đang học'}, db_connection=self.conn)
+        self.assertEqual([student.id for student in students], [3, 5])      # id 6 is suspended
+        students, _ = query_students({'ids': range(1, 1501)}, db_connection=self.conn)
+        self.assertEqual(len(students), 120)
+        self.assertEqual(query_students({'ids': []}, db_connection=self.conn)[0], [])
+
+    def test_advanced_search_takes_more_filters(self):
+        results, message = perform_advanced_search('', '', self.conn.cursor(), course='K20',
+                                                   order_by='mssv', descending=True, limit=3)
+        self.assertIsNone(message)
+        self.assertEqual([student.mssv for student in results], ["SV116", "SV112", "SV108"])
+        self.assertEqual(perform_advanced_search('', '', self.conn.cursor())[1],
+                         "Vui lòng nhập ít nhất một điều kiện tìm kiếm!")
+        with self.assertRaises(ValueError):
+            query_students({'hometown': 'Huế'}, db_connection=self.conn)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,93 @@
+import gc
+import pickle
+import sqlite3
+import threading
+import unittest
+
+from migrations import migrate
+from student_record import Student, student_cursor, fetch_students, gc_paused
+
+class TestStudentRecord(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.conn = sqlite3.connect(":memory:")
+        migrate(cls.conn)
+        with cls.conn:
+            cls.conn.executemany('''
+                INSERT INTO students (mssv, name, dob, gender, faculty, course, program,
+                                      address, email, phone, status)
+                VALUES (?, ?, '01/01/2003', 'Nữ', 'Khoa Luật', 'K21', 'Cử nhân', 'Huế', ?, '0912345678', ?)
+            ''', [(f"SV{i:03d}", f"Trần Thị {i}", f"sv{i}@student.university.edu.vn",
+                   "Đang học") for i in range(3)])
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.conn.close()
+
+    def test_full_rows_have_named_and_positional_access(self):
+        student = student_cursor(self.conn).execute("SELECT * FROM students WHERE mssv = 'SV001'").fetchone()
+        self.assertIsInstance(student, Student)
+        self.assertEqual((student.mssv, student.name, student.status), ("SV001", "Trần Thị 1", "Đang học"))
+        self.assertEqual(student[2], student.name)
+        self.assertEqual(student[11], student.status)
+        self.assertEqual(student['faculty'], "Khoa Luật")
+        self.assertEqual(len(tuple(student)), len(student))
+
+    def test_repeated_values_are_shared(self):
+        cursor = student_cursor(self.conn)
+        cursor.execute("SELECT * FROM students ORDER BY id")
+        first, second, _ = fetch_students(cursor)
+        self.assertIs(first.status, second.status)
+        self.assertIs(first.faculty, second.faculty)
+
+    def test_partial_selection_fills_named_fields(self):
+        student = student_cursor(self.conn).execute(
+            "SELECT status, mssv FROM students WHERE mssv = 'SV002'").fetchone()
+        self.assertEqual((student.mssv, student.status, student.name), ("SV002", "Đang học", None))
+
+    def test_pickle_round_trip(self):
+        student = student_cursor(self.conn).execute("SELECT * FROM students LIMIT 1").fetchone()
+        self.assertEqual(pickle.loads(pickle.dumps(student)), student)
+
+    def test_interleaved_cursors_on_different_layouts(self):
+        other = sqlite3.connect(":memory:")
+        other.execute("CREATE TABLE students (mssv TEXT, status TEXT, name TEXT, id INTEGER PRIMARY KEY)")
+        other.executemany("INSERT INTO students VALUES (?, 'Đã tốt nghiệp', ?, NULL)",
+                          [("OLD1", "Phạm Văn Đức"), ("OLD2", "Võ Thị Hoa")])
+        full = student_cursor(self.conn).execute("SELECT * FROM students ORDER BY id")
+        legacy = student_cursor(other).execute("SELECT * FROM students ORDER BY id")
+        rows = [full.fetchone(), legacy.fetchone(), full.fetchone(), legacy.fetchone()]
+        other.close()
+        self.assertEqual([(row.mssv, row.status) for row in rows],
+                         [("SV000", "Đang học"), ("OLD1", "Đã tốt nghiệp"),
+                          ("SV001", "Đang học"), ("OLD2", "Đã tốt nghiệp")])
+        self.assertEqual((rows[1].id, rows[1].name, rows[1].email), (1, "Phạm Văn Đức", None))
+
+    def test_overlapping_gc_pauses(self):
+        self.assertTrue(gc.isenabled())
+        entered, release = threading.Event(), threading.Event()
+
+        def load():
+            with gc_paused():
+                entered.set()
+                release.wait()
+
+        worker = threading.Thread(target=load)
+        worker.start()
+        entered.wait()
+        with gc_paused():
+            release.set()
+            worker.join()
+            self.assertFalse(gc.isenabled())    # the other load ended, this one has not
+        self.assertTrue(gc.isenabled())
+
+        gc.disable()
+        try:
+            with gc_paused():
+                pass
+            self.assertFalse(gc.isenabled())    # left as the caller set it
+        finally:
+            gc.enable()
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,73 @@
+import os
+import sqlite3
+import tempfile
+import unittest
+
+from database_operations import (add_student_listener, remove_student_listener, add_student_to_db,
+                                 update_student_in_db, delete_student_from_db)
+from db_connection import ConnectionPool
+from migrations import migrate
+from student_repository import StudentRepository
+
+def student(mssv, name="Nguyễn Văn An", status="Đang học"):
+    return {"MSSV": mssv, "Họ Tên": name, "Ngày sinh": "01/01/2003", "Giới tính": "Nam",
+            "Khoa": "Khoa Luật", "Khóa": "K21", "Chương trình": "Cử nhân", "Địa chỉ": "Hà Nội",
+            "Email": f"{mssv}@student.university.edu.vn", "Số điện thoại": "0912345678",
+            "Tình trạng": status}
+
+class TestStudentRepository(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.pool = ConnectionPool(os.path.join(self.directory.name, 'students.db'))
+        self.conn = self.pool.acquire()
+        migrate(self.conn)
+        for mssv in ("SV001", "SV002", "SV003"):
+            add_student_to_db(student(mssv), self.conn.cursor(), self.conn)
+        self.repository = StudentRepository(capacity=2, pool=self.pool)
+        add_student_listener(self.repository.students_changed)
+
+    def tearDown(self):
+        remove_student_listener(self.repository.students_changed)
+        self.pool.release(self.conn)
+        self.pool.close_all()
+        self.directory.cleanup()
+
+    def test_hits_misses_and_eviction(self):
+        self.assertEqual(self.repository.get("SV001", self.conn)[1], "SV001")
+        self.repository.get("SV001", self.conn)
+        self.repository.get("SV002", self.conn)
+        self.repository.get("SV001", self.conn)
+        self.repository.get("SV003", self.conn)   # evicts SV002, the least recently used
+        self.repository.get("SV002", self.conn)
+        self.assertIsNone(self.repository.get("SV999", self.conn))
+        stats = self.repository.stats()
+        self.assertEqual((stats['hits'], stats['misses'], stats['size']), (2, 5, 2))
+
+    def test_writes_invalidate_only_written_students(self):
+        self.repository.get("SV001", self.conn)
+        self.repository.get("SV002", self.conn)
+        update_student_in_db("SV001", student("SV001", name="Trần Thị Bình"), self.conn.cursor(), self.conn)
+        self.assertEqual(self.repository.get("SV001", self.conn)[2], "Trần Thị Bình")
+        self.repository.get("SV002", self.conn)
+        stats = self.repository.stats()
+        self.assertEqual((stats['hits'], stats['external_invalidations']), (1, 0))
+
+        delete_student_from_db("SV002", self.conn.cursor(), self.conn)
+        self.assertIsNone(self.repository.get("SV002", self.conn))
+
+    def test_missing_students_are_not_cached(self):
+        self.assertIsNone(self.repository.get("SV004", self.conn))
+        add_student_to_db(student("SV004"), self.conn.cursor(), self.conn)
+        self.assertIsNotNone(self.repository.get("SV004", self.conn))
+
+    def test_external_writes_empty_the_cache(self):
+        self.repository.get("SV001", self.conn)
+        other = sqlite3.connect(self.pool.path)
+        with other:
+            other.execute("UPDATE students SET name = 'Lê Văn Cường' WHERE mssv = 'SV001'")
+        other.close()
+        self.assertEqual(self.repository.get("SV001", self.conn)[2], "Lê Văn Cường")
+        self.assertEqual(self.repository.stats()['external_invalidations'], 1)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,377 @@
+import tkinter as tk
+from bisect import bisect_left
+from collections import deque
+from tkinter import ttk
+
+from change_tracking import changes_since, latest_change
+from database_operations import fetch_students_page, fetch_students_by_id, PAGE_SIZE
+from db_connection import connection, get_pool
+
+def create_treeview(parent, columns, headings, on_scroll=None):
+    """Create a TreeView widget with scrollbars.
+
+    `on_scroll(first, last)` is called with the visible fraction of the content
+    whenever the vertical view changes.
+    """
+    tree = ttk.Treeview(parent, columns=columns, show='headings')
+    vsb = ttk.Scrollbar(parent, orient="vertical", command=tree.yview)
+    hsb = ttk.Scrollbar(parent, orient="horizontal", command=tree.xview)
+
+    def yscroll(first, last):
+        vsb.set(first, last)
+        on_scroll(float(first), float(last))
+
+    tree.configure(yscrollcommand=yscroll if on_scroll else vsb.set, xscrollcommand=hsb.set)
+    tree.grid(column=0, row=0, sticky='nsew')
+    vsb.grid(column=1, row=0, sticky='ns')
+    hsb.grid(column=0, row=1, sticky='ew')
+    parent.grid_columnconfigure(0, weight=1)
+    parent.grid_rowconfigure(0, weight=1)
+    for col, heading in headings.items():
+        tree.heading(col, text=heading)
+        tree.column(col, width=100)
+    return tree
+
+class _Page:
+    """A loaded page: its id range and, in display order, its students' ids and item ids."""
+
+    __slots__ = ('first_id', 'last_id', 'ids', 'iids')
+
+    def __init__(self, first_id, last_id, ids, iids):
+        self.first_id = first_id
+        self.last_id = last_id
+        self.ids = ids
+        self.iids = iids
+
+class VirtualStudentList:
+    """Students TreeView that only holds a sliding window of pages.
+
+    Pages come from keyset pagination over the students table (fetch_students_page)
+    and are fetched when the view scrolls close to either end of the window. Once
+    more than `max_pages` are loaded, pages are dropped from the opposite end, so
+    the widget never holds more than `page_size * max_pages` rows. Item ids are MSSVs.
+
+    With a TaskRunner, pages are fetched on a worker thread from a pooled
+    connection; otherwise they are read synchronously through `cursor`.
+
+    The window is kept current from the student change log (see change_tracking):
+    sync() re-reads only the students changed since the last sync and inserts,
+    updates or removes their rows in place. watch() polls PRAGMA data_version
+    and syncs when it moves, so a burst of commits costs a single sync.
+    """
+
+    PREFETCH_MARGIN = 0.2
+    SYNC_INTERVAL_MS = 250
+    MAX_SYNC_CHANGES = 2000    # beyond this many pending changes, reloading is cheaper
+
+    def __init__(self, parent, headings, cursor, runner=None, page_size=PAGE_SIZE, max_pages=5):
+        self.cursor = cursor
+        self.runner = runner
+        self.page_size = page_size
+        self.max_pages = max_pages
+        self.where = "1=1"
+        self.params = []
+        self.pages = deque()
+        self.at_start = True
+        self.at_end = True
+        self.loading = False
+        self.synced_seq = None     # last change log entry reflected in the window
+        self._generation = 0
+        self._data_version = None
+        self._watch_job = None
+        self.tree = create_treeview(parent, list(headings.keys()), headings, on_scroll=self._on_scroll)
+        self.tree.bind('<Destroy>', self._stop_watching, add='+')
+
+    def set_filter(self, where="1=1", params=(), on_loaded=None):
+        """Show the students matching a WHERE clause, starting from the first page."""
+        self.where = where
+        self.params = list(params)
+        self.reload(on_loaded)
+
+    def reload(self, on_loaded=None):
+        """Discard the loaded window and show the first page again.
+
+        `on_loaded(row_count)` is called once the first page is displayed.
+        """
+        self._generation += 1
+        read_page = self._page_reader()
+
+        def read(cursor):
+            # Read the log position first: changes committed in between are
+            # replayed by the next sync, which is harmless.
+            return latest_change(cursor), read_page(cursor)
+
+        def apply(result):
+            self.synced_seq, rows = result
+            self.tree.delete(*self.tree.get_children())
+            self.pages.clear()
+            self._add_page(rows, at_end=True)
+            self.at_start = True
+            self.at_end = len(rows) < self.page_size
+            self.tree.yview_moveto(0)
+            if on_loaded:
+                on_loaded(len(rows))
+
+        self._request(read, apply)
+
+    def is_empty(self):
+        return not self.loaded_count()
+
+    def loaded_count(self):
+        return sum(len(page.iids) for page in self.pages)
+
+    def _request(self, read, apply, name='fetch_students_page'):
+        """Run `read(cursor)` and pass its result to `apply` on the UI thread, unless a reload superseded it."""
+        generation = self._generation
+        self.loading = True
+
+        def deliver(result):
+            if generation == self._generation:
+                self.loading = False
+                apply(result)
+
+        def failed(error):
+            if generation == self._generation:
+                self.loading = False
+
+        if self.runner is None:
+            deliver(read(self.cursor))
+            return
+
+        def fetch(task):
+            with connection() as conn:
+                return read(conn.cursor())
+
+        self.runner.submit(fetch, name=name, on_done=deliver, on_error=failed)
+
+    def _page_reader(self, **page_args):
+        where, params, limit = self.where, self.params, self.page_size
+        return lambda cursor: fetch_students_page(cursor, where, params, limit=limit, **page_args)
+
+    def _add_page(self, rows, at_end):
+        if not rows:
+            return 0
+        ids, iids = [], []
+        for offset, row in enumerate(rows):
+            iid = str(row[1])
+            self.tree.insert('', 'end' if at_end else offset, iid=iid, values=row[1:])
+            ids.append(row[0])
+            iids.append(iid)
+        page = _Page(rows[0][0], rows[-1][0], ids, iids)
+        if at_end:
+            self.pages.append(page)
+        else:
+            self.pages.appendleft(page)
+        return len(rows)
+
+    def _drop_page(self, from_start):
+        page = self.pages.popleft() if from_start else self.pages.pop()
+        self.tree.delete(*page.iids)
+        return len(page.iids)
+
+    def _on_scroll(self, first, last):
+        if self.loading or not self.pages:
+            return
+        if last > 1 - self.PREFETCH_MARGIN and not self.at_end:
+            self._request(self._page_reader(after_id=self.pages[-1].last_id), self._append_page)
+        elif first < self.PREFETCH_MARGIN and not self.at_start:
+            self._request(self._page_reader(before_id=self.pages[0].first_id), self._prepend_page)
+
+    def _append_page(self, rows):
+        total, top = self._view_position()
+        added = self._add_page(rows, at_end=True)
+        self.at_end = len(rows) < self.page_size
+        removed = 0
+        if len(self.pages) > self.max_pages:
+            removed = self._drop_page(from_start=True)
+            self.at_start = False
+        self._restore_position(total + added - removed, top - removed)
+
+    def _prepend_page(self, rows):
+        total, top = self._view_position()
+        added = self._add_page(rows, at_end=False)
+        self.at_start = len(rows) < self.page_size
+        removed = 0
+        if len(self.pages) > self.max_pages:
+            removed = self._drop_page(from_start=False)
+            self.at_end = False
+        self._restore_position(total + added - removed, top + added)
+
+    def _view_position(self):
+        total = self.loaded_count()
+        return total, self.tree.yview()[0] * total
+
+    def _restore_position(self, total, top):
+        # Keep the rows the user was looking at in place after the window shifted
+        if total:
+            self.tree.yview_moveto(max(top, 0) / total)
+
+    # Change tracking
+
+    def watch(self, pool=None, interval=SYNC_INTERVAL_MS):
+        """Sync whenever the database changes, until the widget is destroyed.
+
+        Commits from this process and from others both move the pool's data
+        version; it is polled every `interval` ms, which costs one PRAGMA.
+        """
+        pool = pool or get_pool()
+
+        def poll():
+            self._watch_job = None
+            version = pool.data_version()
+            if version != self._data_version and not self.loading:
+                self._data_version = version
+                self.sync()
+            self._watch_job = self.tree.after(interval, poll)
+
+        self._stop_watching()
+        self._data_version = pool.data_version()
+        self._watch_job = self.tree.after(interval, poll)
+
+    def _stop_watching(self, event=None):
+        if self._watch_job is not None:
+            self.tree.after_cancel(self._watch_job)
+            self._watch_job = None
+
+    def sync(self):
+        """Apply the students changed since the last sync to the loaded window.
+
+        Falls back to reload() when the change log no longer covers the window
+        or holds more than MAX_SYNC_CHANGES entries for it. Does nothing while a
+        page is loading; the next sync picks the changes up.
+        """
+        if self.loading or self.synced_seq is None:
+            return
+        since, where, params = self.synced_seq, self.where, self.params
+
+        def read(cursor):
+            changes = changes_since(cursor, since, limit=self.MAX_SYNC_CHANGES)
+            if changes is None:
+                return None
+            seq, ids = changes
+            return seq, ids, fetch_students_by_id(cursor, ids, where, params) if ids else []
+
+        def apply(result):
+            if result is None:
+                self.reload()
+                return
+            self.synced_seq, ids, rows = result
+            if ids:
+                self._apply_changes(ids, rows)
+
+        self._request(read, apply, name='sync_students')
+
+    def _apply_changes(self, ids, rows):
+        total, top = self._view_position()
+        shift = 0      # rows added minus rows removed above the top of the view
+        current = {row[0]: row for row in rows}
+        inserts = []
+
+        # Removals first: an MSSV moving between students must leave its old row
+        # before it can be inserted again.
+        for student_id in ids:
+            row = current.get(student_id)
+            position = self._locate(student_id)
+            if position is None or position[2] is None:
+                if row is not None:
+                    inserts.append(row)
+                continue
+            page_index, page, index = position
+            iid = page.iids[index]
+            if row is not None and str(row[1]) == iid:
+                self.tree.item(iid, values=row[1:])
+                continue
+            if self.tree.index(iid) < top:
+                shift -= 1
+            self.tree.delete(iid)
+            del page.ids[index], page.iids[index]
+            if row is not None:
+                inserts.append(row)
+
+        for row in inserts:
+            shift += self._insert_row(row, top)
+
+        if shift:
+            self._restore_position(total + shift, top + shift)
+
+    def _locate(self, student_id):
+        """Return (page index, page, index in page or None) for the page whose
+        id range takes `student_id`, or None if it falls outside the window."""
+        if not self.pages:
+            return None
+        for page_index, page in enumerate(self.pages):
+            if student_id <= page.last_id:
+                if page_index == 0 and student_id < page.first_id and not self.at_start:
+                    return None
+                break
+        else:
+            if not self.at_end:
+                return None
+        index = bisect_left(page.ids, student_id)
+        found = index < len(page.ids) and page.ids[index] == student_id
+        return page_index, page, index if found else None
+
+    def _insert_row(self, row, top):
+        """Insert a row that entered the window in id order; returns 1 if it landed above the view."""
+        student_id, iid = row[0], str(row[1])
+        if self.tree.exists(iid):
+            self.tree.item(iid, values=row[1:])
+            return 0
+        if not self.pages:
+            if not (self.at_start and self.at_end):
+                return 0
+            self.pages.append(_Page(student_id, student_id, [], []))
+        position = self._locate(student_id)
+        if position is None:
+            return 0
+        page_index, page, _ = position
+        index = bisect_left(page.ids, student_id)
+        offset = sum(len(self.pages[i].iids) for i in range(page_index)) + index
+        self.tree.insert('', offset, iid=iid, values=row[1:])
+        page.ids.insert(index, student_id)
+        page.iids.insert(index, iid)
+        page.first_id = min(page.first_id, student_id)
+        page.last_id = max(page.last_id, student_id)
+        return 1 if offset < top else 0
+
+class ProgressDialog:
+    """Small window showing the progress of a background task, with a Cancel button."""
+
+    def __init__(self, parent, title, text="Đang xử lý..."):
+        self.task = None
+        self.window = tk.Toplevel(parent)
+        self.window.title(title)
+        self.window.resizable(False, False)
+        self.window.transient(parent)
+        self.window.protocol("WM_DELETE_WINDOW", self.cancel)
+
+        self.label = tk.Label(self.window, text=text, anchor="w")
+        self.label.pack(fill=tk.X, padx=10, pady=(10, 5))
+        self.bar = ttk.Progressbar(self.window, length=320, mode='indeterminate')
+        self.bar.pack(padx=10, pady=5)
+        self.bar.start(10)
+        self.cancel_button = tk.Button(self.window, text="Hủy", command=self.cancel, width=10)
+        self.cancel_button.pack(pady=(5, 10))
+
+    def attach(self, task):
+        """Bind the Cancel button to a running task."""
+        self.task = task
+
+    def update(self, text, fraction=None):
+        """Show a status line and, if known, the completed fraction of the work."""
+        self.label.config(text=text)
+        if fraction is not None:
+            if str(self.bar['mode']) != 'determinate':
+                self.bar.stop()
+                self.bar.config(mode='determinate', maximum=100)
+            self.bar['value'] = min(fraction, 1.0) * 100
+
+    def cancel(self):
+        if self.task is not None and not self.task.cancelled:
+            self.task.cancel()
+            self.label.config(text="Đang hủy...")
+            self.cancel_button.config(state=tk.DISABLED)
+
+    def close(self):
+        self.bar.stop()
+        self.window.destroy()
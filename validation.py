@@ -1,37 +1,79 @@
-from database_operations import get_valid_options, get_config
+from collections import namedtuple
+from database_operations import get_valid_options, get_config, get_settings_version
 from datetime import datetime
+import json
 import re
 
-def validate_student_data(data):
+DEFAULT_EMAIL_DOMAINS = '@student.university.edu.vn'
+DEFAULT_PHONE_PATTERN = r'^(\+84|0)[3|5|7|8|9][0-9]{8}$'
+EMAIL_REGEX = re.compile(r"^[\w\.-]+@[\w\.-]+\.\w+$")
+
+ValidationContext = namedtuple('ValidationContext', [
+    'version', 'faculties', 'statuses', 'programs',
+    'email_domains', 'phone_regex', 'enforce_rules', 'status_transitions'
+])
+
+_validation_context = None
+
+def build_validation_context(db_connection=None):
+    """Snapshot the settings and config values used by validation."""
+    allowed_domains = get_config('allowed_email_domains', DEFAULT_EMAIL_DOMAINS, db_connection)
+    phone_pattern = get_config('phone_pattern', DEFAULT_PHONE_PATTERN, db_connection)
+    transitions = json.loads(get_config('status_transitions', '{}', db_connection))
+    return ValidationContext(
+        version=get_settings_version(),
+        faculties=frozenset(get_valid_options('faculty', db_connection)),
+        statuses=frozenset(get_valid_options('status', db_connection)),
+        programs=frozenset(get_valid_options('program', db_connection)),
+        email_domains=tuple(domain.strip() for domain in allowed_domains.split(',')),
+        phone_regex=re.compile(phone_pattern),
+        enforce_rules=get_config('enable_rules', 'true', db_connection).lower() == 'true',
+        status_transitions={status: frozenset(targets) for status, targets in transitions.items()}
+    )
+
+def get_validation_context():
+    """Return the cached validation context, rebuilding it after settings/config writes."""
+    global _validation_context
+    if _validation_context is None or _validation_context.version != get_settings_version():
+        _validation_context = build_validation_context()
+    return _validation_context
+
+def invalidate_validation_context():
+    """Drop the cached validation context so the next validation re-reads the database."""
+    global _validation_context
+    _validation_context = None
+
+def validate_student_data(data, context=None):
     """Validate student data before database operations."""
+    context = context or get_validation_context()
     if not data["MSSV"] or not data["Họ Tên"]:
         return "MSSV và Họ Tên không được để trống!"
     if not is_valid_date(data["Ngày sinh"]):
         return "Ngày sinh không hợp lệ! Định dạng: dd/mm/yyyy"
-    if data["Khoa"] not in get_valid_options('faculty'):
+    if data["Khoa"] not in context.faculties:
         return "Khoa không hợp lệ!"
-    if data["Tình trạng"] not in get_valid_options('status'):
+    if data["Tình trạng"] not in context.statuses:
         return "Tình trạng không hợp lệ!"
-    if data["Chương trình"] and data["Chương trình"] not in get_valid_options('program'):
+    if data["Chương trình"] and data["Chương trình"] not in context.programs:
         return "Chương trình không hợp lệ!"
-    if not is_valid_email(data["Email"]):
+    if not is_valid_email(data["Email"], context):
         return "Email không hợp lệ!"
-    if not is_valid_phone(data["Số điện thoại"]):
+    if not is_valid_phone(data["Số điện thoại"], context):
         return "Số điện thoại không hợp lệ (10-11 số)!"
     return None
 
 # Validation Functions
-def is_valid_email(email):
+def is_valid_email(email, context=None):
     """Validate email format and domain."""
-    allowed_domains = get_config('allowed_email_domains', '@student.university.edu.vn')
-    if not re.match(r"^[\w\.-]+@[\w\.-]+\.\w+$", email):
+    context = context or get_validation_context()
+    if not EMAIL_REGEX.match(email):
         return False
-    return any(email.endswith(domain.strip()) for domain in allowed_domains.split(','))
+    return email.endswith(context.email_domains)
 
-def is_valid_phone(phone):
+def is_valid_phone(phone, context=None):
     """Validate phone number format."""
-    pattern = get_config('phone_pattern', r'^(\+84|0)[3|5|7|8|9][0-9]{8}$')
-    return re.match(pattern, phone) is not None
+    context = context or get_validation_context()
+    return context.phone_regex.match(phone) is not None
 
 def is_valid_date(date_str):
     """Validate date format."""
@@ -39,4 +81,16 @@ def is_valid_date(date_str):
         datetime.strptime(date_str, '%d/%m/%Y')
         return True
     except ValueError:
-        return False
\ No newline at end of file
+        return False
+
+def is_valid_status_transition(old_status, new_status, context=None):
+    """Check a status change against the `status_transitions` config.
+
+    Statuses without an entry in the config are unrestricted, as is every
+    change when `enable_rules` is off.
+    """
+    context = context or get_validation_context()
+    if not context.enforce_rules or old_status == new_status:
+        return True
+    allowed = context.status_transitions.get(old_status)
+    return allowed is None or new_status in allowed